@@ -0,0 +1,252 @@
+"""
+Deterministic answer extraction for the calculator questionnaires
+
+Parses replies like "2.5 lakh tonnes", "1,20,000" or "3k MWh" into the
+question's unit, and matches select answers ("EAF", "blast furnace route")
+against a token index built once per questionnaire. The calculator agent
+only falls back to the LLM when these return None, and caches what the LLM
+says.
+"""
+import difflib
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.data.emission_factors import QUESTIONNAIRES
+
+# Multiplier words that may follow a number
+SCALE_WORDS = {
+    "k": 1e3, "thousand": 1e3, "thousands": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "million": 1e6, "millions": 1e6, "mn": 1e6,
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+    "billion": 1e9, "bn": 1e9,
+}
+
+# Unit aliases per questionnaire unit -> factor converting into that unit
+UNIT_CONVERSIONS = {
+    "tonnes": {
+        "t": 1, "tonne": 1, "tonnes": 1, "ton": 1, "tons": 1, "mt": 1, "metric tonnes": 1,
+        "metric tons": 1, "tpa": 1, "kg": 1e-3, "kgs": 1e-3, "kilograms": 1e-3,
+        "kt": 1e3, "kilotonnes": 1e3, "kilotons": 1e3, "mtpa": 1e6,
+    },
+    "MWh": {
+        "mwh": 1, "megawatt hours": 1, "kwh": 1e-3, "units": 1e-3, "kilowatt hours": 1e-3,
+        "gwh": 1e3, "gigawatt hours": 1e3,
+    },
+    "kL": {
+        "kl": 1, "kilolitres": 1, "kiloliters": 1, "kilolitre": 1, "kiloliter": 1,
+        "l": 1e-3, "litres": 1e-3, "liters": 1e-3, "litre": 1e-3, "liter": 1e-3, "ltr": 1e-3,
+    },
+    "m³": {
+        "m3": 1, "m³": 1, "cubic meters": 1, "cubic metres": 1, "cum": 1, "kl": 1,
+        "litres": 1e-3, "liters": 1e-3, "ml": 1e3, "megalitres": 1e3, "megaliters": 1e3,
+    },
+    "'000 m³": {
+        "m3": 1e-3, "m³": 1e-3, "cubic meters": 1e-3, "cubic metres": 1e-3, "scm": 1e-3,
+        "mmscm": 1e3,
+    },
+}
+
+_NUMBER_PATTERN = re.compile(r"(?<![\w.])(\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)(?![\w.]*%)")
+_SCALE_PATTERN = re.compile(
+    r"\s*(" + "|".join(sorted(map(re.escape, SCALE_WORDS), key=len, reverse=True)) + r")(?![a-z])"
+)
+_UNIT_PATTERNS = {
+    unit: re.compile(
+        r"\s*(" + "|".join(sorted(map(re.escape, aliases), key=len, reverse=True)) + r")(?![a-z0-9])"
+    )
+    for unit, aliases in UNIT_CONVERSIONS.items()
+}
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Four-digit years are ignored when another number is present ("2.5 lakh tonnes in 2023")
+_YEAR_RANGE = (1950, 2100)
+
+LLM_ANSWER_CACHE_SIZE = 2048
+
+
+class NumberCandidate:
+    """A number found in a reply, with any scale word and unit that followed it"""
+
+    def __init__(self, value: float, raw: str, scaled: bool, has_unit: bool):
+        self.value = value
+        self.raw = raw
+        self.scaled = scaled
+        self.has_unit = has_unit
+
+    @property
+    def marked(self) -> bool:
+        return self.scaled or self.has_unit
+
+    @property
+    def looks_like_year(self) -> bool:
+        return (
+            not self.marked and self.raw.isdigit() and len(self.raw) == 4
+            and _YEAR_RANGE[0] <= int(self.raw) <= _YEAR_RANGE[1]
+        )
+
+
+def find_numbers(message: str, unit: Optional[str] = None) -> List[NumberCandidate]:
+    """Find every number in a reply, applying scale words and converting units into `unit`"""
+    text = message.lower()
+    unit_pattern = _UNIT_PATTERNS.get(unit)
+    unit_factors = UNIT_CONVERSIONS.get(unit, {})
+    candidates = []
+    for match in _NUMBER_PATTERN.finditer(text):
+        raw = match.group(1)
+        value = float(raw.replace(",", ""))
+        position = match.end()
+
+        scaled = False
+        scale_match = _SCALE_PATTERN.match(text, position)
+        if scale_match:
+            value *= SCALE_WORDS[scale_match.group(1)]
+            position = scale_match.end()
+            scaled = True
+
+        has_unit = False
+        if unit_pattern is not None:
+            unit_match = unit_pattern.match(text, position)
+            if unit_match:
+                value *= unit_factors[unit_match.group(1)]
+                has_unit = True
+
+        candidates.append(NumberCandidate(value, raw, scaled, has_unit))
+    return candidates
+
+
+def parse_number_answer(message: str, unit: Optional[str] = None) -> Optional[float]:
+    """
+    Parse a numeric answer, or None if the reply is ambiguous
+
+    A number with a scale word or unit wins; otherwise the reply must contain
+    exactly one number (years are skipped when something else is present).
+    """
+    candidates = find_numbers(message, unit)
+    if len(candidates) > 1:
+        candidates = [candidate for candidate in candidates if not candidate.looks_like_year] or candidates
+
+    marked = [candidate for candidate in candidates if candidate.marked]
+    if marked:
+        chosen = marked[0]
+    elif len(candidates) == 1:
+        chosen = candidates[0]
+    else:
+        return None
+
+    value = round(chosen.value, 6)
+    return value if value > 0 else None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class OptionIndex:
+    """
+    Token index over a select question's options
+
+    Options are matched by exact text, by acronym ("EAF"), and by tokens (or
+    close misspellings of tokens) that appear in only one option.
+    """
+
+    FUZZY_CUTOFF = 0.8
+
+    def __init__(self, options: List[str]):
+        self.options = options
+        self.exact = {option.lower(): option for option in options}
+        self.acronyms: Dict[str, str] = {}
+        self.postings: Dict[str, List[str]] = {}
+        for option in options:
+            words = tokenize(option)
+            if len(words) > 1:
+                self.acronyms["".join(word[0] for word in words)] = option
+            for word in set(words):
+                self.postings.setdefault(word, []).append(option)
+        self.vocabulary = [token for token in self.postings if len(token) > 3]
+
+    def _lookup(self, token: str) -> Optional[str]:
+        if token in self.postings:
+            return token
+        if len(token) > 3:
+            close = difflib.get_close_matches(token, self.vocabulary, n=1, cutoff=self.FUZZY_CUTOFF)
+            if close:
+                return close[0]
+        return None
+
+    def match(self, message: str) -> Optional[str]:
+        """Return the option the reply picks, or None if no option or several options fit"""
+        normalized = " ".join(tokenize(message))
+        if normalized in self.exact:
+            return self.exact[normalized]
+        for option_text, option in self.exact.items():
+            if option_text in message.lower():
+                return option
+
+        distinctive = set()
+        for token in tokenize(message):
+            if token in self.acronyms:
+                distinctive.add(self.acronyms[token])
+                continue
+            matched = self._lookup(token)
+            if matched is not None and len(self.postings[matched]) == 1:
+                distinctive.add(self.postings[matched][0])
+
+        # Replies naming two different options ("blast ... arc") are left to the LLM
+        if len(distinctive) != 1:
+            return None
+        return distinctive.pop()
+
+
+def build_option_indexes() -> Dict[Tuple[str, str], OptionIndex]:
+    """Index every select question in the questionnaires"""
+    return {
+        (sector, question["id"]): OptionIndex(question["options"])
+        for sector, questions in QUESTIONNAIRES.items()
+        for question in questions
+        if question.get("type") == "select" and question.get("options")
+    }
+
+
+OPTION_INDEXES = build_option_indexes()
+
+
+def parse_answer(sector: str, question: Dict[str, Any], message: str) -> Optional[Any]:
+    """Extract an answer to a questionnaire question without calling the LLM"""
+    question_type = question.get("type")
+    if question_type == "number":
+        return parse_number_answer(message, question.get("unit"))
+    if question_type == "select":
+        index = OPTION_INDEXES.get((sector, question.get("id")))
+        if index is None:
+            index = OptionIndex(question.get("options", []))
+        return index.match(message)
+    return None
+
+
+# LLM fallback results: (sector, question id, normalized reply) -> answer or None
+_llm_answer_cache: "OrderedDict[Tuple[str, str, str], Optional[Any]]" = OrderedDict()
+
+# Counts of how each turn's answer was resolved: local, llm, llm_cached
+extraction_stats: Counter = Counter()
+
+
+def llm_cache_key(sector: str, question: Dict[str, Any], message: str) -> Tuple[str, str, str]:
+    return (sector, question.get("id", ""), " ".join(message.lower().split()))
+
+
+def get_cached_llm_answer(key: Tuple[str, str, str]) -> Tuple[bool, Optional[Any]]:
+    """Return (hit, answer) for a reply the LLM has already parsed"""
+    if key not in _llm_answer_cache:
+        return False, None
+    _llm_answer_cache.move_to_end(key)
+    return True, _llm_answer_cache[key]
+
+
+def set_cached_llm_answer(key: Tuple[str, str, str], answer: Optional[Any]) -> None:
+    _llm_answer_cache[key] = answer
+    _llm_answer_cache.move_to_end(key)
+    while len(_llm_answer_cache) > LLM_ANSWER_CACHE_SIZE:
+        _llm_answer_cache.popitem(last=False)
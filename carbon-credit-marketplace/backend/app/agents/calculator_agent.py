@@ -3,11 +3,13 @@ Calculator Agent - Calculate emissions and credit needs
 """
 
 import math
-import re
 import json
 from typing import Dict, Any, Optional
 from app.data.emission_factors import EMISSION_FACTORS, QUESTIONNAIRES
 from app.agents.llm_client import get_completion, get_completion_stream
+from app.agents.answer_extraction import (
+    parse_answer, llm_cache_key, get_cached_llm_answer, set_cached_llm_answer, extraction_stats
+)
 
 
 def get_questions_for_sector(sector: str) -> list:
@@ -181,59 +183,52 @@ async def extract_answer_from_message(state: Dict[str, Any], user_message: str)
         return None
     
     current_question = questions[current_index]
+    
+    # Deterministic parse first: units, lakh/crore, option acronyms and typos
+    answer = parse_answer(state["sector"], current_question, user_message)
+    if answer is not None:
+        extraction_stats["local"] += 1
+        return answer
+    
+    cache_key = llm_cache_key(state["sector"], current_question, user_message)
+    hit, answer = get_cached_llm_answer(cache_key)
+    if hit:
+        extraction_stats["llm_cached"] += 1
+        return answer
+    
+    extraction_stats["llm"] += 1
+    try:
+        answer = await extract_answer_with_llm(current_question, user_message)
+    except Exception:
+        # Don't cache API failures; the next identical reply tries again
+        return None
+    set_cached_llm_answer(cache_key, answer)
+    return answer
+
+
+async def extract_answer_with_llm(current_question: Dict[str, Any], user_message: str) -> Optional[Any]:
+    """Ask the LLM to extract an answer the local parser could not (raises on API errors)"""
     question_type = current_question.get("type")
     
     if question_type == "number":
-        # Extract number from message using regex
-        # Look for numbers with optional decimal points
-        numbers = re.findall(r'\d+\.?\d*', user_message.replace(',', ''))
-        if numbers:
-            try:
-                value = float(numbers[0])
-                if value > 0:
-                    return value
-            except ValueError:
-                pass
-        # Try using LLM as fallback
-        try:
-            prompt = f"""Extract a numerical value from the following user message. 
+        prompt = f"""Extract a numerical value from the following user message. 
 The user is answering: "{current_question.get('question')}" (unit: {current_question.get('unit', 'N/A')})
 
 User message: "{user_message}"
 
 Return ONLY the numerical value as a number (no text, no explanation). If no clear number is found, return "null"."""
-            result = await get_completion(prompt, "You are a helpful assistant that extracts numerical values from text.")
-            try:
-                value = float(result.strip())
-                if value > 0:
-                    return value
-            except ValueError:
-                pass
-        except:
+        result = await get_completion(prompt, "You are a helpful assistant that extracts numerical values from text.")
+        try:
+            value = float(result.strip())
+            if value > 0:
+                return value
+        except ValueError:
             pass
         return None
     
     elif question_type == "select":
-        # Match user response to options
         options = current_question.get("options", [])
-        user_message_lower = user_message.lower().strip()
-        
-        # Direct matching
-        for option in options:
-            if option.lower() == user_message_lower:
-                return option
-            if option.lower() in user_message_lower or user_message_lower in option.lower():
-                return option
-        
-        # Check for partial matches
-        for option in options:
-            option_words = option.lower().split()
-            if any(word in user_message_lower for word in option_words if len(word) > 3):
-                return option
-        
-        # Try using LLM as fallback
-        try:
-            prompt = f"""Extract the selected option from the following user message.
+        prompt = f"""Extract the selected option from the following user message.
 The user is answering: "{current_question.get('question')}"
 
 Available options: {', '.join(options)}
@@ -241,12 +236,10 @@ Available options: {', '.join(options)}
 User message: "{user_message}"
 
 Return ONLY the exact option text that matches the user's message. If no clear match, return "null"."""
-            result = await get_completion(prompt, "You are a helpful assistant that matches user text to options.")
-            result = result.strip().strip('"').strip("'")
-            if result in options:
-                return result
-        except:
-            pass
+        result = await get_completion(prompt, "You are a helpful assistant that matches user text to options.")
+        result = result.strip().strip('"').strip("'")
+        if result in options:
+            return result
         return None
     
     return None
@@ -426,8 +419,7 @@ async def chat_with_calculator_agent_stream(question: str, conversation_state: O
 """
             
             # Stream the results message
-            for char in results_message:
-                yield char
+            yield results_message
             
             state["status"] = "calculation_complete"
             state["conversation_history"].append({"role": "assistant", "content": results_message})
@@ -441,22 +433,19 @@ async def chat_with_calculator_agent_stream(question: str, conversation_state: O
         next_question = get_next_question(state)
         if next_question:
             # Stream the question
-            for char in next_question:
-                yield char
+            yield next_question
             state["conversation_history"].append({"role": "assistant", "content": next_question})
             yield json.dumps({"type": "state", "conversation_state": state})
             return
         
         # If no question, provide helpful response
         response = "I need more information to proceed. Please answer the questions I've asked."
-        for char in response:
-            yield char
+        yield response
         state["conversation_history"].append({"role": "assistant", "content": response})
         yield json.dumps({"type": "state", "conversation_state": state})
         
     except Exception as e:
         error_message = f"I encountered an error: {str(e)}. Please try again or start a new calculation."
-        for char in error_message:
-            yield char
+        yield error_message
         error_json = json.dumps({"type": "error", "message": str(e)})
         yield error_json
@@ -4,7 +4,62 @@ Education Agent - RAG-based Q&A about carbon credits
 
 from app.agents.qdrant_client import search_documents
 from app.agents.llm_client import get_completion, get_completion_stream
+from app.config import get_settings
+from app.core.tokens import count_tokens, truncate_to_tokens
 import json
+from typing import Optional
+
+settings = get_settings()
+
+# A document that only fits partially is included if at least this many tokens of it fit
+MIN_PARTIAL_CONTEXT_TOKENS = 50
+
+SYSTEM_PROMPT = """You are an expert on carbon credits, Indian government regulations, and carbon credit marketplaces. 
+Your role is to provide accurate, helpful information based on the provided context documents.
+Always cite your sources when answering questions.
+If the context doesn't contain enough information, say so clearly.
+Keep answers concise but informative."""
+
+USER_PROMPT_TEMPLATE = """Based on the following context documents about carbon credits in India, please answer the user's question.
+
+Context Documents:
+{context}
+
+User Question: {question}
+
+Please provide a clear, accurate answer based on the context. If relevant, mention which sections or topics your answer is based on."""
+
+
+def build_prompt(question: str, relevant_docs: list[dict], token_budget: Optional[int] = None) -> tuple[list[dict], str]:
+    """
+    Build the user prompt, packing retrieved documents in rank order until
+    system prompt + user prompt reach the token budget
+    
+    Returns:
+        tuple: (documents actually included, user prompt)
+    """
+    if token_budget is None:
+        token_budget = settings.RAG_PROMPT_TOKEN_BUDGET
+    remaining = token_budget - count_tokens(SYSTEM_PROMPT) - count_tokens(
+        USER_PROMPT_TEMPLATE.format(context="", question=question)
+    )
+    
+    included = []
+    blocks = []
+    for doc in relevant_docs:
+        block = f"[Section: {doc['section']}]\n{doc['text']}"
+        block_tokens = count_tokens(block) + 1  # + the blank line between blocks
+        if block_tokens <= remaining:
+            blocks.append(block)
+            included.append(doc)
+            remaining -= block_tokens
+            continue
+        if remaining >= MIN_PARTIAL_CONTEXT_TOKENS:
+            blocks.append(truncate_to_tokens(block, remaining - 1))
+            included.append(doc)
+        break
+    
+    return included, USER_PROMPT_TEMPLATE.format(context="\n\n".join(blocks), question=question)
 
 
 async def chat_with_education_agent(question: str) -> dict:
@@ -24,30 +79,11 @@ async def chat_with_education_agent(question: str) -> dict:
                 "sources": []
             }
         
-        # Step 2: Build context from retrieved documents
-        context = "\n\n".join([
-            f"[Section: {doc['section']}]\n{doc['text']}"
-            for doc in relevant_docs
-        ])
-        
-        # Step 3: Build prompt with context
-        system_prompt = """You are an expert on carbon credits, Indian government regulations, and carbon credit marketplaces. 
-Your role is to provide accurate, helpful information based on the provided context documents.
-Always cite your sources when answering questions.
-If the context doesn't contain enough information, say so clearly.
-Keep answers concise but informative."""
-        
-        user_prompt = f"""Based on the following context documents about carbon credits in India, please answer the user's question.
-
-Context Documents:
-{context}
-
-User Question: {question}
-
-Please provide a clear, accurate answer based on the context. If relevant, mention which sections or topics your answer is based on."""
+        # Step 2-3: Build prompt with as much retrieved context as the token budget allows
+        relevant_docs, user_prompt = build_prompt(question, relevant_docs)
         
         # Step 4: Get LLM completion
-        answer = await get_completion(user_prompt, system_prompt)
+        answer = await get_completion(user_prompt, SYSTEM_PROMPT)
         
         # Step 5: Extract sources
         sources = list(set([
@@ -81,30 +117,11 @@ async def chat_with_education_agent_stream(question: str):
             yield json.dumps({"type": "sources", "sources": []})
             return
         
-        # Step 2: Build context from retrieved documents
-        context = "\n\n".join([
-            f"[Section: {doc['section']}]\n{doc['text']}"
-            for doc in relevant_docs
-        ])
-        
-        # Step 3: Build prompt with context
-        system_prompt = """You are an expert on carbon credits, Indian government regulations, and carbon credit marketplaces. 
-Your role is to provide accurate, helpful information based on the provided context documents.
-Always cite your sources when answering questions.
-If the context doesn't contain enough information, say so clearly.
-Keep answers concise but informative."""
-        
-        user_prompt = f"""Based on the following context documents about carbon credits in India, please answer the user's question.
-
-Context Documents:
-{context}
-
-User Question: {question}
-
-Please provide a clear, accurate answer based on the context. If relevant, mention which sections or topics your answer is based on."""
+        # Step 2-3: Build prompt with as much retrieved context as the token budget allows
+        relevant_docs, user_prompt = build_prompt(question, relevant_docs)
         
         # Step 4: Stream LLM completion
-        async for chunk in get_completion_stream(user_prompt, system_prompt):
+        async for chunk in get_completion_stream(user_prompt, SYSTEM_PROMPT):
             yield chunk
         
         # Step 5: Extract sources and send as final event
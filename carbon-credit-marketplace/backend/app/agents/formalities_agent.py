@@ -1,11 +1,20 @@
 """
 Formalities Advisor Agent - Interactive guide through government procedures
 """
-from typing import Dict, Any, Optional, List
-from app.agents.formalities_qdrant import search_formalities_documents
+from typing import Dict, Any, Optional, List, Tuple
+from app.agents.formalities_qdrant import (
+    search_formalities_documents, compute_formalities_corpus_hash, get_formalities_documents_dir
+)
 from app.agents.llm_client import get_completion, get_completion_stream
+import asyncio
+import hashlib
 import json
+import logging
+import os
 import re
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 
 # Workflow definitions (same as in formalities.py API)
@@ -125,8 +134,136 @@ def get_next_question(state: Dict[str, Any]) -> Optional[str]:
     return None  # No question needed, will provide step guidance
 
 
+# ==================== PRECOMPUTED STEP GUIDANCE ====================
+# "How to obtain documents" text depends only on WORKFLOWS and the formalities
+# corpus, so it is generated once per corpus version (at ingestion/startup),
+# kept in memory and persisted next to the corpus. Serving a step never calls
+# Qdrant or the LLM.
+
+STEP_GUIDANCE_PROMPT_VERSION = "v1"
+STEP_GUIDANCE_CACHE_PATH = os.path.join(os.path.dirname(get_formalities_documents_dir()), "formalities_guidance.json")
+
+# (workflow, step) -> how-to-obtain-documents text for the current corpus version
+_document_guidance: Dict[Tuple[str, int], str] = {}
+_guidance_version: Optional[str] = None
+
+
+def compute_guidance_version(documents_dir: str = None) -> str:
+    """Version key covering the corpus, the workflow definitions and the prompt"""
+    digest = hashlib.sha256()
+    digest.update(compute_formalities_corpus_hash(documents_dir).encode("utf-8"))
+    digest.update(json.dumps(WORKFLOWS, sort_keys=True).encode("utf-8"))
+    digest.update(STEP_GUIDANCE_PROMPT_VERSION.encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def generate_document_guidance(step: Dict[str, Any]) -> Optional[str]:
+    """Use RAG to explain how to obtain a step's documents"""
+    doc_query = f"How to obtain {', '.join(step['documents'])} for {step['title']}"
+    relevant_docs = await search_formalities_documents(doc_query, limit=3)
+    if not relevant_docs:
+        return None
+    
+    context = "\n\n".join([f"[{doc['section']}]\n{doc['text']}" for doc in relevant_docs[:2]])
+    
+    rag_prompt = f"""Based on the following context documents, provide a brief explanation of how to obtain the required documents for {step['title']}.
+
+Required Documents: {', '.join(step['documents'])}
+
+Context:
+{context}
+
+Provide a concise answer (2-3 sentences) on how to obtain these documents."""
+    
+    return await get_completion(rag_prompt, "You are a helpful assistant providing guidance on obtaining government documents.")
+
+
+def _load_guidance_file(path: str, version: str) -> Dict[Tuple[str, int], str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != version:
+        return {}
+    return {
+        (entry["workflow"], entry["step"]): entry["guidance"]
+        for entry in data.get("guidance", [])
+    }
+
+
+def _save_guidance_file(path: str, version: str, guidance: Dict[Tuple[str, int], str]) -> None:
+    data = {
+        "version": version,
+        "guidance": [
+            {"workflow": workflow, "step": step, "guidance": text}
+            for (workflow, step), text in sorted(guidance.items())
+        ]
+    }
+    # Every worker precomputes at startup; a temp file per writer keeps their writes apart
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=os.path.dirname(path) or ".",
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+    ) as f:
+        tmp_path = f.name
+        try:
+            json.dump(data, f, indent=2)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+
+async def precompute_step_guidance(documents_dir: str = None, cache_path: str = STEP_GUIDANCE_CACHE_PATH) -> int:
+    """
+    Make document guidance for every (workflow, step) available in memory
+    
+    Loads the persisted guidance when its version matches the corpus, and
+    generates only the pairs that are missing (all of them after the corpus
+    changes). Returns the number of pairs generated.
+    """
+    global _document_guidance, _guidance_version
+    
+    version = compute_guidance_version(documents_dir)
+    if version == _guidance_version:
+        guidance = dict(_document_guidance)
+    else:
+        guidance = _load_guidance_file(cache_path, version)
+    
+    missing = [
+        (workflow_type, step)
+        for workflow_type, workflow in WORKFLOWS.items()
+        for step in workflow["steps"]
+        if step.get("documents") and (workflow_type, step["step"]) not in guidance
+    ]
+    results = await asyncio.gather(
+        *(generate_document_guidance(step) for _, step in missing),
+        return_exceptions=True
+    )
+    
+    generated = 0
+    for (workflow_type, step), result in zip(missing, results):
+        if isinstance(result, Exception):
+            logger.warning(
+                "Step guidance generation failed",
+                extra={"workflow_type": workflow_type, "step": step["step"], "error": str(result)}
+            )
+        elif result:
+            guidance[(workflow_type, step["step"])] = result
+            generated += 1
+    
+    _document_guidance = guidance
+    _guidance_version = version
+    if generated:
+        try:
+            _save_guidance_file(cache_path, version, guidance)
+        except OSError as e:
+            logger.warning("Could not persist step guidance", extra={"error": str(e)})
+    return generated
+
+
 async def get_step_guidance(state: Dict[str, Any], use_rag: bool = True) -> str:
-    """Get guidance for current step"""
+    """Get guidance for current step (no Qdrant or LLM calls)"""
     workflow = WORKFLOWS.get(state.get("current_workflow"))
     if not workflow:
         return "I need to know which workflow you're working on. Please let me know if you're a buyer or seller."
@@ -149,29 +286,11 @@ async def get_step_guidance(state: Dict[str, Any], use_rag: bool = True) -> str:
             guidance += f"- {doc}\n"
         guidance += "\n"
         
-        # Use RAG to get information about how to obtain documents
+        # Precomputed from the corpus; omitted if generation failed at startup
         if use_rag:
-            try:
-                doc_query = f"How to obtain {', '.join(step['documents'])} for {step['title']}"
-                relevant_docs = await search_formalities_documents(doc_query, limit=3)
-                
-                if relevant_docs:
-                    context = "\n\n".join([f"[{doc['section']}]\n{doc['text']}" for doc in relevant_docs[:2]])
-                    
-                    rag_prompt = f"""Based on the following context documents, provide a brief explanation of how to obtain the required documents for {step['title']}.
-
-Required Documents: {', '.join(step['documents'])}
-
-Context:
-{context}
-
-Provide a concise answer (2-3 sentences) on how to obtain these documents."""
-                    
-                    rag_response = await get_completion(rag_prompt, "You are a helpful assistant providing guidance on obtaining government documents.")
-                    guidance += f"**How to Obtain Documents:**\n\n{rag_response}\n\n"
-            except Exception as e:
-                # If RAG fails, continue without it
-                pass
+            document_guidance = _document_guidance.get((state["current_workflow"], step["step"]))
+            if document_guidance:
+                guidance += f"**How to Obtain Documents:**\n\n{document_guidance}\n\n"
     
     guidance += "When you're ready to move to the next step, let me know by saying 'ready for next step' or 'complete this step'."
     
@@ -325,8 +444,7 @@ async def chat_with_formalities_agent_stream(question: str, conversation_state:
         
         if next_question:
             # Simple question response - yield immediately
-            for char in next_question:
-                yield char
+            yield next_question
             state["conversation_history"].append({"role": "assistant", "content": next_question})
             yield json.dumps({"type": "state", "conversation_state": state})
             return
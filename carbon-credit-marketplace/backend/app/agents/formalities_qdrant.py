@@ -2,17 +2,27 @@
 Qdrant client for formalities documents collection
 """
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, VectorParams
 from app.config import get_settings
 from app.agents.llm_client import get_embedding
+from app.core.metrics import external_call
+from app.services.hybrid_index import SearchHit, search_corpus
+from app.services.ingestion_pipeline import IngestionPipeline
+import asyncio
+import hashlib
+import logging
 import os
 from typing import List, Dict
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Initialize Qdrant client
 client = QdrantClient(url=settings.QDRANT_URL)
 
+# Name of the in-process index for the formalities corpus
+FORMALITIES_INDEX = "formalities"
+
 
 async def init_formalities_collection():
     """Initialize Qdrant collection for formalities documents"""
@@ -29,88 +39,46 @@ async def init_formalities_collection():
                     distance=Distance.COSINE
                 )
             )
-            print(f"✅ Qdrant formalities collection '{settings.QDRANT_FORMALITIES_COLLECTION_NAME}' created")
+            logger.info("Qdrant formalities collection created", extra={"collection": settings.QDRANT_FORMALITIES_COLLECTION_NAME})
         else:
-            print(f"✅ Qdrant formalities collection '{settings.QDRANT_FORMALITIES_COLLECTION_NAME}' already exists")
+            logger.info("Qdrant formalities collection already exists", extra={"collection": settings.QDRANT_FORMALITIES_COLLECTION_NAME})
     except Exception as e:
-        print(f"⚠️  Error initializing formalities collection: {str(e)}")
+        logger.warning("Error initializing formalities collection", extra={"error": str(e)})
         raise
 
 
-def split_into_chunks(text: str, chunk_size: int = 500) -> List[Dict[str, str]]:
-    """Split text into chunks of approximately chunk_size words"""
-    lines = text.split('\n')
-    chunks = []
-    current_section = "Introduction"
-    
-    current_chunk_lines = []
-    current_chunk_word_count = 0
-    
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Detect section headers (lines starting with ##)
-        if line_stripped.startswith("##"):
-            # Save current chunk if it has content
-            if current_chunk_lines:
-                chunk_text = '\n'.join(current_chunk_lines).strip()
-                if chunk_text:
-                    chunks.append({
-                        "text": chunk_text,
-                        "section": current_section
-                    })
-                current_chunk_lines = []
-                current_chunk_word_count = 0
-            
-            # Extract section name
-            section_name = line_stripped.lstrip('#').strip()
-            if section_name:
-                current_section = section_name
-            continue
-        
-        # Skip empty lines at chunk boundaries
-        if not line_stripped and not current_chunk_lines:
-            continue
-        
-        # Count words in this line
-        line_words = line_stripped.split()
-        line_word_count = len(line_words)
-        
-        # If adding this line would exceed chunk size, save current chunk
-        if current_chunk_word_count + line_word_count >= chunk_size and current_chunk_lines:
-            chunk_text = '\n'.join(current_chunk_lines).strip()
-            if chunk_text:
-                chunks.append({
-                    "text": chunk_text,
-                    "section": current_section
-                })
-            current_chunk_lines = [line]
-            current_chunk_word_count = line_word_count
-        else:
-            current_chunk_lines.append(line)
-            current_chunk_word_count += line_word_count
-    
-    # Add remaining chunk
-    if current_chunk_lines:
-        chunk_text = '\n'.join(current_chunk_lines).strip()
-        if chunk_text:
-            chunks.append({
-                "text": chunk_text,
-                "section": current_section
-            })
+def get_formalities_documents_dir() -> str:
+    """Default directory holding the formalities corpus"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    return os.path.join(base_dir, "documents", "formalities")
+
+
+def compute_formalities_corpus_hash(documents_dir: str = None) -> str:
+    """sha256 over the relative paths and contents of every formalities document"""
+    from app.services.document_fetcher import get_local_documents
     
-    return chunks
+    documents_dir = documents_dir or get_formalities_documents_dir()
+    digest = hashlib.sha256()
+    for doc in sorted(get_local_documents(documents_dir), key=lambda d: d["path"]):
+        digest.update(os.path.relpath(doc["path"], documents_dir).encode("utf-8") + b"\0")
+        with open(doc["path"], "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
 
 
-async def ingest_formalities_documents(documents_dir: str = None):
-    """Ingest formalities documents into Qdrant"""
+async def ingest_formalities_documents(documents_dir: str = None, resume: bool = True):
+    """
+    Ingest formalities documents into Qdrant and the in-process index
+    
+    Runs the streaming ingestion pipeline; with resume, documents unchanged
+    since the last completed ingestion are not re-parsed or re-embedded.
+    """
     try:
-        from app.services.document_fetcher import get_local_documents, read_local_document, parse_html_to_text, parse_pdf_to_text
+        from app.services.document_fetcher import get_local_documents
         
         # Determine documents directory
         if documents_dir is None:
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            documents_dir = os.path.join(base_dir, "documents", "formalities")
+            documents_dir = get_formalities_documents_dir()
         
         # Ensure directory exists
         os.makedirs(documents_dir, exist_ok=True)
@@ -119,95 +87,65 @@ async def ingest_formalities_documents(documents_dir: str = None):
         documents = get_local_documents(documents_dir)
         
         if not documents:
-            print(f"⚠️  No documents found in {documents_dir}")
-            print("💡 Add documents to the formalities directory to enable RAG")
+            logger.warning("No formalities documents found; add documents to the directory to enable RAG", extra={"path": documents_dir})
             return
         
-        print(f"📄 Found {len(documents)} documents to ingest...")
+        logger.info("Found formalities documents to ingest", extra={"documents": len(documents)})
         
-        all_points = []
-        point_id = 0
-        
-        for doc in documents:
-            try:
-                # Read document content
-                if doc["type"] == "pdf":
-                    content = parse_pdf_to_text(doc["path"])
-                elif doc["type"] == "html":
-                    content = read_local_document(doc["path"])
-                    content = parse_html_to_text(content)
-                else:
-                    content = read_local_document(doc["path"])
-                
-                # Split into chunks
-                chunks = split_into_chunks(content, chunk_size=500)
-                
-                print(f"  📝 Processing {doc['filename']}: {len(chunks)} chunks")
-                
-                # Generate embeddings and create points
-                for chunk in chunks:
-                    embedding = await get_embedding(chunk["text"])
-                    
-                    point = PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload={
-                            "text": chunk["text"],
-                            "section": chunk.get("section", "Unknown"),
-                            "chunk_index": point_id,
-                            "source": doc["filename"],
-                            "category": doc.get("category", "general"),
-                            "file_type": doc["type"]
-                        }
-                    )
-                    all_points.append(point)
-                    point_id += 1
-                    
-            except Exception as e:
-                print(f"⚠️  Error processing {doc['filename']}: {str(e)}")
-                continue
-        
-        if not all_points:
-            print("⚠️  No document chunks to ingest")
-            return
-        
-        # Batch upload points (upsert to allow re-ingestion)
-        client.upsert(
+        pipeline = IngestionPipeline(
+            client,
             collection_name=settings.QDRANT_FORMALITIES_COLLECTION_NAME,
-            points=all_points
+            index_name=FORMALITIES_INDEX,
+            max_tokens=settings.RAG_CHUNK_MAX_TOKENS,
+            overlap_tokens=settings.RAG_CHUNK_OVERLAP_TOKENS,
+            checkpoint_path=os.path.join(
+                os.path.dirname(documents_dir), f".ingest_{settings.QDRANT_FORMALITIES_COLLECTION_NAME}.json"
+            )
         )
+        stats = await pipeline.run(documents, base_dir=documents_dir, resume=resume)
+        logger.info(stats.report())
+        if stats.failed:
+            raise Exception(f"{stats.failed} documents could not be fully ingested")
         
-        print(f"✅ Ingested {len(all_points)} document chunks into formalities collection")
+        logger.info("Ingested formalities documents", extra={"documents": stats.completed + stats.skipped})
     except Exception as e:
-        print(f"⚠️  Error ingesting formalities documents: {str(e)}")
+        logger.warning("Error ingesting formalities documents", extra={"error": str(e)})
         raise
 
 
-async def search_formalities_documents(query: str, limit: int = 5) -> List[Dict]:
-    """Search for relevant formalities document chunks"""
-    try:
-        # Generate query embedding
-        query_embedding = await get_embedding(query)
-        
-        # Search Qdrant
-        results = client.search(
+async def _qdrant_search(query_embedding: List[float], limit: int) -> List[SearchHit]:
+    with external_call("qdrant", "search"):
+        results = await asyncio.to_thread(
+            client.search,
             collection_name=settings.QDRANT_FORMALITIES_COLLECTION_NAME,
             query_vector=query_embedding,
             limit=limit
         )
+    return [(result.payload, result.score) for result in results]
+
+
+async def search_formalities_documents(query: str, limit: int = 5) -> List[Dict]:
+    """Search for relevant formalities document chunks (in-process hybrid index, Qdrant for large corpora or as fallback)"""
+    try:
+        hits = await search_corpus(
+            FORMALITIES_INDEX, query, limit,
+            embed=get_embedding,
+            remote_search=_qdrant_search,
+            local_max_chunks=settings.RAG_LOCAL_INDEX_MAX_CHUNKS
+        )
         
         # Format results
         documents = []
-        for result in results:
+        for payload, score in hits:
             documents.append({
-                "text": result.payload.get("text", ""),
-                "section": result.payload.get("section", "Unknown"),
-                "score": result.score,
-                "source": result.payload.get("source", "Unknown"),
-                "category": result.payload.get("category", "general")
+                "text": payload.get("text", ""),
+                "section": payload.get("section", "Unknown"),
+                "score": score,
+                "source": payload.get("source", "Unknown"),
+                "category": payload.get("category", "general")
             })
         
         return documents
     except Exception as e:
-        print(f"⚠️  Error searching formalities documents: {str(e)}")
+        logger.warning("Error searching formalities documents", extra={"error": str(e)})
         return []
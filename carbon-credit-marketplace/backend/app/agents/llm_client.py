@@ -1,28 +1,378 @@
 """
 OpenAI LLM client wrapper
+
+Every OpenAI call goes through `gateway`, which keeps one lane per model:
+
+- a semaphore caps concurrent requests; callers waiting on it form the
+  lane's queue, and a caller that waits longer than the queue timeout is
+  turned away instead of piling up
+- a token bucket paces request starts to the configured requests/minute
+- rate limits, timeouts, connection errors and 5xx responses are retried
+  with jittered exponential backoff (honouring Retry-After)
+- a circuit breaker opens after repeated timeouts/5xx errors, so callers
+  fail fast into their fallbacks until a probe request succeeds again
+
+The SDK's own retries are disabled so the gateway is the only retry layer.
 """
 
+import asyncio
+import random
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import openai
 from openai import AsyncOpenAI
 from app.config import get_settings
+from app.core.metrics import REGISTRY, external_call
 
 settings = get_settings()
 
+T = TypeVar("T")
+
 # Initialize OpenAI client
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL or None,
+    timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+    max_retries=0
+)
+
+# Errors worth retrying; only outage-type errors count towards the circuit breaker
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError
+)
+CIRCUIT_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the API when a model's circuit is open or its queue is full"""
+
+
+class TokenBucket:
+    """Token bucket pacing request starts to `rate` per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; after
+    `reset_seconds` one probe request is let through (half-open), and its
+    outcome closes or re-opens the circuit. A probe that never reports back
+    (cancelled while queued) is replaced after another reset_seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if state == self.HALF_OPEN and (
+            self._probe_started is None or now - self._probe_started >= self.reset_seconds
+        ):
+            self._probe_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe_started is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probe_started = None
+
+
+class ModelLane:
+    """Concurrency, pacing, circuit state and counters for one model"""
+
+    def __init__(self, model: str, concurrency: int, requests_per_minute: int, failure_threshold: int, reset_seconds: float):
+        self.model = model
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, capacity=concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.waiting = 0
+        self.in_flight = 0
+        self.queue_wait_seconds = 0.0
+        self.counters: Counter = Counter()
+
+    def snapshot(self) -> Dict[str, Any]:
+        started = self.counters["started"]
+        return {
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "circuit": self.breaker.state,
+            "requests": started,
+            "succeeded": self.counters["succeeded"],
+            "failed": self.counters["failed"],
+            "retries": self.counters["retries"],
+            "rejected": self.counters["rejected"],
+            "avg_queue_wait_ms": round(1000 * self.queue_wait_seconds / started, 1) if started else 0.0,
+        }
+
+
+class LLMGateway:
+    """Per-model concurrency limits, rate limiting, retries and circuit breaking for OpenAI calls"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        requests_per_minute: int,
+        max_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        failure_threshold: int,
+        reset_seconds: float,
+        queue_timeout_seconds: float,
+        model_concurrency: Optional[Dict[str, int]] = None
+    ):
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.model_concurrency = model_concurrency or {}
+        self.lanes: Dict[str, ModelLane] = {}
+
+    def lane(self, model: str) -> ModelLane:
+        if model not in self.lanes:
+            self.lanes[model] = ModelLane(
+                model,
+                self.model_concurrency.get(model, self.concurrency),
+                self.requests_per_minute,
+                self.failure_threshold,
+                self.reset_seconds
+            )
+        return self.lanes[model]
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """Full-jitter exponential backoff, at least the server's Retry-After, capped"""
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return min(delay, self.backoff_max_seconds)
+
+    @asynccontextmanager
+    async def _slot(self, lane: ModelLane):
+        """Admit one request: circuit check, queue for a concurrency slot, then a rate token"""
+        if not lane.breaker.allow():
+            lane.counters["rejected"] += 1
+            raise LLMUnavailableError(f"{lane.model} circuit is open after repeated failures")
+
+        queued_at = time.monotonic()
+        lane.waiting += 1
+        try:
+            await asyncio.wait_for(lane.semaphore.acquire(), self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            lane.counters["rejected"] += 1
+            raise LLMUnavailableError(f"{lane.model} queue wait exceeded {self.queue_timeout_seconds:.0f}s")
+        finally:
+            lane.waiting -= 1
+
+        try:
+            await lane.bucket.acquire()
+            lane.queue_wait_seconds += time.monotonic() - queued_at
+            lane.counters["started"] += 1
+            lane.in_flight += 1
+            try:
+                yield
+            finally:
+                lane.in_flight -= 1
+        finally:
+            lane.semaphore.release()
+
+    def _record_error(self, lane: ModelLane, error: Exception) -> None:
+        if isinstance(error, CIRCUIT_ERRORS):
+            lane.breaker.record_failure()
+        else:
+            # The API answered (rate limit, bad request), so it is not down
+            lane.breaker.record_success()
+
+    async def call(self, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        """Run request() (one OpenAI API call) under the model's limits, retrying transient errors"""
+        with external_call("llm", model):
+            return await self._call(model, request)
+
+    async def _call(self, model: str, request: Callable[[], Awaitable[T]]) -> T:
+        lane = self.lane(model)
+        attempt = 0
+        while True:
+            async with self._slot(lane):
+                try:
+                    result = await request()
+                except Exception as e:
+                    self._record_error(lane, e)
+                    if not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                        lane.counters["failed"] += 1
+                        raise
+                    delay = self.retry_delay(e, attempt)
+                else:
+                    lane.breaker.record_success()
+                    lane.counters["succeeded"] += 1
+                    return result
+            # Back off outside the slot so other requests can use it meanwhile
+            lane.counters["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, model: str, request: Callable[[], Awaitable[AsyncIterator[T]]]) -> AsyncIterator[T]:
+        """
+        Like call() for streaming responses; the slot is held until the stream
+        ends, and errors are only retried before the first chunk was yielded
+        """
+        with external_call("llm", f"{model} stream"):
+            async for chunk in self._stream(model, request):
+                yield chunk
+
+    async def _stream(self, model: str, request: Callable[[], Awaitable[AsyncIterator[T]]]) -> AsyncIterator[T]:
+        lane = self.lane(model)
+        attempt = 0
+        while True:
+            async with self._slot(lane):
+                started = False
+                try:
+                    async for chunk in await request():
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    self._record_error(lane, e)
+                    if started or not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                        lane.counters["failed"] += 1
+                        raise
+                    delay = self.retry_delay(e, attempt)
+                else:
+                    lane.breaker.record_success()
+                    lane.counters["succeeded"] += 1
+                    return
+            lane.counters["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, in-flight requests, circuit state and counters per model"""
+        return {model: lane.snapshot() for model, lane in self.lanes.items()}
+
+    def prometheus_lines(self) -> List[str]:
+        """Lane state and counters in the Prometheus text format"""
+        series = [
+            ("llm_queue_depth", "gauge", "Requests waiting for a concurrency slot", lambda lane: lane.waiting),
+            ("llm_in_flight", "gauge", "Requests currently running", lambda lane: lane.in_flight),
+            ("llm_circuit_open", "gauge", "1 while the circuit breaker rejects requests", lambda lane: int(lane.breaker.state == "open")),
+            ("llm_retries_total", "counter", "Retried attempts", lambda lane: lane.counters["retries"]),
+            ("llm_rejected_total", "counter", "Requests refused by the circuit or queue timeout", lambda lane: lane.counters["rejected"]),
+            ("llm_failed_total", "counter", "Requests that failed after retries", lambda lane: lane.counters["failed"]),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{model="{model}"}} {value(lane)}' for model, lane in sorted(self.lanes.items())]
+        return lines
+
+
+def parse_model_concurrency(value: str) -> Dict[str, int]:
+    """Parse "gpt-4o=4,gpt-4o-mini=16" into {model: concurrency}"""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+gateway = LLMGateway(
+    concurrency=settings.LLM_MAX_CONCURRENCY,
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base_seconds=settings.LLM_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.LLM_BACKOFF_MAX_SECONDS,
+    failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.LLM_CIRCUIT_RESET_SECONDS,
+    queue_timeout_seconds=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+    model_concurrency=parse_model_concurrency(settings.LLM_MODEL_CONCURRENCY)
+)
+REGISTRY.add_collector(gateway.prometheus_lines)
+
+
+async def create_chat_completion(**kwargs) -> Any:
+    """client.chat.completions.create (non-streaming) through the gateway"""
+    return await gateway.call(kwargs["model"], lambda: client.chat.completions.create(**kwargs))
 
 
 async def get_embedding(text: str) -> list[float]:
     """Get embedding for text using text-embedding-3-small"""
     try:
-        response = await client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+        response = await gateway.call(
+            "text-embedding-3-small",
+            lambda: client.embeddings.create(model="text-embedding-3-small", input=text)
         )
         return response.data[0].embedding
     except Exception as e:
         raise Exception(f"Error generating embedding: {str(e)}")
 
 
+async def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """Get embeddings for a batch of texts in one API call (order preserved)"""
+    try:
+        response = await gateway.call(
+            "text-embedding-3-small",
+            lambda: client.embeddings.create(model="text-embedding-3-small", input=texts)
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    except Exception as e:
+        raise Exception(f"Error generating embeddings: {str(e)}")
+
+
 async def get_completion(prompt: str, system_prompt: str = None) -> str:
     """Get completion from GPT-4o-mini"""
     try:
@@ -31,7 +381,7 @@ async def get_completion(prompt: str, system_prompt: str = None) -> str:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        response = await client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o-mini",
             messages=messages
         )
@@ -48,14 +398,17 @@ async def get_completion_stream(prompt: str, system_prompt: str = None):
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        stream = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            stream=True
+        stream = gateway.stream(
+            "gpt-4o-mini",
+            lambda: client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                stream=True
+            )
         )
         
         async for chunk in stream:
             if chunk.choices[0].delta.content is not None:
                 yield chunk.choices[0].delta.content
     except Exception as e:
-        raise Exception(f"Error getting streaming completion: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error getting streaming completion: {str(e)}")
@@ -3,12 +3,21 @@ Qdrant client for vector database operations
 """
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, VectorParams
 from app.config import get_settings
 from app.agents.llm_client import get_embedding
+from app.core.metrics import external_call
+from app.services.hybrid_index import SearchHit, search_corpus
+from app.services.ingestion_pipeline import IngestionPipeline
+import asyncio
+import logging
 import os
 
+# Name of the in-process index for the education corpus
+EDUCATION_INDEX = "education"
+
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Initialize Qdrant client
 client = QdrantClient(url=settings.QDRANT_URL)
@@ -29,157 +38,84 @@ async def init_qdrant():
                     distance=Distance.COSINE
                 )
             )
-            print(f"✅ Qdrant collection '{settings.QDRANT_COLLECTION_NAME}' created")
+            logger.info("Qdrant collection created", extra={"collection": settings.QDRANT_COLLECTION_NAME})
         else:
-            print(f"✅ Qdrant collection '{settings.QDRANT_COLLECTION_NAME}' already exists")
+            logger.info("Qdrant collection already exists", extra={"collection": settings.QDRANT_COLLECTION_NAME})
     except Exception as e:
-        print(f"⚠️  Error initializing Qdrant: {str(e)}")
+        logger.warning("Error initializing Qdrant", extra={"error": str(e)})
         raise
 
 
-async def ingest_documents():
-    """Ingest carbon research documents into Qdrant"""
+async def ingest_documents(resume: bool = True):
+    """
+    Ingest carbon research documents into Qdrant and the in-process index
+    
+    With resume, documents unchanged since the last completed ingestion
+    are not re-embedded.
+    """
     try:
-        # Read the research document
-        doc_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "documents",
-            "carbon_research.md"
-        )
+        documents_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "documents")
+        doc_path = os.path.join(documents_dir, "carbon_research.md")
         
         if not os.path.exists(doc_path):
-            print(f"⚠️  Document not found at {doc_path}")
+            logger.warning("Document not found", extra={"path": doc_path})
             return
         
-        with open(doc_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        # Split document into chunks (~500 words each)
-        chunks = split_into_chunks(content, chunk_size=500)
-        
-        print(f"📄 Splitting document into {len(chunks)} chunks...")
-        
-        # Generate embeddings and store in Qdrant
-        points = []
-        for idx, chunk in enumerate(chunks):
-            # Generate embedding
-            embedding = await get_embedding(chunk["text"])
-            
-            # Create point
-            point = PointStruct(
-                id=idx,
-                vector=embedding,
-                payload={
-                    "text": chunk["text"],
-                    "section": chunk.get("section", "Unknown"),
-                    "chunk_index": idx,
-                    "source": "carbon_research.md"
-                }
-            )
-            points.append(point)
-        
-        # Batch upload points
-        client.upsert(
+        pipeline = IngestionPipeline(
+            client,
             collection_name=settings.QDRANT_COLLECTION_NAME,
-            points=points
+            index_name=EDUCATION_INDEX,
+            max_tokens=settings.RAG_CHUNK_MAX_TOKENS,
+            overlap_tokens=settings.RAG_CHUNK_OVERLAP_TOKENS,
+            checkpoint_path=os.path.join(documents_dir, f".ingest_{settings.QDRANT_COLLECTION_NAME}.json")
+        )
+        stats = await pipeline.run(
+            [{"path": doc_path, "filename": "carbon_research.md", "category": "general", "type": "md"}],
+            base_dir=documents_dir,
+            resume=resume
         )
+        logger.info(stats.report())
+        if stats.failed:
+            raise Exception(f"{stats.failed} documents could not be fully ingested")
         
-        print(f"✅ Ingested {len(points)} document chunks into Qdrant")
+        logger.info("Ingested carbon research documents into Qdrant")
     except Exception as e:
-        print(f"⚠️  Error ingesting documents: {str(e)}")
+        logger.warning("Error ingesting documents", extra={"error": str(e)})
         raise
 
 
-def split_into_chunks(text: str, chunk_size: int = 500) -> list[dict]:
-    """Split text into chunks of approximately chunk_size words"""
-    lines = text.split('\n')
-    chunks = []
-    current_section = "Introduction"
-    
-    current_chunk_lines = []
-    current_chunk_word_count = 0
-    
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Detect section headers (lines starting with ##)
-        if line_stripped.startswith("##"):
-            # Save current chunk if it has content
-            if current_chunk_lines:
-                chunk_text = '\n'.join(current_chunk_lines).strip()
-                if chunk_text:
-                    chunks.append({
-                        "text": chunk_text,
-                        "section": current_section
-                    })
-                current_chunk_lines = []
-                current_chunk_word_count = 0
-            
-            # Extract section name
-            # Remove # and clean up
-            section_name = line_stripped.lstrip('#').strip()
-            if section_name:
-                current_section = section_name
-            continue
-        
-        # Skip empty lines at chunk boundaries
-        if not line_stripped and not current_chunk_lines:
-            continue
-        
-        # Count words in this line
-        line_words = line_stripped.split()
-        line_word_count = len(line_words)
-        
-        # If adding this line would exceed chunk size, save current chunk
-        if current_chunk_word_count + line_word_count >= chunk_size and current_chunk_lines:
-            chunk_text = '\n'.join(current_chunk_lines).strip()
-            if chunk_text:
-                chunks.append({
-                    "text": chunk_text,
-                    "section": current_section
-                })
-            current_chunk_lines = [line]
-            current_chunk_word_count = line_word_count
-        else:
-            current_chunk_lines.append(line)
-            current_chunk_word_count += line_word_count
-    
-    # Add remaining chunk
-    if current_chunk_lines:
-        chunk_text = '\n'.join(current_chunk_lines).strip()
-        if chunk_text:
-            chunks.append({
-                "text": chunk_text,
-                "section": current_section
-            })
-    
-    return chunks
+async def _qdrant_search(query_embedding: list[float], limit: int) -> list[SearchHit]:
+    with external_call("qdrant", "search"):
+        results = await asyncio.to_thread(
+            client.search,
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            query_vector=query_embedding,
+            limit=limit
+        )
+    return [(result.payload, result.score) for result in results]
 
 
 async def search_documents(query: str, limit: int = 5) -> list[dict]:
-    """Search for relevant document chunks"""
+    """Search for relevant document chunks (in-process hybrid index, Qdrant for large corpora or as fallback)"""
     try:
-        # Generate query embedding
-        query_embedding = await get_embedding(query)
-        
-        # Search Qdrant
-        results = client.search(
-            collection_name=settings.QDRANT_COLLECTION_NAME,
-            query_vector=query_embedding,
-            limit=limit
+        hits = await search_corpus(
+            EDUCATION_INDEX, query, limit,
+            embed=get_embedding,
+            remote_search=_qdrant_search,
+            local_max_chunks=settings.RAG_LOCAL_INDEX_MAX_CHUNKS
         )
         
         # Format results
         documents = []
-        for result in results:
+        for payload, score in hits:
             documents.append({
-                "text": result.payload.get("text", ""),
-                "section": result.payload.get("section", "Unknown"),
-                "score": result.score,
-                "source": result.payload.get("source", "carbon_research.md")
+                "text": payload.get("text", ""),
+                "section": payload.get("section", "Unknown"),
+                "score": score,
+                "source": payload.get("source", "carbon_research.md")
             })
         
         return documents
     except Exception as e:
-        print(f"⚠️  Error searching documents: {str(e)}")
+        logger.warning("Error searching documents", extra={"error": str(e)})
         return []
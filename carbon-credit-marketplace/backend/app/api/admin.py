@@ -0,0 +1,63 @@
+"""
+Admin API endpoints for live worker diagnostics (require ADMIN_TOKEN)
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import get_settings
+from app.core.profiler import (
+    ProfilerBusy, admin_token_valid, get_request_profile, profile_filename, profile_worker
+)
+
+settings = get_settings()
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints do not exist unless ADMIN_TOKEN is configured"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+def _profile_response(profile: str, filename: str, samples: Optional[int] = None) -> PlainTextResponse:
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if samples is not None:
+        headers["X-Profile-Samples"] = str(samples)
+    return PlainTextResponse(profile, headers=headers)
+
+
+@router.post("/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0, description="Capped at PROFILING_MAX_SECONDS"),
+    interval_ms: Optional[float] = Query(None, ge=1, description="Defaults to PROFILING_INTERVAL_MS")
+):
+    """
+    Sample every thread of the worker serving this request and return the
+    collapsed stacks (feed to flamegraph.pl, inferno or speedscope)
+    """
+    try:
+        profiler = await profile_worker(seconds, interval_ms / 1000 if interval_ms else None)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running in this worker"
+        )
+    return _profile_response(profiler.collapsed(), profile_filename(), profiler.samples)
+
+
+@router.get("/profile/requests/{request_id}")
+async def request_profile(request_id: str):
+    """Collapsed stacks of a request sent with "X-Profile: 1" (kept for the last few requests per worker)"""
+    profile = get_request_profile(request_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profile for this request in this worker"
+        )
+    return _profile_response(profile, f"request-{request_id}.collapsed")
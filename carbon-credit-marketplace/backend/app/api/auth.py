@@ -1,26 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
 from app.database import get_db
 from app.models.models import User
 from app.schemas.schemas import UserRegister, UserLogin, Token, UserResponse
 from app.core.security import verify_password, get_password_hash, create_access_token, get_current_user_id
+from app.api.deps import get_principal
 from app.services.document_validator import validate_pan_number, validate_gstin, validate_gci_registration_id
-from app.services.fraud_detector import check_duplicate_registration, analyze_risk_score
+from app.services.fraud_detector import (
+    check_duplicate_registration, calculate_base_risk_score, get_verification_tier,
+    remember_registration
+)
+from app.services.fraud_jobs import enqueue_fraud_analysis, run_fraud_job
 
 router = APIRouter()
 
 
-@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
-    """Register a new user (buyer or seller)"""
-    
-    # Check for duplicate registrations
-    duplicate_check = await check_duplicate_registration(
-        db, user_data.email, user_data.pan_number, user_data.gstin
-    )
-    
+def raise_for_duplicate_registration(duplicate_check: dict, gstin: str = None):
+    """Raise a 400 error if the duplicate check found an existing registration"""
     if duplicate_check.get("email_duplicate"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -33,11 +32,32 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
             detail="PAN number already registered"
         )
     
-    if duplicate_check.get("gstin_duplicate") and user_data.gstin:
+    if duplicate_check.get("gstin_duplicate") and gstin:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="GSTIN already registered"
         )
+
+
+@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def register(
+    user_data: UserRegister,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Register a new user (buyer or seller)
+    
+    The user is created with a provisional risk score from the deterministic
+    rules. The LLM fraud analysis runs as a background job that updates
+    risk_score and verification_tier once it completes.
+    """
+    
+    # Check for duplicate registrations
+    duplicate_check = await check_duplicate_registration(
+        db, user_data.email, user_data.pan_number, user_data.gstin
+    )
+    raise_for_duplicate_registration(duplicate_check, user_data.gstin)
     
     # Validate document formats
     if user_data.pan_number and not validate_pan_number(user_data.pan_number):
@@ -58,7 +78,7 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
             detail="Invalid GCI registration ID format"
         )
     
-    # Calculate initial risk score
+    # Calculate provisional risk score (LLM analysis is deferred to a background job)
     user_data_dict = {
         "email": user_data.email,
         "company_name": user_data.company_name,
@@ -66,12 +86,10 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
         "gstin": user_data.gstin,
         "user_type": user_data.user_type
     }
-    risk_score = await analyze_risk_score(user_data_dict, {}, duplicate_check)
+    risk_score = calculate_base_risk_score(user_data_dict, {}, duplicate_check)
     
     # Determine verification tier
-    verification_tier = "basic"
-    if risk_score < 20:
-        verification_tier = "verified"
+    verification_tier = get_verification_tier(risk_score)
     
     # Create new user
     hashed_password = get_password_hash(user_data.password)
@@ -88,9 +106,32 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
         verification_tier=verification_tier
     )
     
-    db.add(new_user)
-    await db.commit()
+    try:
+        db.add(new_user)
+        await db.flush()
+        
+        # Queue the LLM fraud analysis in the same transaction as the user
+        fraud_job = enqueue_fraud_analysis(db, new_user.id, user_data_dict, {}, risk_score)
+        
+        await db.commit()
+    except IntegrityError:
+        # Another worker registered the same email/PAN/GSTIN concurrently;
+        # the normalized unique indexes catch what the Bloom filter cannot.
+        await db.rollback()
+        duplicate_check = await check_duplicate_registration(
+            db, user_data.email, user_data.pan_number, user_data.gstin, use_bloom_filter=False
+        )
+        raise_for_duplicate_registration(duplicate_check, user_data.gstin)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already registered"
+        )
+    
     await db.refresh(new_user)
+    remember_registration(new_user.email, new_user.pan_number, new_user.gstin)
+    
+    # Run the job right after the response; the poller retries it on failure
+    background_tasks.add_task(run_fraud_job, fraud_job.id)
     
     # Create access token
     access_token = create_access_token(data={"sub": str(new_user.id)})
@@ -126,18 +167,16 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
-    user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get current user info"""
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    principal = await get_principal(user_id)
     
-    if not user:
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse.model_validate(user)
+    return UserResponse.model_validate(principal)
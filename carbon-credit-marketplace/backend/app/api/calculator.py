@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from fastapi.responses import StreamingResponse
+from typing import Optional
 from app.schemas.schemas import CalculationRequest, CalculationResponse, CalculatorChatRequest
 from app.agents.calculator_agent import calculate_emissions, get_questions_for_sector, chat_with_calculator_agent_stream
-import json
+from app.services.emissions_batch import (
+    calculate_batch, parse_batch_input, detect_input_format, iter_batch_results, BatchInputError
+)
+from app.services.upload_stream import stream_multipart_uploads, read_body_limited, multipart_upload_openapi
+from app.services.conversation_store import load_conversation_state, persist_conversation_stream
+from app.core.sse import sse_response
+from app.core.security import get_current_user_id
+import asyncio
 
 router = APIRouter()
 
+# Largest facility file accepted by /calculate-batch
+BATCH_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
 
 @router.get("/questions/{sector}")
 async def get_questions(sector: str):
@@ -48,30 +59,74 @@ async def calculate(request: CalculationRequest):
         )
 
 
+@router.post("/calculate-batch", openapi_extra=multipart_upload_openapi(multiple=False))
+async def calculate_batch_emissions(
+    request: Request,
+    input_format: Optional[str] = Query(None, pattern="^(csv|json|parquet)$", description="Defaults to detection from content type, filename or content"),
+    output_format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Calculate emissions for many facilities in one request
+    
+    Accepts a CSV, Parquet or JSON array of facility answers, either as a
+    multipart file upload or as the raw request body. Each row needs a
+    'sector' column plus the questionnaire answer columns for that sector;
+    'facility_id' is echoed back if present.
+    
+    Results stream back as NDJSON (one object per facility, then a summary
+    line) or CSV.
+    """
+    upload = None
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            uploads, _ = await stream_multipart_uploads(
+                request, BATCH_MAX_UPLOAD_SIZE, max_files=1, allowed_mime_prefix=None
+            )
+            if not uploads:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="No file uploaded"
+                )
+            upload = uploads[0]
+            data = upload.getbuffer()
+            content_type, filename = upload.declared_content_type, upload.filename
+        else:
+            data = await read_body_limited(request, BATCH_MAX_UPLOAD_SIZE)
+            content_type, filename = request.headers.get("content-type", ""), ""
+        
+        input_format = input_format or detect_input_format(data, content_type, filename)
+        columns = await asyncio.to_thread(parse_batch_input, data, input_format)
+        result = await asyncio.to_thread(calculate_batch, columns)
+    except BatchInputError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    finally:
+        if upload is not None:
+            upload.close()
+    
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(iter_batch_results(result, output_format), media_type=media_type)
+
+
 @router.post("/chat/stream")
 async def chat_calculator_stream(request: CalculatorChatRequest):
     """
     Chat with calculator agent using streaming responses
     
     Uses Server-Sent Events (SSE) to stream responses in real-time.
-    Returns conversation state updates as final event.
+    State is kept server-side: the first event carries the session ID to
+    send with the next message, and the final state event omits the history.
     """
-    conversation_state = None
-    if request.conversation_state:
-        conversation_state = request.conversation_state.model_dump()
-    
-    async def generate():
-        try:
-            async for chunk in chat_with_calculator_agent_stream(request.question, conversation_state):
-                # Check if it's a JSON string (state update) or text chunk
-                if chunk.startswith("{") and '"type"' in chunk:
-                    # State update event
-                    yield f"data: {chunk}\n\n"
-                else:
-                    # Text chunk
-                    yield f"data: {chunk}\n\n"
-        except Exception as e:
-            error_data = json.dumps({"type": "error", "message": str(e)})
-            yield f"data: {error_data}\n\n"
+    fallback_state = request.conversation_state.model_dump() if request.conversation_state else None
+    session_id, conversation_state = await load_conversation_state("calculator", request.session_id, fallback_state)
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    return sse_response(
+        persist_conversation_stream(
+            "calculator", session_id,
+            chat_with_calculator_agent_stream(request.question, conversation_state)
+        ),
+        headers={"X-Chat-Session-Id": session_id}
+    )
@@ -17,9 +17,13 @@ from app.schemas.schemas import (
     ComplianceRecordCreate, ComplianceRecordResponse, ComplianceSubmit, ComplianceSummary
 )
 from app.core.security import get_current_user_id
+from app.core.serialization import RowSerializer
 
 router = APIRouter()
 
+COMPLIANCE_RECORD_SERIALIZER = RowSerializer(ComplianceRecordResponse)
+COMPLIANCE_RECORD_COLUMNS = COMPLIANCE_RECORD_SERIALIZER.columns(ComplianceRecord)
+
 
 # Sector-specific emission intensity targets (tCO2e per unit of product)
 SECTOR_TARGETS = {
@@ -195,7 +199,7 @@ async def get_compliance_records(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all compliance records for the current user"""
-    query = select(ComplianceRecord).where(ComplianceRecord.user_id == user_id)
+    query = select(*COMPLIANCE_RECORD_COLUMNS).where(ComplianceRecord.user_id == user_id)
     
     if compliance_period:
         query = query.where(ComplianceRecord.compliance_period == compliance_period)
@@ -205,33 +209,7 @@ async def get_compliance_records(
     query = query.order_by(ComplianceRecord.created_at.desc())
     
     result = await db.execute(query)
-    records = result.scalars().all()
-    
-    return [
-        ComplianceRecordResponse(
-            id=rec.id,
-            user_id=rec.user_id,
-            compliance_period=rec.compliance_period,
-            sector=rec.sector,
-            target_emission_intensity=rec.target_emission_intensity,
-            baseline_emission_intensity=rec.baseline_emission_intensity,
-            actual_emissions=rec.actual_emissions,
-            actual_production=rec.actual_production,
-            actual_emission_intensity=rec.actual_emission_intensity,
-            credits_required=rec.credits_required,
-            credits_earned=rec.credits_earned,
-            credits_surrendered=rec.credits_surrendered,
-            credits_shortfall=rec.credits_shortfall,
-            status=rec.status,
-            deadline=rec.deadline,
-            submitted_at=rec.submitted_at,
-            verified_at=rec.verified_at,
-            penalty_amount=rec.penalty_amount,
-            penalty_paid=rec.penalty_paid,
-            created_at=rec.created_at
-        )
-        for rec in records
-    ]
+    return COMPLIANCE_RECORD_SERIALIZER.response(result.all())
 
 
 @router.get("/records/{record_id}", response_model=ComplianceRecordResponse)
@@ -1,10 +1,16 @@
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+import orjson
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models.models import User
-from app.core.security import decode_token
+from app.core.security import decode_token, get_current_user_id
+from app.core.cache import cache, user_tag
+from app.core.serialization import dumps
 
 security = HTTPBearer()
 
@@ -34,3 +40,42 @@ async def get_current_user(
         )
     
     return user
+
+
+PRINCIPAL_FIELDS = (
+    "id", "email", "user_type", "company_name", "sector", "gci_registration_id",
+    "is_active", "is_kyc_verified", "verification_tier", "created_at"
+)
+PRINCIPAL_COLUMNS = [getattr(User, name) for name in PRINCIPAL_FIELDS]
+
+
+async def get_principal(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Identity and role of a user, as JSON-compatible values (None if there is
+    no such user). Read through the cache: most authenticated requests need
+    it, and it only changes when the user row does.
+    """
+    try:
+        user_uuid = UUID(str(user_id))
+    except ValueError:
+        return None
+
+    async def load() -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(select(*PRINCIPAL_COLUMNS).where(User.id == user_uuid))).first()
+        if row is None:
+            return None
+        return orjson.loads(dumps(dict(zip(PRINCIPAL_FIELDS, row))))
+
+    return await cache.get_or_load(f"principal:{user_uuid}", load, tags=(user_tag(user_uuid),))
+
+
+async def get_current_principal(user_id: str = Depends(get_current_user_id)) -> Dict[str, Any]:
+    """Principal of the authenticated user"""
+    principal = await get_principal(user_id)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+    return principal
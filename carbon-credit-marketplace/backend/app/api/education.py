@@ -1,7 +1,7 @@
 from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
 from app.schemas.schemas import ChatRequest, ChatResponse
 from app.agents.education_agent import chat_with_education_agent, chat_with_education_agent_stream
+from app.core.sse import sse_response
 
 router = APIRouter()
 
@@ -34,19 +34,4 @@ async def chat_stream(request: ChatRequest):
     - Streams OpenAI GPT-4o-mini response chunks
     - Sends sources as final SSE event
     """
-    
-    async def generate():
-        try:
-            async for chunk in chat_with_education_agent_stream(request.question):
-                # Check if it's a JSON string (sources) or text chunk
-                if chunk.startswith("{") and '"type"' in chunk:
-                    # Sources event
-                    yield f"data: {chunk}\n\n"
-                else:
-                    # Text chunk
-                    yield f"data: {chunk}\n\n"
-        except Exception as e:
-            error_data = f'{{"type": "error", "message": "{str(e)}"}}'
-            yield f"data: {error_data}\n\n"
-    
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    return sse_response(chat_with_education_agent_stream(request.question))
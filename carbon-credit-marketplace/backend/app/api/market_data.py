@@ -7,7 +7,7 @@ from sqlalchemy import select, func, and_
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models.models import (
     CreditListing, Transaction, PriceHistory, MarketStats, User
 )
@@ -15,16 +15,39 @@ from app.schemas.schemas import (
     PriceHistoryResponse, MarketStatsResponse, MarketOverview, PriceChart
 )
 from app.core.security import get_current_user_id
+from app.core.serialization import RowSerializer
+from app.core.http_cache import CacheValidators, HttpCache
+from app.core.cache import cache, LISTINGS_TAG, TRADES_TAG
 
 router = APIRouter()
 
+PRICE_HISTORY_SERIALIZER = RowSerializer(PriceHistoryResponse)
+PRICE_HISTORY_COLUMNS = PRICE_HISTORY_SERIALIZER.columns(PriceHistory)
 
-@router.get("/overview", response_model=MarketOverview)
+OVERVIEW_WINDOW_SECONDS = 60
+
+
+# Also drifts with time: yesterday's average and the trailing 24h window
+@router.get(
+    "/overview",
+    response_model=MarketOverview
+)
 async def get_market_overview(
-    db: AsyncSession = Depends(get_db)
+    validators: CacheValidators = Depends(HttpCache(LISTINGS_TAG, TRADES_TAG, window_seconds=OVERVIEW_WINDOW_SECONDS))
 ):
     """Get current market overview with key metrics"""
-    
+    return await cache.get_or_load(
+        f"market:overview:{validators.version}", load_market_overview,
+        tags=(LISTINGS_TAG, TRADES_TAG), ttl=OVERVIEW_WINDOW_SECONDS
+    )
+
+
+async def load_market_overview() -> dict:
+    async with AsyncSessionLocal() as db:
+        return (await compute_market_overview(db)).model_dump(mode="json")
+
+
+async def compute_market_overview(db: AsyncSession) -> MarketOverview:
     today = date.today()
     yesterday = today - timedelta(days=1)
     
@@ -123,7 +146,7 @@ async def get_price_history(
     
     start_date = date.today() - timedelta(days=days)
     
-    query = select(PriceHistory).where(PriceHistory.date >= start_date)
+    query = select(*PRICE_HISTORY_COLUMNS).where(PriceHistory.date >= start_date)
     
     if project_type:
         query = query.where(PriceHistory.project_type == project_type)
@@ -133,24 +156,7 @@ async def get_price_history(
     query = query.order_by(PriceHistory.date.asc())
     
     result = await db.execute(query)
-    history = result.scalars().all()
-    
-    return [
-        PriceHistoryResponse(
-            id=h.id,
-            date=h.date,
-            project_type=h.project_type,
-            vintage=h.vintage,
-            open_price=h.open_price,
-            close_price=h.close_price,
-            high_price=h.high_price,
-            low_price=h.low_price,
-            average_price=h.average_price,
-            volume=h.volume,
-            num_transactions=h.num_transactions
-        )
-        for h in history
-    ]
+    return PRICE_HISTORY_SERIALIZER.response(result.all())
 
 
 @router.get("/price-chart", response_model=PriceChart)
@@ -346,11 +352,19 @@ async def get_market_stats(
 
 
 @router.get("/listings-summary")
-async def get_listings_summary(
-    db: AsyncSession = Depends(get_db)
-):
+async def get_listings_summary(validators: CacheValidators = Depends(HttpCache(LISTINGS_TAG))):
     """Get summary of available listings by category"""
-    
+    return await cache.get_or_load(
+        f"market:listings-summary:{validators.version}", load_listings_summary, tags=(LISTINGS_TAG,)
+    )
+
+
+async def load_listings_summary() -> dict:
+    async with AsyncSessionLocal() as db:
+        return await compute_listings_summary(db)
+
+
+async def compute_listings_summary(db: AsyncSession) -> dict:
     result = await db.execute(
         select(CreditListing).where(
             and_(
@@ -9,6 +9,9 @@ from app.database import get_db
 from app.models.models import User, CreditListing
 from app.schemas.schemas import ListingCreate, ListingResponse, ListingUpdate
 from app.core.security import get_current_user_id
+from app.core.serialization import RowSerializer
+from app.core.http_cache import CacheValidators, HttpCache
+from app.core.cache import LISTINGS_TAG
 from app.services.credit_verifier import validate_credit_listing
 
 router = APIRouter()
@@ -51,6 +54,25 @@ def format_listing_response(listing, seller) -> dict:
     }
 
 
+# List responses select just these columns (seller joined for its name) and skip the
+# per-row ListingResponse; same fields as format_listing_response
+LISTING_SERIALIZER = RowSerializer(ListingResponse, computed={
+    "available_quantity": lambda row: row.available_quantity or row.quantity,
+    "co_benefits": lambda row: parse_co_benefits(row.co_benefits) if row.co_benefits else None,
+})
+LISTING_COLUMNS = LISTING_SERIALIZER.columns(
+    CreditListing,
+    seller_name=User.company_name,
+    available_quantity=CreditListing.available_quantity,
+    co_benefits=CreditListing.co_benefits
+)
+
+
+def listing_rows_query():
+    """Listing rows for LISTING_SERIALIZER, joined to their seller"""
+    return select(*LISTING_COLUMNS).join(User, CreditListing.seller_id == User.id)
+
+
 @router.get("/listings", response_model=List[ListingResponse])
 async def get_listings(
     vintage: Optional[int] = Query(None),
@@ -59,11 +81,12 @@ async def get_listings(
     max_price: Optional[float] = Query(None),
     methodology: Optional[str] = Query(None),
     verification_status: Optional[str] = Query(None),
+    cache: CacheValidators = Depends(HttpCache(LISTINGS_TAG)),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all active credit listings with optional filters"""
     
-    query = select(CreditListing, User).join(User, CreditListing.seller_id == User.id).where(
+    query = listing_rows_query().where(
         and_(
             CreditListing.is_active == True,
             CreditListing.available_quantity > 0
@@ -87,15 +110,7 @@ async def get_listings(
     query = query.order_by(CreditListing.created_at.desc())
     
     result = await db.execute(query)
-    listings_with_sellers = result.all()
-    
-    # Format response
-    response = []
-    for listing, seller in listings_with_sellers:
-        listing_dict = format_listing_response(listing, seller)
-        response.append(ListingResponse(**listing_dict))
-    
-    return response
+    return cache.apply(LISTING_SERIALIZER.response(result.all()))
 
 
 @router.post("/listings", response_model=ListingResponse, status_code=status.HTTP_201_CREATED)
@@ -269,16 +284,15 @@ async def get_my_listings(
     """Get all listings for the current user (sellers only)"""
     
     # Verify user
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    result = await db.execute(select(User.id).where(User.id == user_id))
     
-    if not user:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    query = select(CreditListing).where(CreditListing.seller_id == user_id)
+    query = listing_rows_query().where(CreditListing.seller_id == user_id)
     
     if not include_inactive:
         query = query.where(CreditListing.is_active == True)
@@ -286,11 +300,4 @@ async def get_my_listings(
     query = query.order_by(CreditListing.created_at.desc())
     
     result = await db.execute(query)
-    listings = result.scalars().all()
-    
-    response = []
-    for listing in listings:
-        listing_dict = format_listing_response(listing, user)
-        response.append(ListingResponse(**listing_dict))
-    
-    return response
+    return LISTING_SERIALIZER.response(result.all())
@@ -11,12 +11,14 @@ import secrets
 
 from app.database import get_db
 from app.models.models import (
-    User, Project, CreditListing, Document, Notification
+    Project, CreditListing, Document, Notification
 )
 from app.schemas.schemas import (
     ProjectCreate, ProjectResponse, ProjectUpdate
 )
 from app.core.security import get_current_user_id
+from app.api.deps import get_principal
+from app.core.http_cache import HttpCache
 
 router = APIRouter()
 
@@ -114,16 +116,15 @@ async def create_project(
     user_uuid = UUID(user_id)
     
     # Verify user is a seller
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user = result.scalar_one_or_none()
+    principal = await get_principal(user_id)
     
-    if not user:
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    if user.user_type != "seller":
+    if principal["user_type"] != "seller":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only sellers can register projects"
@@ -452,7 +453,7 @@ async def demo_validate_project(
     )
 
 
-@router.get("/methodologies/list")
+@router.get("/methodologies/list", dependencies=[Depends(HttpCache(static=APPROVED_METHODOLOGIES))])
 async def get_approved_methodologies():
     """Get list of approved methodologies for projects"""
     return APPROVED_METHODOLOGIES
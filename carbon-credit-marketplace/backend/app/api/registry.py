@@ -9,7 +9,7 @@ from uuid import UUID
 from datetime import datetime
 import secrets
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models.models import (
     User, CreditAccount, CreditTransaction, CreditIssuance, CreditRetirement, Notification
 )
@@ -19,9 +19,15 @@ from app.schemas.schemas import (
     CreditIssuanceResponse
 )
 from app.core.security import get_current_user_id
+from app.api.deps import get_principal
+from app.core.serialization import RowSerializer
+from app.core.cache import cache, ledger_tag
 
 router = APIRouter()
 
+CREDIT_TRANSACTION_SERIALIZER = RowSerializer(CreditTransactionResponse)
+CREDIT_TRANSACTION_COLUMNS = CREDIT_TRANSACTION_SERIALIZER.columns(CreditTransaction)
+
 
 def generate_retirement_number() -> str:
     """Generate a unique retirement number"""
@@ -78,22 +84,26 @@ async def get_or_create_credit_account(db: AsyncSession, user_id: UUID) -> Credi
 
 @router.get("/account", response_model=CreditAccountResponse)
 async def get_my_credit_account(
-    user_id: str = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get the current user's credit account"""
-    account = await get_or_create_credit_account(db, UUID(user_id))
-    
-    return CreditAccountResponse(
-        id=account.id,
-        user_id=account.user_id,
-        total_balance=account.total_balance,
-        available_balance=account.available_balance,
-        locked_balance=account.locked_balance,
-        retired_balance=account.retired_balance,
-        created_at=account.created_at,
-        updated_at=account.updated_at
-    )
+    user_uuid = UUID(user_id)
+
+    async def load() -> dict:
+        async with AsyncSessionLocal() as db:
+            account = await get_or_create_credit_account(db, user_uuid)
+            return CreditAccountResponse(
+                id=account.id,
+                user_id=account.user_id,
+                total_balance=account.total_balance,
+                available_balance=account.available_balance,
+                locked_balance=account.locked_balance,
+                retired_balance=account.retired_balance,
+                created_at=account.created_at,
+                updated_at=account.updated_at
+            ).model_dump(mode="json")
+
+    return await cache.get_or_load(f"account:{user_uuid}", load, tags=(ledger_tag(user_uuid),))
 
 
 @router.get("/transactions", response_model=List[CreditTransactionResponse])
@@ -109,7 +119,7 @@ async def get_credit_transactions(
     account = await get_or_create_credit_account(db, UUID(user_id))
     
     # Build query
-    query = select(CreditTransaction).where(CreditTransaction.account_id == account.id)
+    query = select(*CREDIT_TRANSACTION_COLUMNS).where(CreditTransaction.account_id == account.id)
     
     if transaction_type:
         query = query.where(CreditTransaction.transaction_type == transaction_type)
@@ -117,23 +127,7 @@ async def get_credit_transactions(
     query = query.order_by(CreditTransaction.created_at.desc()).offset(offset).limit(limit)
     
     result = await db.execute(query)
-    transactions = result.scalars().all()
-    
-    return [
-        CreditTransactionResponse(
-            id=txn.id,
-            account_id=txn.account_id,
-            transaction_type=txn.transaction_type,
-            amount=txn.amount,
-            balance_before=txn.balance_before,
-            balance_after=txn.balance_after,
-            reference_type=txn.reference_type,
-            reference_id=txn.reference_id,
-            description=txn.description,
-            created_at=txn.created_at
-        )
-        for txn in transactions
-    ]
+    return CREDIT_TRANSACTION_SERIALIZER.response(result.all())
 
 
 # ==================== CREDIT TRANSFER ENDPOINTS ====================
@@ -463,17 +457,16 @@ async def demo_issue_credits(
     user_uuid = UUID(user_id)
     
     # Get user
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user = result.scalar_one_or_none()
+    principal = await get_principal(user_id)
     
-    if not user:
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
     # Typically only sellers can receive issuances
-    if user.user_type != "seller":
+    if principal["user_type"] != "seller":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only sellers can receive credit issuances"
@@ -4,9 +4,11 @@ Transaction API endpoints for buying and selling carbon credits
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import aliased
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
+import logging
 import secrets
 
 from app.database import get_db
@@ -20,9 +22,32 @@ from app.schemas.schemas import (
     ListingResponse
 )
 from app.core.security import get_current_user_id
+from app.api.deps import get_principal
+from app.core.serialization import RowSerializer
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# List endpoints select just the columns these need; listing details are not loaded for lists
+ORDER_SERIALIZER = RowSerializer(OrderWithDetails, computed={
+    "listing": lambda row: None,
+    "total_amount": lambda row: row.quantity * row.price_per_credit,
+})
+ORDER_COLUMNS = ORDER_SERIALIZER.columns(Order)
+
+Buyer = aliased(User)
+Seller = aliased(User)
+TRANSACTION_SERIALIZER = RowSerializer(TransactionWithDetails, computed={
+    "listing": lambda row: None,
+    "payment": lambda row: None,
+})
+TRANSACTION_COLUMNS = TRANSACTION_SERIALIZER.columns(
+    Transaction,
+    buyer_name=func.coalesce(Buyer.company_name, "Unknown"),
+    seller_name=func.coalesce(Seller.company_name, "Unknown")
+)
+
 
 def generate_transaction_number() -> str:
     """Generate a unique transaction number"""
@@ -81,8 +106,7 @@ async def create_buy_order(
     This initiates the purchase process.
     """
     # Get the user
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await get_principal(user_id)
     
     if not user:
         raise HTTPException(
@@ -167,7 +191,7 @@ async def get_user_orders(
     db: AsyncSession = Depends(get_db)
 ):
     """Get all orders for the current user"""
-    query = select(Order).where(Order.user_id == user_id)
+    query = select(*ORDER_COLUMNS).where(Order.user_id == user_id)
     
     if status:
         query = query.where(Order.status == status)
@@ -177,28 +201,7 @@ async def get_user_orders(
     query = query.order_by(Order.created_at.desc())
     
     result = await db.execute(query)
-    orders = result.scalars().all()
-    
-    response = []
-    for order in orders:
-        order_dict = {
-            "id": order.id,
-            "user_id": order.user_id,
-            "listing_id": order.listing_id,
-            "order_type": order.order_type,
-            "quantity": order.quantity,
-            "filled_quantity": order.filled_quantity,
-            "price_per_credit": order.price_per_credit,
-            "status": order.status,
-            "expires_at": order.expires_at,
-            "created_at": order.created_at,
-            "updated_at": order.updated_at,
-            "listing": None,
-            "total_amount": order.quantity * order.price_per_credit
-        }
-        response.append(OrderWithDetails(**order_dict))
-    
-    return response
+    return ORDER_SERIALIZER.response(result.all())
 
 
 @router.delete("/orders/{order_id}")
@@ -250,14 +253,16 @@ async def buy_credits(
     This creates a transaction and initiates the payment process.
     """
     try:
-        print(f"🔵 Buy credits request: user_id={user_id}, listing_id={transaction_data.listing_id}, quantity={transaction_data.quantity}", flush=True)
+        logger.debug(
+            "Buy credits request",
+            extra={"user_id": user_id, "listing_id": str(transaction_data.listing_id), "quantity": transaction_data.quantity}
+        )
         
         # Get the buyer
-        result = await db.execute(select(User).where(User.id == user_id))
-        buyer = result.scalar_one_or_none()
+        buyer = await get_principal(user_id)
         
         if not buyer:
-            print(f"❌ User not found: {user_id}", flush=True)
+            logger.info("Buy rejected: user not found", extra={"user_id": user_id})
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
@@ -277,18 +282,17 @@ async def buy_credits(
         listing_seller = result.first()
         
         if not listing_seller:
-            print(f"❌ Listing not found or not active: {transaction_data.listing_id}", flush=True)
+            logger.info("Buy rejected: listing not found or not active", extra={"listing_id": str(transaction_data.listing_id)})
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found or not active"
             )
         
         listing, seller = listing_seller
-        print(f"✅ Found listing: {listing.id}, seller_id={listing.seller_id}, available_quantity={listing.available_quantity}", flush=True)
         
         # Check if buyer is not the seller
         if str(listing.seller_id) == user_id:
-            print(f"❌ Buyer trying to buy own listing: {user_id}", flush=True)
+            logger.info("Buy rejected: own listing", extra={"user_id": user_id, "listing_id": str(listing.id)})
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot buy your own listing"
@@ -296,9 +300,11 @@ async def buy_credits(
         
         # Check available quantity (use quantity as fallback if available_quantity is not set)
         available_qty = listing.available_quantity if listing.available_quantity is not None else listing.quantity
-        print(f"📊 Quantity check: requested={transaction_data.quantity}, available={available_qty}", flush=True)
         if transaction_data.quantity > available_qty:
-            print(f"❌ Quantity exceeds available: {transaction_data.quantity} > {available_qty}", flush=True)
+            logger.info(
+                "Buy rejected: quantity exceeds available",
+                extra={"listing_id": str(listing.id), "quantity": transaction_data.quantity, "available": available_qty}
+            )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Requested quantity ({transaction_data.quantity}) exceeds available quantity ({available_qty})"
@@ -306,7 +312,7 @@ async def buy_credits(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in buy_credits validation: {type(e).__name__}: {str(e)}", flush=True)
+        logger.exception("Error validating purchase request")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing purchase request: {str(e)}"
@@ -317,8 +323,6 @@ async def buy_credits(
     platform_fee = total_amount * 0.02  # 2% platform fee
     gst_amount = platform_fee * 0.18  # 18% GST on platform fee
     
-    print(f"💰 Amounts calculated: total={total_amount}, platform_fee={platform_fee}, gst={gst_amount}", flush=True)
-    
     try:
         # Create the transaction
         transaction = Transaction(
@@ -335,7 +339,6 @@ async def buy_credits(
         )
         
         db.add(transaction)
-        print(f"✅ Transaction created: {transaction.transaction_number}", flush=True)
         
         # Lock the credits in the listing (reduce available quantity)
         if listing.available_quantity is not None:
@@ -343,9 +346,8 @@ async def buy_credits(
         else:
             listing.available_quantity = listing.quantity - transaction_data.quantity
         
-        print(f"✅ Listing quantity updated: available_quantity={listing.available_quantity}", flush=True)
     except Exception as e:
-        print(f"❌ Error creating transaction: {type(e).__name__}: {str(e)}", flush=True)
+        logger.exception("Error creating transaction")
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -384,18 +386,17 @@ async def buy_credits(
             listing.seller_id,
             "transaction",
             "New Purchase Order",
-            f"{buyer.company_name} has initiated a purchase of {transaction_data.quantity} credits from your listing.",
+            f"{buyer['company_name']} has initiated a purchase of {transaction_data.quantity} credits from your listing.",
             "transaction",
             transaction.id
         )
     except Exception as e:
         # Log notification errors but don't fail the transaction
-        print(f"⚠️ Warning: Failed to create notifications: {type(e).__name__}: {str(e)}", flush=True)
+        logger.warning("Failed to create purchase notifications", extra={"error": f"{type(e).__name__}: {e}"})
     
     try:
         await db.commit()
         await db.refresh(transaction)
-        print(f"✅ Transaction committed successfully: {transaction.transaction_number}", flush=True)
         
         response = TransactionResponse(
             id=transaction.id,
@@ -416,10 +417,18 @@ async def buy_credits(
             completed_at=transaction.completed_at,
             created_at=transaction.created_at
         )
-        print(f"✅ Purchase successful: Transaction {transaction.transaction_number} created", flush=True)
+        logger.info(
+            "Purchase initiated",
+            extra={
+                "transaction_number": transaction.transaction_number,
+                "listing_id": str(listing.id),
+                "quantity": transaction.quantity,
+                "total_amount": transaction.total_amount,
+            }
+        )
         return response
     except Exception as e:
-        print(f"❌ Error committing transaction: {type(e).__name__}: {str(e)}", flush=True)
+        logger.exception("Error committing transaction")
         import traceback
         traceback.print_exc()
         await db.rollback()
@@ -439,13 +448,20 @@ async def get_user_transactions(
     """Get all transactions for the current user"""
     user_uuid = UUID(user_id)
     
-    # Build query based on role
+    # Counterparty names come from the joins, in the same query
+    query = select(*TRANSACTION_COLUMNS).outerjoin(
+        Buyer, Buyer.id == Transaction.buyer_id
+    ).outerjoin(
+        Seller, Seller.id == Transaction.seller_id
+    )
+    
+    # Filter based on role
     if role == "buyer":
-        query = select(Transaction).where(Transaction.buyer_id == user_uuid)
+        query = query.where(Transaction.buyer_id == user_uuid)
     elif role == "seller":
-        query = select(Transaction).where(Transaction.seller_id == user_uuid)
+        query = query.where(Transaction.seller_id == user_uuid)
     else:
-        query = select(Transaction).where(
+        query = query.where(
             or_(
                 Transaction.buyer_id == user_uuid,
                 Transaction.seller_id == user_uuid
@@ -458,43 +474,7 @@ async def get_user_transactions(
     query = query.order_by(Transaction.created_at.desc())
     
     result = await db.execute(query)
-    transactions = result.scalars().all()
-    
-    response = []
-    for txn in transactions:
-        # Get buyer and seller names
-        buyer_result = await db.execute(select(User).where(User.id == txn.buyer_id))
-        buyer = buyer_result.scalar_one_or_none()
-        
-        seller_result = await db.execute(select(User).where(User.id == txn.seller_id))
-        seller = seller_result.scalar_one_or_none()
-        
-        txn_dict = {
-            "id": txn.id,
-            "transaction_number": txn.transaction_number,
-            "buyer_id": txn.buyer_id,
-            "seller_id": txn.seller_id,
-            "listing_id": txn.listing_id,
-            "order_id": txn.order_id,
-            "quantity": txn.quantity,
-            "price_per_credit": txn.price_per_credit,
-            "total_amount": txn.total_amount,
-            "platform_fee": txn.platform_fee,
-            "gst_amount": txn.gst_amount,
-            "status": txn.status,
-            "transaction_date": txn.transaction_date,
-            "payment_completed_at": txn.payment_completed_at,
-            "credits_transferred_at": txn.credits_transferred_at,
-            "completed_at": txn.completed_at,
-            "created_at": txn.created_at,
-            "buyer_name": buyer.company_name if buyer else "Unknown",
-            "seller_name": seller.company_name if seller else "Unknown",
-            "listing": None,
-            "payment": None
-        }
-        response.append(TransactionWithDetails(**txn_dict))
-    
-    return response
+    return TRANSACTION_SERIALIZER.response(result.all())
 
 
 @router.get("/transactions/{transaction_id}", response_model=TransactionWithDetails)
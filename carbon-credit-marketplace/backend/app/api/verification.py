@@ -1,29 +1,35 @@
 """
 Verification API endpoints for managing verification workflows
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
+import asyncio
+import json
 import secrets
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models.models import (
     User, CreditListing, Verification, Document, Notification
 )
 from app.schemas.schemas import (
     VerificationCreate, VerificationResponse, VerificationUpdate,
-    DocumentUpload, DocumentResponse, OCRResponse, ChatRequest, ChatResponse
+    DocumentUpload, DocumentResponse, OCRResponse, OCRJobResponse, ChatRequest, ChatResponse
 )
-from app.services.document_ocr import extract_text_and_structured_data
+from app.services.ocr_cache import extract_with_cache
+from app.services.ocr_queue import get_ocr_worker_pool, save_upload, hash_stored_upload
+from app.services.upload_stream import stream_multipart_uploads, multipart_upload_openapi
 from app.services.document_validator import (
     validate_pan_number, validate_gstin, validate_gci_registration_id,
     validate_document_consistency, validate_document_format
 )
 from app.services.fraud_detector import (
-    check_duplicate_registration, detect_fraud_indicators, analyze_risk_score
+    check_duplicate_registration, detect_fraud_indicators, analyze_risk_score,
+    flag_shared_document
 )
 from app.services.credit_verifier import check_credit_availability, validate_credit_listing
 from app.agents.verification_agent import (
@@ -33,6 +39,29 @@ from app.core.security import get_current_user_id
 
 router = APIRouter()
 
+# OCR upload limits
+OCR_MAX_FILE_SIZE = 10 * 1024 * 1024
+OCR_BATCH_MAX_FILES = 50
+OCR_JOB_STREAM_TIMEOUT_SECONDS = 600
+
+
+def format_ocr_job(document: Document) -> OCRJobResponse:
+    """Format a document row as an OCR job status response"""
+    result = document.extracted_data or {}
+    return OCRJobResponse(
+        job_id=document.id,
+        filename=document.filename,
+        document_type=document.document_type,
+        status=document.ocr_status,
+        content_hash=document.content_hash,
+        raw_text=result.get("raw_text"),
+        extracted_data=result.get("extracted_data"),
+        confidence=result.get("confidence"),
+        error=document.ocr_error,
+        created_at=document.created_at,
+        completed_at=document.ocr_completed_at
+    )
+
 
 def generate_certificate_number() -> str:
     """Generate a unique certificate number"""
@@ -305,7 +334,14 @@ async def upload_document(
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db)
 ):
-    """Upload a document for verification"""
+    """
+    Upload a document for verification
+    
+    file_url should be the file_url returned by the OCR endpoints. The
+    content hash is computed here from the stored bytes; files stored
+    elsewhere have none and skip the shared-document check.
+    """
+    content_hash = await hash_stored_upload(document_data.file_url)
     
     document = Document(
         user_id=UUID(user_id),
@@ -316,11 +352,17 @@ async def upload_document(
         file_url=document_data.file_url,
         file_size=document_data.file_size,
         mime_type=document_data.mime_type,
+        content_hash=content_hash,
         version=1,
         is_current=True
     )
     
     db.add(document)
+    
+    # Identical files across users are flagged for the fraud pipeline
+    if content_hash:
+        await flag_shared_document(db, UUID(user_id), content_hash)
+    
     await db.commit()
     await db.refresh(document)
     
@@ -336,6 +378,7 @@ async def upload_document(
         version=document.version,
         is_current=document.is_current,
         expires_at=document.expires_at,
+        content_hash=document.content_hash,
         created_at=document.created_at
     )
 
@@ -379,6 +422,7 @@ async def get_my_documents(
             version=doc.version,
             is_current=doc.is_current,
             expires_at=doc.expires_at,
+            content_hash=doc.content_hash,
             created_at=doc.created_at
         )
         for doc in documents
@@ -387,50 +431,206 @@ async def get_my_documents(
 
 # ==================== OCR ENDPOINTS ====================
 
-@router.post("/documents/ocr", response_model=OCRResponse)
+@router.post(
+    "/documents/ocr",
+    response_model=OCRResponse,
+    openapi_extra=multipart_upload_openapi(multiple=False)
+)
 async def extract_document_text(
-    file: UploadFile = File(...),
+    request: Request,
     document_type: str = Query(..., description="Type of document: pan_card, gstin, company_registration, gci_certificate, bee_certificate"),
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db)
 ):
-    """Extract text and structured data from uploaded document using OCR"""
-    
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith('image/'):
+    """
+    Extract text and structured data from uploaded document using OCR
+    
+    The upload is streamed: oversized files are rejected with 413 before they
+    are buffered, and the content hash is computed as chunks arrive. Results
+    are cached by content hash, so re-uploading the same file does not call
+    the vision API again.
+    """
+    uploads, _ = await stream_multipart_uploads(request, OCR_MAX_FILE_SIZE, max_files=1)
+    if not uploads:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only image files are supported for OCR"
-        )
-    
-    # Read file content
-    file_contents = await file.read()
-    
-    # Validate file size (max 10MB)
-    if len(file_contents) > 10 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size exceeds 10MB limit"
+            detail="No file uploaded"
         )
+    upload = uploads[0]
     
     try:
-        # Extract text and structured data
-        result = await extract_text_and_structured_data(
-            image_bytes=file_contents,
+        # Keep the bytes so the document can be registered with POST /documents
+        file_path = await save_upload(upload.content_hash, upload.getbuffer())
+        
+        # Extract text and structured data (served from cache for repeat uploads)
+        result = await extract_with_cache(
+            db,
+            image_bytes=upload.getbuffer(),
             document_type=document_type,
-            mime_type=file.content_type
+            mime_type=upload.content_type,
+            content_hash=upload.content_hash
         )
         
         return OCRResponse(
             raw_text=result["raw_text"],
             extracted_data=result["extracted_data"],
-            confidence=result["confidence"]
+            confidence=result["confidence"],
+            content_hash=result["content_hash"],
+            file_url=file_path,
+            cached=result["cached"]
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing document: {str(e)}"
         )
+    finally:
+        upload.close()
+
+
+@router.post(
+    "/documents/ocr/batch",
+    response_model=List[OCRJobResponse],
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=multipart_upload_openapi(multiple=True)
+)
+async def submit_ocr_batch(
+    request: Request,
+    document_type: str = Query(..., description="Type of document: pan_card, gstin, company_registration, gci_certificate, bee_certificate"),
+    verification_id: Optional[UUID] = Query(None),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Upload many documents for OCR in one request
+    
+    Files are streamed to disk and queued for the OCR worker pool; the
+    response returns one job per file immediately. Poll
+    /documents/ocr/jobs/{job_id} or subscribe to /documents/ocr/jobs/stream
+    for completion.
+    """
+    uploads, _ = await stream_multipart_uploads(
+        request, OCR_MAX_FILE_SIZE, max_files=OCR_BATCH_MAX_FILES
+    )
+    if not uploads:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No files uploaded"
+        )
+    
+    documents = []
+    try:
+        for upload in uploads:
+            content_hash = upload.content_hash
+            file_path = await save_upload(content_hash, upload.getbuffer())
+            
+            document = Document(
+                user_id=UUID(user_id),
+                verification_id=verification_id,
+                document_type=document_type,
+                filename=upload.filename or content_hash,
+                file_url=file_path,
+                file_size=upload.size,
+                mime_type=upload.content_type,
+                content_hash=content_hash,
+                version=1,
+                is_current=True,
+                ocr_status="pending",
+                ocr_attempts=0
+            )
+            db.add(document)
+            documents.append(document)
+            
+            # Identical files across users are flagged for the fraud pipeline
+            await flag_shared_document(db, UUID(user_id), content_hash)
+    finally:
+        for upload in uploads:
+            upload.close()
+    
+    await db.commit()
+    
+    get_ocr_worker_pool().enqueue(document.id for document in documents)
+    
+    return [format_ocr_job(document) for document in documents]
+
+
+@router.get("/documents/ocr/jobs/stream")
+async def stream_ocr_jobs(
+    job_ids: List[UUID] = Query(...),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Stream OCR job completions as Server-Sent Events
+    
+    Emits one event per job as it completes or fails, then a final
+    {"type": "done"} event.
+    """
+    user_uuid = UUID(user_id)
+    
+    async def generate():
+        remaining = set(job_ids)
+        pool = get_ocr_worker_pool()
+        deadline = asyncio.get_running_loop().time() + OCR_JOB_STREAM_TIMEOUT_SECONDS
+        
+        while remaining and asyncio.get_running_loop().time() < deadline:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(Document).where(
+                        and_(
+                            Document.id.in_(remaining),
+                            Document.user_id == user_uuid
+                        )
+                    )
+                )
+                documents = {document.id: document for document in result.scalars().all()}
+            
+            for job_id in list(remaining):
+                document = documents.get(job_id)
+                if document is None:
+                    remaining.discard(job_id)
+                    error_data = json.dumps({"type": "error", "job_id": str(job_id), "message": "OCR job not found"})
+                    yield f"data: {error_data}\n\n"
+                elif document.ocr_status in ("completed", "failed"):
+                    remaining.discard(job_id)
+                    job_data = json.dumps({"type": "job", "job": format_ocr_job(document).model_dump(mode="json")})
+                    yield f"data: {job_data}\n\n"
+            
+            if remaining:
+                # Woken early by completions in this process; polls cover other workers
+                await pool.wait_for_update(timeout=1.0)
+        
+        done_data = json.dumps({"type": "done", "pending": [str(job_id) for job_id in remaining]})
+        yield f"data: {done_data}\n\n"
+    
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@router.get("/documents/ocr/jobs/{job_id}", response_model=OCRJobResponse)
+async def get_ocr_job(
+    job_id: UUID,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status and result of an OCR job"""
+    
+    result = await db.execute(
+        select(Document).where(
+            and_(
+                Document.id == job_id,
+                Document.user_id == user_id,
+                Document.ocr_status.isnot(None)
+            )
+        )
+    )
+    document = result.scalar_one_or_none()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="OCR job not found"
+        )
+    
+    return format_ocr_job(document)
 
 
 # ==================== LISTING VERIFICATION ENDPOINTS ====================
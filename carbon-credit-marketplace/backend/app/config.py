@@ -12,9 +12,28 @@ class Settings(BaseSettings):
     QDRANT_URL: str = "http://localhost:6333"
     QDRANT_COLLECTION_NAME: str = "carbon_credits_kb"
     QDRANT_FORMALITIES_COLLECTION_NAME: str = "formalities_kb"
+    # Corpora up to this many chunks are searched in-process; larger ones go to Qdrant first
+    RAG_LOCAL_INDEX_MAX_CHUNKS: int = 10000
+    RAG_CHUNK_MAX_TOKENS: int = 400
+    RAG_CHUNK_OVERLAP_TOKENS: int = 50
+    RAG_PROMPT_TOKEN_BUDGET: int = 3000  # Education agent prompt: instructions + question + retrieved context
     
     # OpenAI
     OPENAI_API_KEY: str = ""
+    # Alternative OpenAI-compatible endpoint, e.g. http://localhost:8001/v1 for scripts/openai_stub_server.py
+    OPENAI_BASE_URL: str = ""
+    
+    # LLM gateway (limits apply per model, per worker process)
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MODEL_CONCURRENCY: str = ""  # Per-model overrides, e.g. "gpt-4o=4,gpt-4o-mini=16"
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 30.0  # Fail fast instead of queueing longer than this
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 8.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production-min-32-chars"
@@ -25,9 +44,53 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
     
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text or json
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped rather than blocking the caller
+    LOG_SAMPLE_BURST: int = 20  # Per message template per second; 0 disables sampling
+    
+    # Instrumentation (GET /metrics)
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_REQUEST_MS: float = 1000.0  # Log slower requests with their query breakdown; 0 disables
+    METRICS_EVENT_LOOP_INTERVAL_SECONDS: float = 0.5
+    
+    # Admin endpoints and profiling (POST /api/admin/profile, "X-Profile: 1" requests, SIGUSR2)
+    ADMIN_TOKEN: str = ""  # Sent as X-Admin-Token; empty disables the admin endpoints and request profiling
+    PROFILING_INTERVAL_MS: float = 10.0
+    PROFILING_MAX_SECONDS: float = 60.0
+    PROFILING_SIGNAL_SECONDS: float = 30.0  # Length of a SIGUSR2-triggered profile; 0 disables the handler
+    PROFILING_OUTPUT_DIR: str = "profiles"
+    
+    # Conditional GETs on public market endpoints (ETag / Last-Modified / Cache-Control)
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 10  # For data-backed responses; 0 makes clients revalidate every time
+    HTTP_CACHE_STATIC_MAX_AGE_SECONDS: int = 3600  # For constant reference data
+    
+    # Read-through cache for hot data (market overview, listings summary, user principals, account balances)
+    CACHE_BACKEND: str = "memory"  # memory (per worker), shm (shared by the workers on a host), redis, or none
+    CACHE_DEFAULT_TTL_SECONDS: float = 300.0  # Upper bound on staleness if an invalidation is lost
+    CACHE_MAX_ENTRIES: int = 10000  # memory backend
+    CACHE_SHM_PATH: str = ""  # shm backend; defaults to /dev/shm/<CACHE_KEY_PREFIX>-cache
+    CACHE_SHM_SIZE_MB: int = 64
+    CACHE_SHM_SLOT_BYTES: int = 16384  # Largest cacheable value, serialized
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "carbon-marketplace"
+    CACHE_INVALIDATION_CHANNEL: str = "cache_invalidation"  # Postgres LISTEN/NOTIFY channel; empty disables fan-out
+    
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     
+    # Document uploads / OCR
+    UPLOAD_DIR: str = "uploads"
+    OCR_MAX_CONCURRENCY: int = 4  # Concurrent OCR jobs across all worker processes
+    
+    # Chat sessions (calculator / formalities agents)
+    CHAT_STATE_BACKEND: str = "memory"  # memory, postgres or redis
+    CHAT_STATE_REDIS_URL: str = "redis://localhost:6379/0"
+    CHAT_STATE_MAX_SESSIONS: int = 10000  # In-memory backend only
+    CHAT_STATE_TTL_SECONDS: int = 86400
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,594 @@
+"""
+Shared read-through cache for hot data
+
+cache.get_or_load(key, loader, tags) returns the cached value for key, or
+runs loader() and stores its result. Values are JSON-compatible (they are
+serialized with orjson by the shared backends) and must not be mutated by
+callers.
+
+Backends (CACHE_BACKEND):
+- memory: an LRU dict per worker process
+- shm: a fixed-size table in a memory-mapped file (/dev/shm by default),
+  shared by every worker on the host
+- redis: any Redis-compatible server, shared by every host (needs the redis
+  package)
+- none: no caching
+
+Invalidation is by tag rather than by key. Each tag has a version counter in
+the backend; an entry remembers the versions of its tags when it was loaded
+and is a miss once any of them has moved on. The snapshot is taken before the
+loader runs, so a write that commits while a value is being computed still
+invalidates it. Every entry also carries ALL_TAG, which clears everything.
+
+Writers don't call the cache. install_write_tracking() hooks the ORM: a
+commit that writes listings, transactions, credit accounts or users emits
+their tags (WRITE_TAGS) with pg_notify inside the same transaction, so
+Postgres only delivers it if the commit succeeds, and invalidates the writing
+worker's cache right after the commit. The same hooks bump the data_versions
+rows of VERSIONED_TAGS in that transaction, which HTTP validators
+(app.core.http_cache) are built from. Every worker LISTENs on
+CACHE_INVALIDATION_CHANNEL and bumps the tags it receives; when the listening
+connection drops, notifications may have been missed and the worker clears
+its cache on reconnecting.
+
+Concurrent misses for the same key in a worker share one loader run instead
+of stampeding the database. Loaders run as their own task (open their own
+session), so a caller that disconnects doesn't abort the load the others are
+waiting on.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.core.metrics import REGISTRY, Counter
+from app.core.serialization import dumps
+from app.models.models import CreditAccount, CreditListing, DataVersion, Transaction, User
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ALL_TAG = "*"
+LISTINGS_TAG = "listings"
+TRADES_TAG = "trades"
+
+
+def user_tag(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+
+def ledger_tag(user_id: Any) -> str:
+    return f"ledger:{user_id}"
+
+
+# Tags emitted when a row of the model is inserted, updated or deleted
+WRITE_TAGS: Dict[type, Callable[[Any], Tuple[str, ...]]] = {
+    CreditListing: lambda listing: (LISTINGS_TAG,),
+    Transaction: lambda txn: (TRADES_TAG,),
+    CreditAccount: lambda account: (ledger_tag(account.user_id),),
+    User: lambda user: (user_tag(user.id),),
+}
+# Tags that also keep a data_versions row for ETag / Last-Modified
+VERSIONED_TAGS = frozenset({LISTINGS_TAG, TRADES_TAG})
+
+MAX_TTL_SECONDS = 3600.0
+NOTIFY_PAYLOAD_LIMIT = 7900  # Postgres rejects NOTIFY payloads of 8000 bytes or more
+LISTEN_RETRY_MAX_SECONDS = 30.0
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total", "Read-through cache lookups by key namespace and result", ("namespace", "result")
+))
+CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    "cache_invalidated_tags_total", "Cache tags invalidated, by where the invalidation came from", ("source",)
+))
+
+Entry = Tuple[List[int], Any]  # Tag versions at load time, value
+
+
+def _encode(versions: List[int], value: Any) -> bytes:
+    return dumps([versions, value])
+
+
+def _decode(raw: Optional[bytes]) -> Optional[Entry]:
+    if raw is None:
+        return None
+    versions, value = orjson.loads(raw)
+    return versions, value
+
+
+# ---------- backends ----------
+
+_TAG_SLOTS = 4096  # Tag counters per backend table
+
+class NullBackend:
+    """Caches nothing"""
+
+    enabled = False
+    nowait = True
+
+    async def lookup(self, key: str, tags: Sequence[str]) -> Tuple[Optional[Entry], List[int]]:
+        return None, []
+
+    async def store(self, key: str, versions: List[int], value: Any, ttl: float) -> None:
+        pass
+
+    def bump_nowait(self, tags: Iterable[str]) -> None:
+        pass
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(NullBackend):
+    """
+    LRU dict in this worker; values are stored as is, without serializing.
+    Tags hash onto a fixed table of counters, as in SharedMemoryBackend, so
+    per-user tags don't grow it.
+    """
+
+    enabled = True
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, List[int], Any]]" = OrderedDict()
+        self.tags: List[int] = [0] * _TAG_SLOTS
+
+    async def lookup(self, key: str, tags: Sequence[str]) -> Tuple[Optional[Entry], List[int]]:
+        versions = [self.tags[hash(tag) % _TAG_SLOTS] for tag in tags]
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, versions
+        expires, stored, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None, versions
+        self.entries.move_to_end(key)
+        return (stored, value), versions
+
+    async def store(self, key: str, versions: List[int], value: Any, ttl: float) -> None:
+        self.entries[key] = (time.monotonic() + ttl, versions, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def bump_nowait(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self.tags[hash(tag) % _TAG_SLOTS] += 1
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        self.bump_nowait(tags)
+
+
+_SHM_MAGIC = b"CCMCACH1"
+_SHM_HEADER = struct.Struct("<8sIII")  # magic, tag slots, entry slots, slot size
+_SHM_HEADER_BYTES = 64
+_SLOT_SEQ = struct.Struct("<I")
+_SLOT_FIELDS = struct.Struct("<16sdI")  # key digest, expiry (wall clock), payload length
+_SLOT_HEADER_BYTES = _SLOT_SEQ.size + _SLOT_FIELDS.size
+_TAG_COUNTER = struct.Struct("<Q")
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class SharedMemoryBackend(NullBackend):
+    """
+    Fixed-size hash table in a memory-mapped file, shared by the processes
+    that open the same path (Unix only).
+
+    Each key maps to two candidate slots; a full table overwrites the entry
+    closest to expiry. Values larger than a slot are not cached. Readers take
+    no lock: a per-slot sequence number is odd while a writer is inside the
+    slot, and a read is discarded if the number changed under it. Writers
+    serialize on an flock of the file. Tags hash onto a fixed table of
+    counters, so two tags can share a counter (which only over-invalidates).
+    """
+
+    enabled = True
+
+    def __init__(self, path: str, size_bytes: int, slot_bytes: int):
+        import fcntl
+
+        self._flock = fcntl.flock
+        self._lock_ex, self._unlock = fcntl.LOCK_EX, fcntl.LOCK_UN
+        self.slot_bytes = slot_bytes
+        self.tags_offset = _SHM_HEADER_BYTES
+        self.slots_offset = self.tags_offset + _TAG_SLOTS * _TAG_COUNTER.size
+        self.slots = max(2, (size_bytes - self.slots_offset) // slot_bytes)
+        size = self.slots_offset + self.slots * slot_bytes
+        header = _SHM_HEADER.pack(_SHM_MAGIC, _TAG_SLOTS, self.slots, slot_bytes)
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            # The first process to open (or a restart with another layout) formats the table
+            if os.fstat(self.fd).st_size != size or os.pread(self.fd, _SHM_HEADER.size, 0) != header:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, header, 0)
+        self.map = mmap.mmap(self.fd, size)
+
+    @contextmanager
+    def _locked(self):
+        self._flock(self.fd, self._lock_ex)
+        try:
+            yield
+        finally:
+            self._flock(self.fd, self._unlock)
+
+    def _tag_offset(self, tag: str) -> int:
+        index = int.from_bytes(_digest(tag)[:8], "little") % _TAG_SLOTS
+        return self.tags_offset + index * _TAG_COUNTER.size
+
+    def _candidates(self, digest: bytes) -> Tuple[int, int]:
+        index = int.from_bytes(digest[:8], "little") % self.slots
+        return (
+            self.slots_offset + index * self.slot_bytes,
+            self.slots_offset + ((index + 1) % self.slots) * self.slot_bytes,
+        )
+
+    def _read(self, offset: int, digest: bytes) -> Optional[bytes]:
+        (seq,) = _SLOT_SEQ.unpack_from(self.map, offset)
+        if seq & 1:
+            return None
+        slot_digest, expires, length = _SLOT_FIELDS.unpack_from(self.map, offset + _SLOT_SEQ.size)
+        if slot_digest != digest or expires < time.time():
+            return None
+        start = offset + _SLOT_HEADER_BYTES
+        payload = self.map[start:start + length]
+        if _SLOT_SEQ.unpack_from(self.map, offset)[0] != seq:
+            return None  # Overwritten while copying
+        return payload
+
+    async def lookup(self, key: str, tags: Sequence[str]) -> Tuple[Optional[Entry], List[int]]:
+        versions = [_TAG_COUNTER.unpack_from(self.map, self._tag_offset(tag))[0] for tag in tags]
+        digest = _digest(key)
+        for offset in self._candidates(digest):
+            raw = self._read(offset, digest)
+            if raw is not None:
+                try:
+                    return _decode(raw), versions
+                except orjson.JSONDecodeError:
+                    return None, versions
+        return None, versions
+
+    async def store(self, key: str, versions: List[int], value: Any, ttl: float) -> None:
+        payload = _encode(versions, value)
+        if len(payload) > self.slot_bytes - _SLOT_HEADER_BYTES:
+            logger.debug("Value too large for the shared cache", extra={"key": key, "bytes": len(payload)})
+            return
+        digest = _digest(key)
+        now = time.time()
+        with self._locked():
+            # Same key first, then a free or expired slot, then whichever expires sooner
+            candidates = []
+            for offset in self._candidates(digest):
+                slot_digest, expires, _ = _SLOT_FIELDS.unpack_from(self.map, offset + _SLOT_SEQ.size)
+                rank = 0 if slot_digest == digest else 1 if expires < now else 2
+                candidates.append((rank, expires, offset))
+            offset = min(candidates)[2]
+            (seq,) = _SLOT_SEQ.unpack_from(self.map, offset)
+            _SLOT_SEQ.pack_into(self.map, offset, seq + 1)
+            start = offset + _SLOT_HEADER_BYTES
+            self.map[start:start + len(payload)] = payload
+            _SLOT_FIELDS.pack_into(self.map, offset + _SLOT_SEQ.size, digest, now + ttl, len(payload))
+            _SLOT_SEQ.pack_into(self.map, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def bump_nowait(self, tags: Iterable[str]) -> None:
+        with self._locked():
+            for tag in tags:
+                offset = self._tag_offset(tag)
+                (version,) = _TAG_COUNTER.unpack_from(self.map, offset)
+                _TAG_COUNTER.pack_into(self.map, offset, (version + 1) & 0xFFFFFFFFFFFFFFFF)
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        self.bump_nowait(tags)
+
+    async def close(self) -> None:
+        self.map.close()
+        os.close(self.fd)
+
+
+class RedisBackend(NullBackend):
+    """Redis-compatible server shared by every worker and host"""
+
+    enabled = True
+    nowait = False
+
+    def __init__(self, url: str, prefix: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package (pip install redis)") from e
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def lookup(self, key: str, tags: Sequence[str]) -> Tuple[Optional[Entry], List[int]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self._entry_key(key))
+            pipe.mget([self._tag_key(tag) for tag in tags])
+            raw, versions = await pipe.execute()
+        return _decode(raw), [int(version or 0) for version in versions]
+
+    async def store(self, key: str, versions: List[int], value: Any, ttl: float) -> None:
+        await self.client.set(self._entry_key(key), _encode(versions, value), px=int(ttl * 1000))
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self._tag_key(tag))
+                # A tag key that expired would read as 0 again and revive entries stored at 0;
+                # outliving the longest entry TTL after its last bump rules that out
+                pipe.pexpire(self._tag_key(tag), int(2 * MAX_TTL_SECONDS * 1000))
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_backend() -> NullBackend:
+    backend = settings.CACHE_BACKEND.lower()
+    if backend == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES)
+    if backend == "shm":
+        path = settings.CACHE_SHM_PATH or os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            f"{settings.CACHE_KEY_PREFIX}-cache"
+        )
+        return SharedMemoryBackend(path, settings.CACHE_SHM_SIZE_MB * 1024 * 1024, settings.CACHE_SHM_SLOT_BYTES)
+    if backend == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL, settings.CACHE_KEY_PREFIX)
+    if backend != "none":
+        logger.warning("Unknown CACHE_BACKEND, caching disabled", extra={"backend": settings.CACHE_BACKEND})
+    return NullBackend()
+
+
+# ---------- cache ----------
+
+class Cache:
+    def __init__(self, backend: Optional[NullBackend] = None, default_ttl: float = 300.0):
+        self.backend = backend or NullBackend()
+        self.default_ttl = default_ttl
+        self._inflight: Dict[str, Tuple[List[int], asyncio.Task]] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None
+    ) -> Any:
+        """The cached value of key, loading it with loader() on a miss"""
+        if not self.backend.enabled:
+            return await loader()
+        namespace = key.split(":", 1)[0]
+        tags = [ALL_TAG, *tags]
+        try:
+            entry, versions = await self.backend.lookup(key, tags)
+        except Exception as e:
+            CACHE_REQUESTS.inc(namespace, "error")
+            logger.warning("Cache lookup failed", extra={"key": key, "error": str(e)})
+            return await loader()
+        if entry is not None and entry[0] == versions:
+            CACHE_REQUESTS.inc(namespace, "hit")
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        # Only join a load that saw the same versions; an older one may predate a write this caller depends on
+        if inflight is not None and inflight[0] == versions:
+            CACHE_REQUESTS.inc(namespace, "coalesced")
+            task = inflight[1]
+        else:
+            CACHE_REQUESTS.inc(namespace, "miss")
+            ttl = min(self.default_ttl if ttl is None else ttl, MAX_TTL_SECONDS)
+            task = asyncio.ensure_future(self._load(key, loader, versions, ttl))
+            self._inflight[key] = (versions, task)
+            task.add_done_callback(lambda done: self._load_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], versions: List[int], ttl: float) -> Any:
+        value = await loader()
+        try:
+            await self.backend.store(key, versions, value, ttl)
+        except Exception as e:
+            logger.warning("Cache store failed", extra={"key": key, "error": str(e)})
+        return value
+
+    def _load_done(self, key: str, task: asyncio.Task) -> None:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, even if every caller went away
+
+    async def invalidate(self, tags: Iterable[str], source: str = "local") -> None:
+        tags = list(tags)
+        try:
+            await self.backend.bump(tags)
+        except Exception as e:
+            logger.error("Cache invalidation failed", extra={"tags": tags[:20], "error": str(e)})
+            return
+        CACHE_INVALIDATIONS.inc(source, amount=len(tags))
+
+    def invalidate_soon(self, tags: Iterable[str], source: str = "local") -> None:
+        """Invalidate from sync code: at once for local backends, else in a task on the running loop"""
+        tags = list(tags)
+        if self.backend.nowait:
+            self.backend.bump_nowait(tags)
+            CACHE_INVALIDATIONS.inc(source, amount=len(tags))
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop, so nothing in this process reads the cache
+        task = loop.create_task(self.invalidate(tags, source))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+cache = Cache()
+
+
+# ---------- write-driven invalidation ----------
+
+_PENDING_TAGS = "cache_tags"  # Session.info keys
+_COMMITTED_TAGS = "cache_tags_committed"
+
+
+def _payloads(tags: Iterable[str]) -> Iterator[str]:
+    payload = ""
+    for tag in sorted(tags):
+        if payload and len(payload) + len(tag) + 1 > NOTIFY_PAYLOAD_LIMIT:
+            yield payload
+            payload = ""
+        payload = f"{payload},{tag}" if payload else tag
+    if payload:
+        yield payload
+
+
+def publish_invalidation(session: Session, tags: Iterable[str]) -> None:
+    """NOTIFY every worker of tags when the session's transaction commits"""
+    if not settings.CACHE_INVALIDATION_CHANNEL:
+        return
+    for payload in _payloads(tags):
+        session.execute(select(func.pg_notify(settings.CACHE_INVALIDATION_CHANNEL, payload)))
+
+
+def bump_versions(session: Session, tags: Iterable[str]) -> None:
+    """Increment the data versions of tags in the session's transaction"""
+    # Sorted, so concurrent writers lock the rows in the same order
+    rows = [{"scope": tag, "version": 1, "updated_at": func.clock_timestamp()} for tag in sorted(tags)]
+    if not rows:
+        return
+    statement = insert(DataVersion).values(rows)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[DataVersion.scope],
+        set_={"version": DataVersion.version + 1, "updated_at": func.clock_timestamp()}
+    ))
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    # Collections still hold the pre-flush state here, and new rows have their keys
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tagger = WRITE_TAGS.get(type(obj))
+        if tagger is not None:
+            session.info.setdefault(_PENDING_TAGS, set()).update(tagger(obj))
+
+
+def _before_commit(session: Session) -> None:
+    # Commit flushes after this hook; flush now so pending changes are recorded
+    session.flush()
+    tags = session.info.pop(_PENDING_TAGS, None)
+    if tags:
+        bump_versions(session, tags & VERSIONED_TAGS)
+        publish_invalidation(session, tags)
+        session.info[_COMMITTED_TAGS] = tags
+
+
+def _after_commit(session: Session) -> None:
+    tags = session.info.pop(_COMMITTED_TAGS, None)
+    if tags:
+        cache.invalidate_soon(tags)
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_TAGS, None)
+    session.info.pop(_COMMITTED_TAGS, None)
+
+
+def install_write_tracking() -> None:
+    """Bump data versions and emit cache tags from every commit that writes a WRITE_TAGS model (idempotent)"""
+    if event.contains(Session, "before_commit", _before_commit):
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_soft_rollback)
+
+
+# ---------- LISTEN ----------
+
+def _on_notification(connection, pid: int, channel: str, payload: str) -> None:
+    cache.invalidate_soon(payload.split(","), source="notify")
+
+
+async def listen_for_invalidations() -> None:
+    """Apply invalidations published by other workers, reconnecting as needed (runs until cancelled)"""
+    import asyncpg
+
+    dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    delay = 1.0
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(settings.CACHE_INVALIDATION_CHANNEL, _on_notification)
+            # Whatever was published before this point is unknown
+            await cache.invalidate([ALL_TAG], source="reconnect")
+            logger.info("Listening for cache invalidations", extra={"channel": settings.CACHE_INVALIDATION_CHANNEL})
+            delay = 1.0
+            await lost.wait()
+            logger.warning("Cache invalidation listener disconnected")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Cache invalidation listener failed", extra={"error": str(e), "retry_seconds": delay})
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, LISTEN_RETRY_MAX_SECONDS)
+
+
+_listener_task: Optional[asyncio.Task] = None
+
+
+async def start_cache() -> None:
+    """Open the configured backend and start listening for invalidations"""
+    global _listener_task
+    cache.backend = create_backend()
+    cache.default_ttl = settings.CACHE_DEFAULT_TTL_SECONDS
+    # Shared backends may hold entries from before a restart (and init_db recreates the tables)
+    await cache.invalidate([ALL_TAG], source="startup")
+    if cache.backend.enabled and settings.CACHE_INVALIDATION_CHANNEL:
+        _listener_task = asyncio.create_task(listen_for_invalidations())
+
+
+async def stop_cache() -> None:
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+    backend, cache.backend = cache.backend, NullBackend()
+    await backend.close()
@@ -0,0 +1,153 @@
+"""
+HTTP caching for public, read-heavy endpoints
+
+Endpoints declare what their response depends on with an HttpCache
+dependency. It sends ETag, Last-Modified and Cache-Control headers, and
+answers If-None-Match / If-Modified-Since with 304 before the endpoint body
+runs, so an unchanged poll costs one primary-key read of data_versions
+instead of the endpoint's queries.
+
+Validators come from data versions: one data_versions row per scope
+(LISTINGS_TAG, TRADES_TAG) holding a counter and the time of the last change.
+The write hooks in app.core.cache bump the scopes of any CreditListing or
+Transaction write right before the commit, inside the same transaction; a
+reader sees the new version exactly when it can see the new data. Endpoints
+whose output also drifts with time (24h windows) add a time bucket to the
+ETag, and constant endpoints are tagged with a digest of their content.
+Endpoints that serve their body from the read-through cache key it by
+CacheValidators.version, so a cached body never goes out under an ETag newer
+than its data.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.serialization import dumps
+from app.database import get_db
+from app.models.models import DataVersion
+
+settings = get_settings()
+
+
+# ---------- data versions ----------
+
+async def read_versions(db: AsyncSession, scopes: List[str]) -> List[Tuple[str, int, Optional[datetime]]]:
+    result = await db.execute(
+        select(DataVersion.scope, DataVersion.version, DataVersion.updated_at).where(DataVersion.scope.in_(scopes))
+    )
+    found = {row.scope: (row.version, row.updated_at) for row in result.all()}
+    # A scope that was never written has no row yet
+    return [(scope, *found.get(scope, (0, None))) for scope in scopes]
+
+
+# ---------- conditional GET ----------
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2)
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+class CacheValidators:
+    """
+    Headers for a cacheable response, and `version`, the digest the ETag is
+    made of, for keying cached bodies
+    """
+
+    def __init__(self, headers: Dict[str, str], version: str):
+        self.headers = headers
+        self.version = version
+
+    def apply(self, response: Response) -> Response:
+        """For endpoints that build their own Response (dependency headers only reach returned models)"""
+        response.headers.update(self.headers)
+        return response
+
+
+class HttpCache:
+    """
+    Dependency for a public GET endpoint whose output depends only on the
+    given data-version scopes (plus, with window_seconds, the current time
+    bucket) or, with static, on a constant.
+    """
+
+    def __init__(
+        self,
+        *scopes: str,
+        max_age: Optional[int] = None,
+        window_seconds: int = 0,
+        static: Any = None
+    ):
+        self.scopes = sorted(scopes)
+        self.max_age = max_age
+        self.window_seconds = window_seconds
+        self.static_digest = _digest(dumps(static)) if static is not None else None
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_db)
+    ) -> CacheValidators:
+        parts: List[Any] = [request.url.path, request.url.query]
+        last_modified: Optional[datetime] = None
+
+        if self.static_digest is not None:
+            parts.append(self.static_digest)
+            max_age = settings.HTTP_CACHE_STATIC_MAX_AGE_SECONDS if self.max_age is None else self.max_age
+        else:
+            max_age = settings.HTTP_CACHE_MAX_AGE_SECONDS if self.max_age is None else self.max_age
+        if self.scopes:
+            for scope, version, updated_at in await read_versions(db, self.scopes):
+                # updated_at distinguishes equal counters from before and after a database reset
+                parts.append(f"{scope}:{version}:{updated_at.isoformat() if updated_at else ''}")
+                if updated_at is not None and (last_modified is None or updated_at > last_modified):
+                    last_modified = updated_at
+        if self.window_seconds:
+            now = time.time()
+            parts.append(int(now // self.window_seconds))
+            max_age = min(max_age, int(self.window_seconds - now % self.window_seconds))
+            last_modified = None  # Content also changes with time
+
+        version = _digest(*parts)
+        etag = f'W/"{version}"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match is not None:
+            fresh = _etag_matches(if_none_match, etag)
+        else:
+            # If-None-Match takes precedence when both are sent
+            fresh = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+        if fresh:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+        return CacheValidators(headers, version)
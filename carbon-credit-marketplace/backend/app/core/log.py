@@ -0,0 +1,239 @@
+"""
+Structured, non-blocking logging
+
+Modules log through the standard library (`logging.getLogger(__name__)`, with
+structured fields passed as `extra={...}`); configure_logging() routes the
+"app" logger hierarchy through a bounded queue to a background thread that
+formats and writes the records, so a log call on the event loop costs a few
+microseconds and never waits on stdout:
+
+- records below LOG_LEVEL are rejected before any formatting
+- a message template logged more than LOG_SAMPLE_BURST times per second is
+  sampled: the excess is dropped and counted on the next record that passes
+  (ERROR and above are never sampled)
+- when the queue is full, records are dropped and counted instead of blocking
+- every record carries the request ID of the HTTP request that produced it
+  (X-Request-ID, generated when the client sends none)
+
+LOG_FORMAT=json writes one JSON object per line; the default text format is
+human-readable with the structured fields appended as key=value pairs.
+"""
+
+import json
+import logging
+import queue
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.core.metrics import REGISTRY
+
+settings = get_settings()
+
+APP_LOGGER = "app"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Client-supplied request IDs are only trusted if they look like an ID
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# LogRecord attributes that are not structured fields
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "suppressed"}
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_counters: Dict[str, int] = {"dropped": 0, "suppressed": 0}
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Let at most `burst` records per message template through per second; count the rest"""
+
+    def __init__(self, burst: int):
+        super().__init__()
+        self.burst = burst
+        self.windows: Dict[tuple, list] = {}  # (logger, template) -> [window start, passed, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= 1.0:
+            suppressed = window[2] if window is not None else 0
+            if len(self.windows) > 10_000:
+                self.windows.clear()  # Unbounded templates (pre-formatted messages); start over
+            self.windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        _counters["suppressed"] += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops them when the queue is full"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change later), but leave the
+        # expensive formatting to the writer thread
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _counters["dropped"] += 1
+
+
+def _fields(record: logging.LogRecord) -> Dict:
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [
+            datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            f"{record.levelname:<7}",
+            record.name,
+        ]
+        if getattr(record, "request_id", None):
+            parts.append(f"[{record.request_id}]")
+        parts.append(record.getMessage())
+        fields = _fields(record)
+        if getattr(record, "suppressed", None):
+            fields["suppressed"] = record.suppressed
+        if fields:
+            parts.append(" ".join(f"{key}={value}" for key, value in fields.items()))
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    queue_size: Optional[int] = None,
+    sample_burst: Optional[int] = None
+) -> None:
+    """Route the "app" loggers through the queue; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or settings.LOG_LEVEL).upper()
+    log_format = log_format or settings.LOG_FORMAT
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_BURST if sample_burst is None else sample_burst))
+    queue_handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.handlers = [queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware binding a request ID to the request's logs and echoing it in X-Request-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_PATTERN.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def _logging_metrics():
+    return [
+        "# HELP log_records_dropped_total Log records dropped because the queue was full",
+        "# TYPE log_records_dropped_total counter",
+        f"log_records_dropped_total {_counters['dropped']}",
+        "# HELP log_records_suppressed_total Log records dropped by per-message sampling",
+        "# TYPE log_records_suppressed_total counter",
+        f"log_records_suppressed_total {_counters['suppressed']}",
+    ]
+
+
+REGISTRY.add_collector(_logging_metrics)
@@ -0,0 +1,382 @@
+"""
+Request instrumentation with Prometheus text exposition
+
+Records per-route latency, SQL statements and time per request (SQLAlchemy
+cursor events), LLM and Qdrant call counts and durations, and event-loop lag,
+in process and without extra dependencies. GET /metrics renders everything
+in the Prometheus text format; requests slower than METRICS_SLOW_REQUEST_MS
+are logged with their query breakdown.
+
+Metrics are per worker process: with several uvicorn workers, scrape each
+one (or aggregate in Prometheus).
+"""
+
+import asyncio
+import logging
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# Distinct statements kept per request for the slow-request log
+MAX_STATEMENTS_PER_REQUEST = 200
+SLOW_LOG_TOP_STATEMENTS = 5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values: str) -> None:
+        self.values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics plus collectors that produce exposition lines at scrape time"""
+
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {_escape(str(e))}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled"
+))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type", ("operation",), QUERY_BUCKETS
+))
+DB_QUERIES_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",), COUNT_BUCKETS
+))
+DB_TIME_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request", ("route",)
+))
+EXTERNAL_CALL_DURATION = REGISTRY.register(Histogram(
+    "external_call_duration_seconds", "LLM and vector store call latency (including queueing and retries)",
+    ("service", "operation", "outcome")
+))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer on the event loop beyond its schedule", (), LAG_BUCKETS
+))
+EVENT_LOOP_LAG_LAST = REGISTRY.register(Gauge(
+    "event_loop_lag_last_seconds", "Most recent event loop lag sample"
+))
+
+
+# ---------- per-request accounting ----------
+
+class RequestStats:
+    """What one HTTP request spent its time on"""
+
+    def __init__(self):
+        # Set once the response is sent; work after that (background tasks) isn't the request's
+        self.finished = False
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements: Dict[str, list] = {}  # statement -> [count, seconds]
+        self.external: Dict[str, list] = {}  # "service operation" -> [count, seconds]
+
+    def record_statement(self, statement: str, seconds: float) -> None:
+        if self.finished:
+            return
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            if len(self.statements) >= MAX_STATEMENTS_PER_REQUEST:
+                return
+            entry = self.statements[statement] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def record_external(self, key: str, seconds: float) -> None:
+        if self.finished:
+            return
+        entry = self.external.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _current_request.get()
+
+
+class external_call:
+    """Time an LLM / Qdrant call: `with external_call("qdrant", "search"): ...`"""
+
+    __slots__ = ("service", "operation", "started", "stats")
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.stats = _current_request.get()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            outcome = "cancelled"  # Caller went away, e.g. a client closed its stream
+        else:
+            outcome = "error"
+        EXTERNAL_CALL_DURATION.observe(elapsed, self.service, self.operation, outcome)
+        if self.stats is not None:
+            self.stats.record_external(f"{self.service} {self.operation}", elapsed)
+        return False
+
+
+# ---------- SQLAlchemy ----------
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement of an (async) engine and attribute it to the current request"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_DURATION.observe(elapsed, operation)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.record_statement(statement, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    def pool_metrics() -> Iterable[str]:
+        pool = sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []
+        return [
+            "# HELP db_pool_checked_out Connections currently checked out of the pool",
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool.checkedout()}",
+            "# HELP db_pool_size Configured pool size",
+            "# TYPE db_pool_size gauge",
+            f"db_pool_size {pool.size()}",
+        ]
+
+    REGISTRY.add_collector(pool_metrics)
+
+
+# ---------- HTTP ----------
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template and the SQL / external
+    call breakdown of each request. Requests are timed until the last body
+    chunk is sent, so streaming responses are included and background tasks
+    running after the response are not.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self._route_templates: Optional[Dict[Callable, str]] = None
+
+    def route_template(self, scope) -> str:
+        # Starlette 0.27 records the matched endpoint, not the route, in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_templates is None:
+            self._route_templates = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._route_templates.get(endpoint, scope.get("path", "unmatched"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+
+        def finish() -> None:
+            if stats.finished:
+                return
+            stats.finished = True
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.inc(amount=-1)
+            route = self.route_template(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route, str(status_code))
+            DB_QUERIES_PER_REQUEST.observe(stats.sql_count, route)
+            DB_TIME_PER_REQUEST.observe(stats.sql_seconds, route)
+            if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+                log_slow_request(scope["method"], route, status_code, elapsed, stats)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # The response is complete; BackgroundTasks run after this point
+                finish()
+                if _current_request.get() is stats:
+                    _current_request.set(None)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(amount=1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_request.reset(token)
+            finish()
+
+
+def log_slow_request(method: str, route: str, status_code: int, elapsed: float, stats: RequestStats) -> None:
+    top = sorted(stats.statements.items(), key=lambda item: -item[1][1])[:SLOW_LOG_TOP_STATEMENTS]
+    logger.warning(
+        "Slow request",
+        extra={
+            "method": method,
+            "route": route,
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 1),
+            "sql_statements": stats.sql_count,
+            "sql_ms": round(stats.sql_seconds * 1000, 1),
+            "external_calls": {
+                key: {"calls": count, "ms": round(seconds * 1000, 1)} for key, (count, seconds) in stats.external.items()
+            },
+            "top_statements": [
+                {"ms": round(seconds * 1000, 1), "count": count, "sql": _WHITESPACE.sub(" ", statement).strip()[:200]}
+                for statement, (count, seconds) in top
+            ],
+        }
+    )
+
+
+# ---------- event loop ----------
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sample how late a periodic timer fires; blocking code on the loop shows up as lag"""
+    while True:
+        scheduled = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - scheduled)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,294 @@
+"""
+On-demand sampling profiler
+
+A background thread snapshots the Python stacks of the worker every few
+milliseconds (sys._current_frames()) and counts identical stacks. Nothing is
+hooked into the interpreter, so the code being profiled runs at full speed and
+the cost is one stack walk per thread per sample (well under 1% at the default
+10 ms interval); when no profile is running there is no cost at all.
+
+Output is the collapsed-stack format ("frame;frame;frame count" per line) read
+by flamegraph.pl, inferno, speedscope and most other flamegraph tools.
+
+Three ways to start one, all off unless configured:
+- POST /api/admin/profile?seconds=N profiles the whole worker (needs ADMIN_TOKEN)
+- a request sent with "X-Profile: 1" and a valid X-Admin-Token is profiled on
+  its own; the response's X-Profile header names where to fetch the result
+- SIGUSR2 profiles the worker for PROFILING_SIGNAL_SECONDS and writes the
+  result to PROFILING_OUTPUT_DIR
+
+Only one profile runs per worker at a time and durations are capped at
+PROFILING_MAX_SECONDS.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.core.log import current_request_id
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+MIN_INTERVAL_SECONDS = 0.001
+REQUEST_INTERVAL_SECONDS = 0.001  # Requests are short; one task on one thread is cheap to sample finely
+REQUEST_PROFILES_KEPT = 20
+
+# Stack label used for request-profile samples taken while the request was awaiting I/O
+WAITING_FRAME = "[waiting]"
+
+_session_lock = threading.Lock()
+_request_profiles: "OrderedDict[str, str]" = OrderedDict()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this worker"""
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+def clamp_duration(seconds: float) -> float:
+    return max(0.1, min(seconds, settings.PROFILING_MAX_SECONDS))
+
+
+def _path_prefixes() -> List[str]:
+    # Longest first, so site-packages wins over the prefix that contains it
+    return sorted({os.path.join(os.path.abspath(path or os.curdir), "") for path in sys.path}, key=len, reverse=True)
+
+
+class SamplingProfiler:
+    """
+    Counts collapsed stacks sampled from a background thread.
+
+    With `task` set, only samples of the event loop thread taken while that
+    task is running are attributed to its stack; samples taken while it is
+    suspended are counted as WAITING_FRAME. Without it every thread is sampled
+    and stacks are rooted at the thread name.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        task: Optional[asyncio.Task] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ):
+        self.interval = max(interval, MIN_INTERVAL_SECONDS)
+        self.task = task
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident() if task is not None else None
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self.duration = 0.0
+        self._labels: Dict[object, str] = {}  # code object -> frame label
+        self._thread_names: Dict[int, str] = {}
+        self._prefixes = _path_prefixes()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        if not _session_lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration = time.perf_counter() - self._started
+        _session_lock.release()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.task is not None:
+                if asyncio.current_task(self.loop) is self.task:
+                    frame = frames.get(self.loop_thread_id)
+                    if frame is not None:
+                        self._record(self._stack(frame))
+                else:
+                    self._record(WAITING_FRAME)
+            else:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._record(f"{self._thread_name(thread_id)};{self._stack(frame)}")
+            del frames
+
+    def _record(self, stack: str) -> None:
+        self.counts[stack] = self.counts.get(stack, 0) + 1
+        self.samples += 1
+
+    def _stack(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = self._label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _label(self, code) -> str:
+        filename = code.co_filename
+        for prefix in self._prefixes:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+        # ';' separates frames in the collapsed format
+        return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+    def _thread_name(self, thread_id: int) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            self._thread_names = {thread.ident: thread.name.replace(";", ":") for thread in threading.enumerate()}
+            name = self._thread_names.setdefault(thread_id, f"thread-{thread_id}")
+        return name
+
+    def collapsed(self) -> str:
+        lines = [f"{stack} {count}" for stack, count in sorted(self.counts.items(), key=lambda item: -item[1])]
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+async def profile_worker(seconds: float, interval: Optional[float] = None) -> SamplingProfiler:
+    """Sample every thread of this worker for `seconds` (raises ProfilerBusy)"""
+    profiler = SamplingProfiler(interval or settings.PROFILING_INTERVAL_MS / 1000)
+    profiler.start()
+    try:
+        await asyncio.sleep(clamp_duration(seconds))
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def profile_filename() -> str:
+    return f"profile-{os.getpid()}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+
+
+def get_request_profile(request_id: str) -> Optional[str]:
+    return _request_profiles.get(request_id)
+
+
+def _store_request_profile(request_id: str, profile: str) -> None:
+    _request_profiles[request_id] = profile
+    _request_profiles.move_to_end(request_id)
+    while len(_request_profiles) > REQUEST_PROFILES_KEPT:
+        _request_profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests that carry "X-Profile: 1" and a
+    valid X-Admin-Token. Every other request passes straight through.
+
+    Only the request's own task is sampled, so work it hands to child tasks
+    (streaming response bodies) or to the thread pool is not in the profile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMIN_TOKEN:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true") or not admin_token_valid(
+            headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = current_request_id() or os.urandom(8).hex()
+        profiler = SamplingProfiler(
+            REQUEST_INTERVAL_SECONDS,
+            task=asyncio.current_task(),
+            loop=asyncio.get_running_loop()
+        )
+        try:
+            profiler.start()
+        except ProfilerBusy:
+            await self.app(scope, receive, send)
+            return
+
+        location = f"/api/admin/profile/requests/{request_id}".encode("latin-1")
+
+        async def send_with_location(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_HEADER, location)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_location)
+        finally:
+            profiler.stop()
+            _store_request_profile(request_id, profiler.collapsed())
+            logger.info(
+                "Request profiled",
+                extra={"path": scope["path"], "samples": profiler.samples, "duration_ms": round(profiler.duration * 1000, 1)}
+            )
+
+
+# ---------- signal ----------
+
+async def _profile_to_file(seconds: float) -> None:
+    try:
+        profiler = await profile_worker(seconds)
+    except ProfilerBusy:
+        logger.warning("Profile requested by signal skipped, another profile is running")
+        return
+    path = os.path.join(settings.PROFILING_OUTPUT_DIR, profile_filename())
+
+    def write():
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+
+    await asyncio.to_thread(write)
+    logger.info("Profile written", extra={"path": path, "samples": profiler.samples})
+
+
+def install_signal_handler() -> bool:
+    """Profile the worker on SIGUSR2 (Unix only); call from inside the running loop"""
+    if not settings.PROFILING_SIGNAL_SECONDS or not hasattr(signal, "SIGUSR2"):
+        return False
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(
+            signal.SIGUSR2,
+            lambda: loop.create_task(_profile_to_file(settings.PROFILING_SIGNAL_SECONDS))
+        )
+    except (NotImplementedError, RuntimeError):
+        # Not the main thread, or a loop without signal support
+        return False
+    return True
+
+
+def remove_signal_handler() -> None:
+    if hasattr(signal, "SIGUSR2"):
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR2)
+        except (NotImplementedError, RuntimeError):
+            pass
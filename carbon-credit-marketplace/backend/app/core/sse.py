@@ -0,0 +1,132 @@
+"""
+Server-Sent Events helpers for streaming chat endpoints
+
+Agents yield text chunks (single characters, LLM tokens or whole messages)
+interleaved with JSON control messages such as {"type": "state", ...}.
+coalesce_stream() batches consecutive text chunks by size and time window
+so a reply goes out as a handful of events instead of one per token, and
+format_sse_event() frames each event with one "data:" line per text line
+so newlines survive the trip to the browser.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+# Flush buffered text once it reaches this many characters...
+SSE_COALESCE_MAX_CHARS = 512
+# ...or once the oldest buffered chunk has waited this long
+SSE_COALESCE_MAX_DELAY_SECONDS = 0.05
+
+_STREAM_END = object()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Stop nginx from buffering the stream
+}
+
+
+def is_control_message(chunk: str) -> bool:
+    """Check whether an agent chunk is a JSON control message rather than text"""
+    return chunk.startswith("{") and '"type"' in chunk
+
+
+def format_sse_event(data: str, event: Optional[str] = None) -> str:
+    """
+    Frame a payload as one SSE event
+
+    Each line of the payload gets its own "data:" field; clients join them
+    back together with newlines.
+    """
+    lines = data.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    frame = "".join(f"data: {line}\n" for line in lines)
+    if event:
+        frame = f"event: {event}\n{frame}"
+    return frame + "\n"
+
+
+async def coalesce_stream(
+    chunks: AsyncIterator[str],
+    max_chars: int = SSE_COALESCE_MAX_CHARS,
+    max_delay: float = SSE_COALESCE_MAX_DELAY_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Merge consecutive text chunks from an agent stream
+
+    Text is flushed when the buffer reaches max_chars, when max_delay has
+    passed since the first buffered chunk (even if the upstream is still
+    waiting on the LLM), before any control message, and at the end of the
+    stream. Control messages are passed through unchanged.
+
+    One producer task drains the upstream into a buffer and a timer flushes
+    it, so per-token cost is a list append rather than a task switch.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    buffer = []
+    buffered_chars = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+    def flush() -> None:
+        nonlocal buffer, buffered_chars, timer
+        if timer is not None:
+            timer.cancel()
+            timer = None
+        if buffer:
+            queue.put_nowait("".join(buffer))
+            buffer, buffered_chars = [], 0
+
+    async def produce() -> None:
+        nonlocal buffered_chars, timer
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if is_control_message(chunk):
+                    flush()
+                    queue.put_nowait(chunk)
+                    continue
+                buffer.append(chunk)
+                buffered_chars += len(chunk)
+                if buffered_chars >= max_chars:
+                    flush()
+                elif timer is None:
+                    timer = loop.call_later(max_delay, flush)
+            flush()
+            queue.put_nowait(_STREAM_END)
+        except Exception as e:
+            flush()
+            queue.put_nowait(e)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        if timer is not None:
+            timer.cancel()
+
+
+async def sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Coalesce an agent stream and frame it as SSE, ending with an error event on failure"""
+    try:
+        async for chunk in coalesce_stream(chunks):
+            yield format_sse_event(chunk)
+    except Exception as e:
+        yield format_sse_event(json.dumps({"type": "error", "message": str(e)}))
+
+
+def sse_response(chunks: AsyncIterator[str], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Stream an agent's output to the client as Server-Sent Events"""
+    return StreamingResponse(
+        sse_events(chunks),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, **(headers or {})}
+    )
@@ -0,0 +1,58 @@
+"""
+Token counting for prompt and history budgets
+
+Uses tiktoken's cl100k_base encoding (GPT-4o-mini / text-embedding-3 family)
+when it is available. If the encoding cannot be loaded, for example
+offline with no cached BPE file, counts fall back to an estimate of four
+characters per token.
+"""
+import logging
+from functools import lru_cache
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN_ESTIMATE = 4
+
+
+@lru_cache()
+def get_encoding() -> Optional[Any]:
+    """Load the tiktoken encoding once, or None if it is unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING_NAME)
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating token counts", extra={"error": str(e)})
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text"""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """Count tokens in many texts at once (tiktoken encodes the batch on its own threads)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return [len(text) // CHARS_PER_TOKEN_ESTIMATE + 1 if text else 0 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max(max_tokens - 1, 1) * CHARS_PER_TOKEN_ESTIMATE]
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
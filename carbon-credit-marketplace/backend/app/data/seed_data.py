@@ -8,6 +8,9 @@ from app.models.models import User, CreditListing, CreditAccount
 from app.core.security import get_password_hash
 import random
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # Approved methodologies as per CCTS
@@ -31,10 +34,10 @@ async def seed_database(db: AsyncSession):
     existing_users = result.scalars().all()
     
     if existing_users:
-        print("⚠️  Database already seeded, skipping...")
+        logger.info("Database already seeded, skipping")
         return
     
-    print("🌱 Seeding database with demo data...")
+    logger.info("Seeding database with demo data")
     
     # Create demo buyers
     buyers = [
@@ -301,4 +304,7 @@ async def seed_database(db: AsyncSession):
         db.add(listing)
     
     await db.commit()
-    print(f"✅ Seeded {len(buyers)} buyers, {len(sellers)} sellers, {len(listings_data)} listings, and {len(credit_accounts)} credit accounts")
+    logger.info(
+        "Seeded demo data",
+        extra={"buyers": len(buyers), "sellers": len(sellers), "listings": len(listings_data), "credit_accounts": len(credit_accounts)}
+    )
@@ -0,0 +1,510 @@
+"""
+Generate production-scale synthetic data for local performance testing
+
+Produces buyers, sellers, credit accounts, listings, orders, transactions,
+payments, the credit ledger and daily price history that are consistent with
+each other: listing availability, account balances and ledger running
+balances all match the generated trade history. The history is planned with
+vectorized numpy and written in fixed-size blocks with PostgreSQL COPY
+(asyncpg) or multi-row INSERTs on other drivers, so millions of rows load in
+minutes.
+
+Everything is derived from the seed: the same seed, scale and `end` produce
+the same rows, primary keys included (only the bcrypt salt differs). Emails and transaction numbers embed the
+seed, so datasets with different seeds (below 1000) can share a database.
+"""
+
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.security import get_password_hash
+from app.data.emission_factors import EMISSION_FACTORS
+from app.data.seed_data import APPROVED_METHODOLOGIES
+from app.models.models import (
+    User, CreditAccount, CreditListing, Order, Transaction, Payment, CreditTransaction, PriceHistory
+)
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.local"
+SYNTHETIC_PASSWORD = "demo123"
+
+# Rows per COPY / INSERT. Primary keys are drawn per block, so this is fixed
+# to keep a seed's keys stable.
+BLOCK_SIZE = 10_000
+
+PLATFORM_FEE_RATE = 0.02
+GST_RATE = 0.18
+COMPLETED_SHARE = 0.95
+FIRST_VINTAGE = 2018
+
+# Project type -> base price (INR per credit) and methodologies
+PROJECT_TYPES = {
+    "Renewable Energy": (2500, APPROVED_METHODOLOGIES[0:1] + APPROVED_METHODOLOGIES[5:7]),
+    "Forestry": (3000, [APPROVED_METHODOLOGIES[4]]),
+    "Energy Efficiency": (2600, [APPROVED_METHODOLOGIES[2]]),
+    "Green Hydrogen": (2800, [APPROVED_METHODOLOGIES[1]]),
+    "Waste Management": (2200, [APPROVED_METHODOLOGIES[3], APPROVED_METHODOLOGIES[7]]),
+}
+LOCATIONS = [
+    "Rajasthan", "Gujarat", "Tamil Nadu", "Karnataka", "Maharashtra", "Andhra Pradesh",
+    "West Bengal", "Kerala", "Odisha", "Madhya Pradesh", "Uttar Pradesh", "Assam",
+]
+CO_BENEFITS = [
+    "Local employment", "Grid stability", "Air quality improvement", "Biodiversity protection",
+    "Community livelihood", "Reduced energy costs", "Coastal protection", "Skill development",
+]
+PAYMENT_METHODS = ["upi", "netbanking", "card"]
+
+# Stream numbers for the per-block primary keys of each table
+_ID_STREAMS = {
+    "users": 1, "credit_accounts": 2, "credit_listings": 3, "orders": 4,
+    "transactions": 5, "payments": 6, "credit_transactions": 7, "price_history": 8,
+}
+
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class SyntheticDataset:
+    """IDs and row counts of a generated dataset"""
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.buyer_ids: List[uuid.UUID] = []
+        self.seller_ids: List[uuid.UUID] = []
+        self.listing_ids: List[uuid.UUID] = []
+        self.row_counts = {}
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.row_counts.values())
+
+
+def _block_ids(seed: int, table: str, block: int, count: int) -> List[uuid.UUID]:
+    """Random version-4 UUIDs for one block of a table, independent of other blocks"""
+    raw = np.random.default_rng([seed, _ID_STREAMS[table], block]).bytes(16 * count)
+    return [uuid.UUID(bytes=raw[i:i + 16], version=4) for i in range(0, 16 * count, 16)]
+
+
+def _ids(seed: int, table: str, count: int) -> List[uuid.UUID]:
+    ids = []
+    for block, start in enumerate(range(0, count, BLOCK_SIZE)):
+        ids.extend(_block_ids(seed, table, block, min(BLOCK_SIZE, count - start)))
+    return ids
+
+
+def _skewed_weights(rng: np.random.Generator, count: int, exponent: float) -> np.ndarray:
+    """Zipf-like popularity weights in random order, so a few rows are hot"""
+    ranks = rng.permutation(count) + 1
+    weights = ranks.astype(np.float64) ** -exponent
+    return weights / weights.sum()
+
+
+def _pan(key: int) -> str:
+    """Well-formed, unique company PAN for a key below 26**5 * 10**4"""
+    digits, rest = key % 10_000, key // 10_000
+    letters = []
+    for _ in range(5):
+        rest, index = divmod(rest, 26)
+        letters.append(_LETTERS[index])
+    return f"{letters[0]}{letters[1]}{letters[2]}C{letters[3]}{digits:04d}{letters[4]}"
+
+
+def _timestamp(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def _grouped_running_sum(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Cumulative sum of values within each group, preserving the input order"""
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    totals = np.cumsum(sorted_values)
+    is_start = np.ones(len(groups), dtype=bool)
+    is_start[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    starts = np.maximum.accumulate(np.where(is_start, np.arange(len(groups)), 0))
+    running = np.empty_like(totals)
+    running[order] = totals - totals[starts] + sorted_values[starts]
+    return running
+
+
+class _BulkWriter:
+    """Writes row tuples with COPY on asyncpg, multi-row INSERT elsewhere"""
+
+    def __init__(self, connection, driver_connection=None):
+        self.connection = connection
+        self.driver_connection = driver_connection
+
+    async def write(self, model, columns: Sequence[str], rows: List[tuple]) -> None:
+        if not rows:
+            return
+        table = model.__table__
+        if self.driver_connection is not None:
+            await self.driver_connection.copy_records_to_table(table.name, records=rows, columns=list(columns))
+        else:
+            await self.connection.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+    async def execute(self, statement: str) -> None:
+        if self.driver_connection is not None:
+            await self.driver_connection.execute(statement)
+        else:
+            await self.connection.execute(text(statement))
+
+
+async def generate_synthetic_data(
+    engine: AsyncEngine,
+    buyers: int = 10_000,
+    sellers: int = 1_000,
+    listings: int = 20_000,
+    transactions: int = 200_000,
+    open_orders: int = 10_000,
+    days: int = 365,
+    seed: int = 42,
+    end: Optional[datetime] = None,
+    password: str = SYNTHETIC_PASSWORD,
+    progress=print
+) -> SyntheticDataset:
+    """
+    Generate and insert a synthetic dataset in one database transaction.
+
+    Tables must already exist (init_db). Every user's password is `password`;
+    it is hashed once. Trades are spread over the `days` before `end`
+    (default: the start of the current hour), so recent-activity queries
+    have data.
+    """
+    if buyers < 1 or sellers < 1 or listings < 1:
+        raise ValueError("Need at least one buyer, seller and listing")
+
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    end_ts = end.timestamp()
+    start_ts = end_ts - days * 86400
+    issuance_ts = start_ts - 31 * 86400
+    dataset = SyntheticDataset(seed)
+    type_names = list(PROJECT_TYPES)
+
+    # ---------- plan: listings and trade history ----------
+    listing_seller = rng.choice(sellers, size=listings, p=_skewed_weights(rng, sellers, 1.0))
+    listing_type = rng.integers(len(type_names), size=listings)
+    listing_vintage = rng.integers(FIRST_VINTAGE, end.year + 1, size=listings)
+    base_prices = np.array([PROJECT_TYPES[name][0] for name in type_names], dtype=np.float64)
+    listing_price = np.round(
+        base_prices[listing_type] * (1 + 0.03 * (listing_vintage - FIRST_VINTAGE)) * rng.lognormal(0, 0.12, listings), 2
+    )
+
+    trade_listing = rng.choice(listings, size=transactions, p=_skewed_weights(rng, listings, 0.9))
+    trade_buyer = rng.choice(buyers, size=transactions, p=_skewed_weights(rng, buyers, 0.8))
+    trade_quantity = np.minimum(rng.geometric(1 / 50, size=transactions), 5_000).astype(np.int64)
+    trade_time = np.sort(rng.uniform(start_ts, end_ts, size=transactions))
+    trade_completed = rng.random(transactions) < COMPLETED_SHARE
+    trade_settle_delay = rng.uniform(60, 1_800, size=transactions)
+    completed_quantity = np.where(trade_completed, trade_quantity, 0)
+
+    sold = np.bincount(trade_listing, weights=completed_quantity, minlength=listings).astype(np.int64)
+    # A tenth of the listings sell out; the rest keep some stock
+    remaining = np.where(rng.random(listings) < 0.1, 0, rng.integers(1, 5_000, size=listings))
+    remaining[sold == 0] = np.maximum(remaining[sold == 0], 1)
+    listing_quantity = sold + remaining
+    first_sale = np.full(listings, end_ts)
+    np.minimum.at(first_sale, trade_listing, trade_time)
+    listing_created = issuance_ts + rng.random(listings) * (first_sale - issuance_ts)
+
+    # Ledger: one issuance per seller, then a sale and a purchase entry per completed trade.
+    # Accounts are indexed buyers first, then sellers.
+    issued = np.bincount(listing_seller, weights=listing_quantity, minlength=sellers).astype(np.int64)
+    # Ledger entries are written at settlement, so running balances follow settlement order
+    done = np.flatnonzero(trade_completed)
+    done = done[np.argsort(trade_time[done] + trade_settle_delay[done], kind="stable")]
+    event_account = np.column_stack([buyers + listing_seller[trade_listing[done]], trade_buyer[done]]).ravel()
+    event_amount = np.column_stack([-trade_quantity[done], trade_quantity[done]]).ravel()
+    opening = np.zeros(buyers + sellers, dtype=np.int64)
+    opening[buyers:] = issued
+    balance_after = opening[event_account] + _grouped_running_sum(event_account, event_amount)
+    final_balance = opening + np.bincount(event_account, weights=event_amount, minlength=buyers + sellers).astype(np.int64)
+
+    user_ids = _ids(seed, "users", buyers + sellers)
+    account_ids = _ids(seed, "credit_accounts", buyers + sellers)
+    listing_ids = _ids(seed, "credit_listings", listings)
+    dataset.buyer_ids = user_ids[:buyers]
+    dataset.seller_ids = user_ids[buyers:]
+    dataset.listing_ids = listing_ids
+
+    password_hash = get_password_hash(password)  # bcrypt is slow; every synthetic user shares one hash
+    sectors = list(EMISSION_FACTORS)
+
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection if engine.dialect.driver == "asyncpg" else None
+        writer = _BulkWriter(connection, driver_connection)
+        db_transaction = driver_connection.transaction() if driver_connection is not None else None
+        if db_transaction is not None:
+            await db_transaction.start()
+        else:
+            await connection.begin()
+
+        async def write_blocks(model, columns, count, make_rows):
+            for block, start in enumerate(range(0, count, BLOCK_SIZE)):
+                stop = min(start + BLOCK_SIZE, count)
+                await writer.write(model, columns, make_rows(block, start, stop))
+            dataset.row_counts[model.__tablename__] = dataset.row_counts.get(model.__tablename__, 0) + count
+            progress(f"  ✓ {model.__tablename__}: {dataset.row_counts[model.__tablename__]:,} rows")
+
+        try:
+            # ---------- users and accounts ----------
+            user_created = issuance_ts - rng.uniform(0, 365 * 86400, size=buyers + sellers)
+            user_sector = rng.integers(len(sectors), size=buyers)
+            user_risk = np.round(rng.beta(1, 9, size=buyers + sellers) * 100, 1)
+
+            def user_rows(block, start, stop):
+                rows = []
+                for i in range(start, stop):
+                    is_buyer = i < buyers
+                    number = i if is_buyer else i - buyers
+                    pan = _pan(seed * 100_000_000 + i)
+                    rows.append((
+                        user_ids[i],
+                        f"{'buyer' if is_buyer else 'seller'}{number}.s{seed}@{SYNTHETIC_EMAIL_DOMAIN}",
+                        password_hash,
+                        "buyer" if is_buyer else "seller",
+                        f"Synthetic {'Buyer' if is_buyer else 'Seller'} {number:07d} Pvt Ltd",
+                        sectors[user_sector[i]] if is_buyer else None,
+                        f"GCI-{'BYR' if is_buyer else 'SLR'}-S{seed}-{number:07d}",
+                        pan,
+                        f"29{pan}1Z{_LETTERS[i % 26]}",
+                        True,
+                        True,
+                        float(user_risk[i]),
+                        "verified",
+                        _timestamp(user_created[i]),
+                    ))
+                return rows
+
+            await write_blocks(User, (
+                "id", "email", "password_hash", "user_type", "company_name", "sector", "gci_registration_id",
+                "pan_number", "gstin", "is_active", "is_kyc_verified", "risk_score", "verification_tier", "created_at"
+            ), buyers + sellers, user_rows)
+
+            def account_rows(block, start, stop):
+                return [
+                    (account_ids[i], user_ids[i], float(final_balance[i]), float(final_balance[i]), 0.0, 0.0,
+                     _timestamp(user_created[i]))
+                    for i in range(start, stop)
+                ]
+
+            await write_blocks(CreditAccount, (
+                "id", "user_id", "total_balance", "available_balance", "locked_balance", "retired_balance", "created_at"
+            ), buyers + sellers, account_rows)
+
+            # ---------- listings ----------
+            listing_location = rng.integers(len(LOCATIONS), size=listings)
+            listing_methodology = rng.random(listings)
+            listing_benefits = rng.integers(len(CO_BENEFITS), size=(listings, 2))
+            listing_scores = np.round(rng.uniform(60, 99, size=(listings, 2)), 1)
+
+            def listing_rows(block, start, stop):
+                rows = []
+                for i in range(start, stop):
+                    project_type = type_names[listing_type[i]]
+                    methodologies = PROJECT_TYPES[project_type][1]
+                    vintage = int(listing_vintage[i])
+                    quantity = int(listing_quantity[i])
+                    available = int(remaining[i])
+                    rows.append((
+                        listing_ids[i],
+                        user_ids[buyers + listing_seller[i]],
+                        quantity,
+                        available,
+                        float(listing_price[i]),
+                        vintage,
+                        project_type,
+                        f"CCC-{vintage}-S{seed}-{i:07d}-0001",
+                        f"CCC-{vintage}-S{seed}-{i:07d}-{quantity:06d}",
+                        methodologies[int(listing_methodology[i] * len(methodologies))],
+                        f"{LOCATIONS[listing_location[i]]}, India",
+                        json.dumps(sorted({CO_BENEFITS[index] for index in listing_benefits[i]})),
+                        float(listing_scores[i, 0]),
+                        float(listing_scores[i, 1]),
+                        "verified",
+                        available > 0,
+                        f"Carbon credits from a {project_type} project",
+                        _timestamp(listing_created[i]),
+                    ))
+                return rows
+
+            await write_blocks(CreditListing, (
+                "id", "seller_id", "quantity", "available_quantity", "price_per_credit", "vintage", "project_type",
+                "serial_number_start", "serial_number_end", "methodology", "project_location", "co_benefits",
+                "additionality_score", "permanence_score", "verification_status", "is_active", "description",
+                "created_at"
+            ), listings, listing_rows)
+
+            # ---------- trades: an order, a transaction and a payment each ----------
+            payment_method = rng.integers(len(PAYMENT_METHODS), size=transactions)
+            order_columns = (
+                "id", "user_id", "listing_id", "order_type", "quantity", "filled_quantity", "price_per_credit",
+                "status", "expires_at", "created_at"
+            )
+            transaction_columns = (
+                "id", "transaction_number", "buyer_id", "seller_id", "listing_id", "order_id", "quantity",
+                "price_per_credit", "total_amount", "platform_fee", "gst_amount", "status", "transaction_date",
+                "payment_completed_at", "credits_transferred_at", "completed_at", "created_at"
+            )
+            payment_columns = (
+                "id", "transaction_id", "payment_gateway", "gateway_order_id", "gateway_payment_id", "amount",
+                "currency", "status", "payment_method", "escrow_status", "escrow_released_at", "created_at"
+            )
+            transaction_ids = []  # Only kept for the ledger's reference_id; one block at a time
+            for block, start in enumerate(range(0, transactions, BLOCK_SIZE)):
+                stop = min(start + BLOCK_SIZE, transactions)
+                order_ids = _block_ids(seed, "orders", block, stop - start)
+                block_transaction_ids = _block_ids(seed, "transactions", block, stop - start)
+                payment_ids = _block_ids(seed, "payments", block, stop - start)
+                orders_block, transactions_block, payments_block = [], [], []
+                for offset, i in enumerate(range(start, stop)):
+                    listing = trade_listing[i]
+                    quantity = int(trade_quantity[i])
+                    price = float(listing_price[listing])
+                    total = quantity * price
+                    fee = total * PLATFORM_FEE_RATE
+                    gst = fee * GST_RATE
+                    created = _timestamp(trade_time[i])
+                    completed = bool(trade_completed[i])
+                    settled = _timestamp(trade_time[i] + trade_settle_delay[i]) if completed else None
+                    buyer_id = user_ids[trade_buyer[i]]
+                    orders_block.append((
+                        order_ids[offset], buyer_id, listing_ids[listing], "buy", quantity,
+                        quantity if completed else 0, price, "filled" if completed else "cancelled", None, created
+                    ))
+                    transactions_block.append((
+                        block_transaction_ids[offset], f"TXN-{created:%Y%m%d%H%M%S}-S{seed}-{i:09d}", buyer_id,
+                        user_ids[buyers + listing_seller[listing]], listing_ids[listing], order_ids[offset], quantity,
+                        price, total, fee, gst, "completed" if completed else "failed", created, settled, settled,
+                        settled, created
+                    ))
+                    payments_block.append((
+                        payment_ids[offset], block_transaction_ids[offset], "razorpay", f"order_S{seed}{i:012d}",
+                        f"pay_S{seed}{i:012d}" if completed else None, total + fee + gst, "INR",
+                        "completed" if completed else "failed", PAYMENT_METHODS[payment_method[i]],
+                        "released" if completed else "not_started", settled, created
+                    ))
+                await writer.write(Order, order_columns, orders_block)
+                await writer.write(Transaction, transaction_columns, transactions_block)
+                await writer.write(Payment, payment_columns, payments_block)
+                transaction_ids.extend(block_transaction_ids)
+            for model in (Order, Transaction, Payment):
+                dataset.row_counts[model.__tablename__] = transactions
+                progress(f"  ✓ {model.__tablename__}: {transactions:,} rows")
+
+            # ---------- open orders ----------
+            in_stock = np.flatnonzero(remaining > 0)
+            if open_orders and len(in_stock):
+                open_listing = in_stock[rng.integers(len(in_stock), size=open_orders)]
+                open_buyer = rng.integers(buyers, size=open_orders)
+                open_created = rng.uniform(end_ts - 7 * 86400, end_ts, size=open_orders)
+                open_quantity = np.minimum(rng.geometric(1 / 50, size=open_orders), remaining[open_listing])
+
+                def open_order_rows(block, start, stop):
+                    ids = _block_ids(seed, "orders", (transactions + BLOCK_SIZE - 1) // BLOCK_SIZE + block, stop - start)
+                    return [
+                        (ids[offset], user_ids[open_buyer[i]], listing_ids[open_listing[i]], "buy",
+                         int(open_quantity[i]), 0, float(listing_price[open_listing[i]]), "pending",
+                         _timestamp(open_created[i] + 30 * 86400), _timestamp(open_created[i]))
+                        for offset, i in enumerate(range(start, stop))
+                    ]
+
+                await write_blocks(Order, order_columns, open_orders, open_order_rows)
+
+            # ---------- credit ledger ----------
+            ledger_columns = (
+                "id", "account_id", "transaction_type", "amount", "balance_before", "balance_after",
+                "reference_type", "reference_id", "description", "created_at"
+            )
+
+            def issuance_rows(block, start, stop):
+                return [
+                    (ledger_id, account_ids[buyers + seller], "issuance", float(issued[seller]), 0.0,
+                     float(issued[seller]), "issuance", None, "Synthetic opening issuance", _timestamp(issuance_ts))
+                    for ledger_id, seller in zip(
+                        _block_ids(seed, "credit_transactions", block, stop - start), range(start, stop)
+                    )
+                ]
+
+            await write_blocks(CreditTransaction, ledger_columns, sellers, issuance_rows)
+            issuance_blocks = (sellers + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+            def trade_ledger_rows(block, start, stop):
+                rows = []
+                ids = _block_ids(seed, "credit_transactions", issuance_blocks + block, stop - start)
+                for offset, event in enumerate(range(start, stop)):
+                    trade = done[event // 2]
+                    amount = int(event_amount[event])
+                    after = int(balance_after[event])
+                    rows.append((
+                        ids[offset], account_ids[event_account[event]], "sale" if amount < 0 else "purchase",
+                        float(amount), float(after - amount), float(after), "transaction", transaction_ids[trade],
+                        None, _timestamp(trade_time[trade] + trade_settle_delay[trade])
+                    ))
+                return rows
+
+            await write_blocks(CreditTransaction, ledger_columns, len(event_account), trade_ledger_rows)
+
+            # ---------- daily price history per project type and vintage ----------
+            done = np.flatnonzero(trade_completed)
+            day = ((trade_time[done] - start_ts) // 86400).astype(np.int64)
+            vintages = end.year + 1 - FIRST_VINTAGE
+            keys = (day * len(type_names) + listing_type[trade_listing[done]]) * vintages + (
+                listing_vintage[trade_listing[done]] - FIRST_VINTAGE
+            )
+            prices = listing_price[trade_listing[done]]
+            volumes = trade_quantity[done]
+            unique_keys, first_index, group = np.unique(keys, return_index=True, return_inverse=True)
+            last_index = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+            volume = np.bincount(group, weights=volumes).astype(np.int64)
+            count = np.bincount(group)
+            average = np.bincount(group, weights=prices * volumes) / volume
+            high = np.full(len(unique_keys), -np.inf)
+            low = np.full(len(unique_keys), np.inf)
+            np.maximum.at(high, group, prices)
+            np.minimum.at(low, group, prices)
+            start_day = datetime.fromtimestamp(start_ts, timezone.utc).date()
+
+            def price_rows(block, start, stop):
+                rows = []
+                ids = _block_ids(seed, "price_history", block, stop - start)
+                for offset, g in enumerate(range(start, stop)):
+                    rest, vintage_offset = divmod(int(unique_keys[g]), vintages)
+                    day_index, type_index = divmod(rest, len(type_names))
+                    rows.append((
+                        ids[offset], start_day + timedelta(days=day_index), type_names[type_index],
+                        FIRST_VINTAGE + vintage_offset, float(prices[first_index[g]]), float(prices[last_index[g]]),
+                        float(high[g]), float(low[g]), round(float(average[g]), 2), int(volume[g]), int(count[g])
+                    ))
+                return rows
+
+            await write_blocks(PriceHistory, (
+                "id", "date", "project_type", "vintage", "open_price", "close_price", "high_price", "low_price",
+                "average_price", "volume", "num_transactions"
+            ), len(unique_keys), price_rows)
+
+            if db_transaction is not None:
+                await db_transaction.commit()
+            else:
+                await connection.commit()
+        except Exception:
+            if db_transaction is not None:
+                await db_transaction.rollback()
+            else:
+                await connection.rollback()
+            raise
+
+        # Fresh planner statistics, so query plans match production-sized tables
+        for table_name in dataset.row_counts:
+            await writer.execute(f"ANALYZE {table_name}")
+        if driver_connection is None:
+            await connection.commit()
+
+    return dataset
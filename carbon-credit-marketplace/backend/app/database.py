@@ -1,8 +1,11 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+import logging
+
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Create async engine
 engine = create_async_engine(
@@ -33,8 +36,6 @@ async def get_db() -> AsyncSession:
 
 async def init_db():
     """Initialize database - drop and recreate all tables (for development)"""
-    import sys
-    import traceback
     from sqlalchemy import text
     
     # Ensure all models are imported and registered with Base.metadata
@@ -44,21 +45,21 @@ async def init_db():
             User, CreditListing, EmissionCalculation, Order, Transaction,
             Payment, CreditAccount, CreditTransaction, CreditIssuance,
             CreditRetirement, Verification, Document, ComplianceRecord,
-            Project, PriceHistory, MarketStats, Notification
+            Project, PriceHistory, MarketStats, Notification, FraudAnalysisJob,
+            OCRCacheEntry, ChatSession, DataVersion
         )
         model_count = len(Base.metadata.tables)
-        print(f"🔄 INIT_DB: {model_count} models registered", flush=True)
+        logger.info("Models registered", extra={"models": model_count})
         if model_count == 0:
             raise Exception("No models registered with Base.metadata!")
     except Exception as import_error:
-        print(f"❌ INIT_DB: Failed to import models: {import_error}", file=sys.stderr, flush=True)
-        traceback.print_exc()
+        logger.exception("Failed to import models", extra={"error": str(import_error)})
         raise
     
     try:
         async with engine.begin() as conn:
             # Drop all existing tables using raw SQL (CASCADE handles foreign keys)
-            print("🔄 INIT_DB: Dropping all existing tables...", flush=True)
+            logger.info("Dropping all existing tables")
             
             def drop_all_tables(sync_conn):
                 # Get all table names from information_schema (more reliable than pg_tables)
@@ -71,10 +72,10 @@ async def init_db():
                 table_names = [row[0] for row in result.fetchall()]
                 
                 if not table_names:
-                    print("  ✅ No existing tables to drop", flush=True)
+                    logger.info("No existing tables to drop")
                     return
                 
-                print(f"  📊 Found {len(table_names)} tables to drop: {table_names}", flush=True)
+                logger.info("Found tables to drop", extra={"tables": len(table_names)})
                 
                 # Drop all tables with CASCADE to handle foreign key constraints
                 # CASCADE automatically drops dependent objects (foreign keys, indexes, etc.)
@@ -82,9 +83,9 @@ async def init_db():
                     try:
                         # Use IF EXISTS to avoid errors if table doesn't exist
                         sync_conn.execute(text(f'DROP TABLE IF EXISTS public."{table_name}" CASCADE'))
-                        print(f"  ✓ Dropped table: {table_name}", flush=True)
+                        logger.debug("Dropped table", extra={"table": table_name})
                     except Exception as e:
-                        print(f"  ⚠ Error dropping {table_name}: {e}", flush=True)
+                        logger.warning("Error dropping table", extra={"table": table_name, "error": str(e)})
                         # Continue with other tables even if one fails
                 
                 # Verify all tables were dropped
@@ -96,18 +97,18 @@ async def init_db():
                 """))
                 remaining = result.scalar()
                 if remaining > 0:
-                    print(f"  ⚠ WARNING: {remaining} tables still exist after drop attempt", flush=True)
+                    logger.warning("Tables still exist after drop attempt", extra={"tables": remaining})
                 else:
-                    print(f"✅ Successfully dropped all {len(table_names)} tables", flush=True)
+                    logger.info("Dropped all tables", extra={"tables": len(table_names)})
             
             await conn.run_sync(drop_all_tables)
             
             # Create all tables from current models
-            print("🔄 INIT_DB: Creating all tables from models...", flush=True)
+            logger.info("Creating all tables from models")
             
             def create_all_tables(sync_conn):
                 expected_tables = list(Base.metadata.tables.keys())
-                print(f"  📝 Expected {len(expected_tables)} tables: {expected_tables}", flush=True)
+                logger.debug("Expected tables", extra={"tables": expected_tables})
                 
                 # Create all tables
                 Base.metadata.create_all(bind=sync_conn, checkfirst=False)
@@ -120,22 +121,20 @@ async def init_db():
                     ORDER BY ordinal_position
                 """))
                 users_cols = {row[0]: row[1] for row in result.fetchall()}
-                print(f"  📋 Users table has {len(users_cols)} columns", flush=True)
+                logger.debug("Users table columns", extra={"columns": len(users_cols)})
                 
                 required = ['gci_registration_id', 'pan_number', 'gstin', 'is_kyc_verified']
                 missing = [col for col in required if col not in users_cols]
                 
                 if missing:
-                    print(f"  ❌ MISSING COLUMNS in users: {missing}", flush=True)
-                    print(f"  📋 Existing columns: {list(users_cols.keys())}", flush=True)
+                    logger.error("Users table is missing columns", extra={"missing": missing, "existing": list(users_cols)})
                     raise ValueError(f"Schema mismatch: users table missing columns {missing}")
                 
-                print(f"  ✅ Users table has all required columns", flush=True)
+                logger.debug("Users table has all required columns")
             
             await conn.run_sync(create_all_tables)
-            print("✅ INIT_DB: Database schema initialized successfully", flush=True)
+            logger.info("Database schema initialized")
             
-    except Exception as e:
-        print(f"❌ INIT_DB FAILED: {e}", file=sys.stderr, flush=True)
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Database initialization failed")
         raise
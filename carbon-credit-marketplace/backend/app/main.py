@@ -1,10 +1,13 @@
 # region agent log - Hypothesis A: Import errors
+import asyncio
+import logging
 import os
 import sys
 import traceback
 try:
     from fastapi import FastAPI
     from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import PlainTextResponse
     from contextlib import asynccontextmanager
 except Exception as e:
     print(f"ERROR importing FastAPI: {e}", file=sys.stderr)
@@ -12,7 +15,7 @@ except Exception as e:
     raise
 
 try:
-    from app.database import init_db, AsyncSessionLocal
+    from app.database import init_db, AsyncSessionLocal, engine
 except Exception as e:
     print(f"ERROR importing database: {e}", file=sys.stderr)
     traceback.print_exc()
@@ -41,11 +44,49 @@ except Exception as e:
 
 try:
     from app.agents.formalities_qdrant import init_formalities_collection, ingest_formalities_documents
+    from app.agents.formalities_agent import precompute_step_guidance
 except Exception as e:
     print(f"ERROR importing formalities_qdrant: {e}", file=sys.stderr)
     traceback.print_exc()
     raise
 
+try:
+    from app.services.fraud_jobs import fraud_job_worker
+    from app.services.fraud_detector import load_registration_bloom
+    from app.services.ocr_queue import get_ocr_worker_pool
+except Exception as e:
+    print(f"ERROR importing fraud_jobs: {e}", file=sys.stderr)
+    traceback.print_exc()
+    raise
+
+try:
+    from app.core.metrics import MetricsMiddleware, instrument_engine, monitor_event_loop_lag, render_metrics
+except Exception as e:
+    print(f"ERROR importing metrics: {e}", file=sys.stderr)
+    traceback.print_exc()
+    raise
+
+try:
+    from app.core.serialization import FastJSONResponse
+except Exception as e:
+    print(f"ERROR importing serialization: {e}", file=sys.stderr)
+    traceback.print_exc()
+    raise
+
+try:
+    from app.core.cache import install_write_tracking, start_cache, stop_cache
+except Exception as e:
+    print(f"ERROR importing caching: {e}", file=sys.stderr)
+    traceback.print_exc()
+    raise
+
+try:
+    from app.core.profiler import ProfilingMiddleware, install_signal_handler, remove_signal_handler
+except Exception as e:
+    print(f"ERROR importing profiler: {e}", file=sys.stderr)
+    traceback.print_exc()
+    raise
+
 try:
     settings = get_settings()
 except Exception as e:
@@ -53,6 +94,12 @@ except Exception as e:
     traceback.print_exc()
     raise
 
+# Import failures above are printed synchronously; from here on, log through the queue
+from app.core.log import RequestIdMiddleware, configure_logging, shutdown_logging  # noqa: E402
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Import all models to ensure they're registered with Base.metadata before init_db()
 try:
     from app.models import (  # noqa: E402, F401
@@ -72,9 +119,12 @@ try:
         Project,
         PriceHistory,
         MarketStats,
-        Notification
+        Notification,
+        FraudAnalysisJob,
+        OCRCacheEntry,
+        ChatSession
     )
-    print("✅ All models imported successfully")
+    logger.debug("All models imported")
 except Exception as e:
     print(f"ERROR importing models: {e}", file=sys.stderr)
     traceback.print_exc()
@@ -86,39 +136,90 @@ except Exception as e:
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
-    print("🚀 Starting Carbon Credit Marketplace API...")
+    logger.info("Starting Carbon Credit Marketplace API")
+    
+    lag_monitor_task = None
+    if settings.METRICS_ENABLED:
+        lag_monitor_task = asyncio.create_task(monitor_event_loop_lag(settings.METRICS_EVENT_LOOP_INTERVAL_SECONDS))
+    if install_signal_handler():
+        logger.info("Profiling on SIGUSR2 enabled", extra={"pid": os.getpid(), "seconds": settings.PROFILING_SIGNAL_SECONDS})
+    
+    await start_cache()
+    logger.info("Cache started", extra={"backend": settings.CACHE_BACKEND})
     
     # Initialize database
     await init_db()
-    print("✅ Database initialized")
+    logger.info("Database initialized")
     
     # Seed database with mock data
     async with AsyncSessionLocal() as db:
         await seed_database(db)
-    print("✅ Database seeded with mock data")
+    logger.info("Database seeded with mock data")
     
-    # Initialize Qdrant and ingest documents
+    # Warm the registration Bloom filter used by duplicate checks
+    async with AsyncSessionLocal() as db:
+        loaded = await load_registration_bloom(db)
+    logger.info("Registration Bloom filter loaded", extra={"users": loaded})
+    
+    # Initialize Qdrant and ingest documents. Ingestion also builds the
+    # in-process search index, so it runs even if Qdrant is unreachable.
     try:
         await init_qdrant()
+    except Exception as e:
+        logger.warning("Qdrant initialization failed", extra={"error": str(e)})
+    try:
         await ingest_documents()
-        print("✅ Qdrant initialized and documents ingested")
+        logger.info("Qdrant initialized and documents ingested")
     except Exception as e:
-        print(f"⚠️  Qdrant initialization failed: {str(e)}")
-        print("⚠️  Education agent may not work without Qdrant")
+        logger.warning(
+            "Document ingestion incomplete, education agent will use the in-process keyword index",
+            extra={"error": str(e)}
+        )
     
     # Initialize formalities Qdrant collection and ingest documents
     try:
         await init_formalities_collection()
+    except Exception as e:
+        logger.warning("Formalities Qdrant initialization failed", extra={"error": str(e)})
+    try:
         await ingest_formalities_documents()
-        print("✅ Formalities Qdrant initialized and documents ingested")
+        logger.info("Formalities Qdrant initialized and documents ingested")
     except Exception as e:
-        print(f"⚠️  Formalities Qdrant initialization failed: {str(e)}")
-        print("⚠️  Formalities agent may not work without Qdrant")
+        logger.warning(
+            "Formalities document ingestion incomplete, formalities agent will use the in-process keyword index",
+            extra={"error": str(e)}
+        )
+    try:
+        generated = await precompute_step_guidance()
+        logger.info("Formalities step guidance ready", extra={"generated_steps": generated})
+    except Exception as e:
+        logger.warning("Formalities step guidance precomputation failed", extra={"error": str(e)})
+    
+    # Start background worker for deferred fraud analysis jobs
+    fraud_worker_task = asyncio.create_task(fraud_job_worker())
+    logger.info("Fraud analysis job worker started")
+    
+    # Start OCR worker pool and pick up jobs left over from a previous run
+    ocr_pool = get_ocr_worker_pool()
+    ocr_pool.start()
+    recovered = await ocr_pool.recover_pending()
+    logger.info("OCR worker pool started", extra={"workers": ocr_pool.concurrency, "recovered_jobs": recovered})
     
     yield
     
     # Shutdown
-    print("👋 Shutting down...")
+    logger.info("Shutting down")
+    fraud_worker_task.cancel()
+    try:
+        await fraud_worker_task
+    except asyncio.CancelledError:
+        pass
+    await ocr_pool.stop()
+    await stop_cache()
+    if lag_monitor_task is not None:
+        lag_monitor_task.cancel()
+    remove_signal_handler()
+    shutdown_logging()
 
 
 # Create FastAPI app
@@ -126,7 +227,8 @@ app = FastAPI(
     title="Carbon Credit Marketplace API",
     description="AI-powered platform for carbon credit trading",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -177,15 +279,17 @@ def expand_origin_variations(origin: str):
             if https_version not in variations:
                 variations.append(https_version)
     except Exception as e:
-        print(f"⚠️  Warning: Error expanding origin variations for '{origin}': {e}", flush=True)
+        logger.warning("Error expanding CORS origin variations", extra={"origin": origin, "error": str(e)})
     
     return variations
 
 if origins_str == "*":
     # If wildcard is specified, we cannot use credentials
     # Use a more permissive configuration without credentials
-    print("⚠️  WARNING: Using CORS wildcard (*) with allow_credentials=False", flush=True)
-    print("⚠️  This means cookies/credentials will NOT work. Consider specifying exact origins.", flush=True)
+    logger.warning(
+        "Using CORS wildcard (*) with allow_credentials=False; cookies/credentials will not work. "
+        "Consider specifying exact origins."
+    )
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -230,19 +334,16 @@ else:
     
     # Ensure we have at least one origin
     if not origins:
-        print("⚠️  WARNING: No CORS origins configured. Using wildcard without credentials.", flush=True)
+        logger.warning("No CORS origins configured, using wildcard without credentials")
         origins = ["*"]
         allow_credentials = False
     else:
         allow_credentials = True
     
-    print(f"✅ CORS configured with {len(origins)} origin(s):", flush=True)
-    # Print first 10 origins for readability
-    for origin in origins[:10]:
-        print(f"   - {origin}", flush=True)
-    if len(origins) > 10:
-        print(f"   ... and {len(origins) - 10} more origins", flush=True)
-    print(f"✅ CORS allow_credentials: {allow_credentials}", flush=True)
+    logger.info(
+        "CORS configured",
+        extra={"origins": len(origins), "first_origins": origins[:10], "allow_credentials": allow_credentials}
+    )
     
     app.add_middleware(
         CORSMiddleware,
@@ -254,6 +355,21 @@ else:
         max_age=3600,  # Cache preflight for 1 hour
     )
 
+# Writes bump the data versions behind ETag / Last-Modified and emit read-through cache tags,
+# which every worker hears over LISTEN/NOTIFY
+install_write_tracking()
+
+# Request metrics (outside CORS, so CORS handling is included in the latency)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware, slow_request_ms=settings.METRICS_SLOW_REQUEST_MS)
+
+# Single-request profiling ("X-Profile: 1" with an admin token), inside the request ID so profiles are keyed by it
+app.add_middleware(ProfilingMiddleware)
+
+# Request IDs (outermost, so every log line of a request, including the slow-request log, carries one)
+app.add_middleware(RequestIdMiddleware)
+
 
 # Root endpoint
 @app.get("/")
@@ -270,11 +386,24 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/llm")
+async def llm_health():
+    """LLM gateway queue depth, in-flight requests and circuit state per model"""
+    from app.agents.llm_client import gateway
+    return {"models": gateway.metrics()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (route latency, SQL, LLM/Qdrant calls, event-loop lag)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # Include routers
 # region agent log - Hypothesis B: API router import errors
 try:
     from app.api import auth, education, calculator, matching, marketplace, formalities
-    print("✅ Core API routers imported")
+    logger.debug("Core API routers imported")
 except Exception as e:
     print(f"ERROR importing core API routers: {e}", file=sys.stderr)
     traceback.print_exc()
@@ -282,15 +411,15 @@ except Exception as e:
 
 try:
     from app.api import transactions, payments, registry
-    print("✅ Transaction API routers imported")
+    logger.debug("Transaction API routers imported")
 except Exception as e:
     print(f"ERROR importing transaction API routers: {e}", file=sys.stderr)
     traceback.print_exc()
     raise
 
 try:
-    from app.api import verification, compliance, market_data, projects
-    print("✅ Extended API routers imported")
+    from app.api import verification, compliance, market_data, projects, admin
+    logger.debug("Extended API routers imported")
 except Exception as e:
     print(f"ERROR importing extended API routers: {e}", file=sys.stderr)
     traceback.print_exc()
@@ -304,7 +433,7 @@ try:
     app.include_router(matching.router, prefix="/api/matching", tags=["Matching Agent"])
     app.include_router(marketplace.router, prefix="/api/marketplace", tags=["Marketplace"])
     app.include_router(formalities.router, prefix="/api/formalities", tags=["Formalities Agent"])
-    print("✅ Core routers included")
+    logger.debug("Core routers included")
 except Exception as e:
     print(f"ERROR including core routers: {e}", file=sys.stderr)
     traceback.print_exc()
@@ -318,7 +447,8 @@ try:
     app.include_router(compliance.router, prefix="/api/compliance", tags=["Compliance"])
     app.include_router(market_data.router, prefix="/api/market", tags=["Market Data"])
     app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
-    print("✅ Extended routers included")
+    app.include_router(admin.router, prefix="/api/admin", tags=["Admin"], include_in_schema=False)
+    logger.debug("Extended routers included")
 except Exception as e:
     print(f"ERROR including extended routers: {e}", file=sys.stderr)
     traceback.print_exc()
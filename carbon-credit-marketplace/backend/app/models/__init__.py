@@ -16,7 +16,10 @@ from app.models.models import (
     Project,
     PriceHistory,
     MarketStats,
-    Notification
+    Notification,
+    FraudAnalysisJob,
+    OCRCacheEntry,
+    ChatSession
 )
 
 __all__ = [
@@ -36,5 +39,8 @@ __all__ = [
     "Project",
     "PriceHistory",
     "MarketStats",
-    "Notification"
+    "Notification",
+    "FraudAnalysisJob",
+    "OCRCacheEntry",
+    "ChatSession"
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, Enum, Date, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, DateTime, ForeignKey, Text, Enum, Date, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -108,6 +108,13 @@ class User(Base):
     compliance_records = relationship("ComplianceRecord", back_populates="user")
     projects = relationship("Project", back_populates="owner")
     notifications = relationship("Notification", back_populates="user")
+    
+    # Normalized unique indexes used by duplicate registration checks
+    __table_args__ = (
+        Index("uq_users_email_lower", func.lower(email), unique=True),
+        Index("uq_users_pan_number_upper", func.upper(pan_number), unique=True),
+        Index("uq_users_gstin_upper", func.upper(gstin), unique=True),
+    )
 
 
 class CreditListing(Base):
@@ -431,6 +438,14 @@ class Document(Base):
     
     # OCR extracted data
     extracted_data = Column(JSON)  # Store OCR results
+    content_hash = Column(String(64), index=True)  # sha256 of file bytes, shared across users
+    
+    # Asynchronous OCR job tracking (the document id doubles as the job id)
+    ocr_status = Column(String(50))  # None (no OCR requested), pending, processing, completed, failed
+    ocr_attempts = Column(Integer, default=0)
+    ocr_locked_at = Column(DateTime(timezone=True))  # Lease start of the current processing claim
+    ocr_error = Column(Text)
+    ocr_completed_at = Column(DateTime(timezone=True))
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -575,6 +590,79 @@ class MarketStats(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class OCRCacheEntry(Base):
+    """Content-addressed cache of OCR results"""
+    __tablename__ = "ocr_cache_entries"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    
+    content_hash = Column(String(64), nullable=False)  # sha256 of image bytes
+    document_type = Column(String(100), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    
+    result = Column(JSON, nullable=False)  # raw_text, extracted_data, confidence
+    hit_count = Column(Integer, default=0)
+    
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("uq_ocr_cache_key", "content_hash", "document_type", "prompt_version", unique=True),
+    )
+
+
+# ==================== BACKGROUND JOB MODELS ====================
+
+class FraudAnalysisJob(Base):
+    """Durable queue for LLM fraud analysis deferred out of registration"""
+    __tablename__ = "fraud_analysis_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    
+    status = Column(String(50), default='pending', index=True)  # pending, running, completed, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    
+    payload = Column(JSON)  # user_data, documents and base_risk_score captured at registration
+    result = Column(JSON)  # Fraud detection result from the LLM
+    last_error = Column(Text)
+    
+    next_run_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    locked_at = Column(DateTime(timezone=True))  # Set while a worker is running the job
+    completed_at = Column(DateTime(timezone=True))
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# ==================== CHAT SESSION MODELS ====================
+
+class ChatSession(Base):
+    """Server-side conversation state for the calculator and formalities chats"""
+    __tablename__ = "chat_sessions"
+    
+    session_id = Column(String(64), primary_key=True)
+    agent = Column(String(50), primary_key=True)  # calculator, formalities
+    
+    state = Column(JSON, nullable=False)  # Agent conversation state, history truncated to the token budget
+    
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# ==================== CACHE VERSION MODEL ====================
+
+class DataVersion(Base):
+    """Change counter per data scope (listings, trades), bumped in the writing transaction"""
+    __tablename__ = "data_versions"
+    
+    scope = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 # ==================== NOTIFICATION MODEL ====================
 
 class Notification(Base):
@@ -220,11 +220,13 @@ class ConversationState(BaseModel):
 
 class FormalitiesChatRequest(BaseModel):
     question: str
-    conversation_state: Optional[ConversationState] = None
+    session_id: Optional[str] = Field(None, max_length=64)
+    conversation_state: Optional[ConversationState] = None  # Legacy clients; ignored when the session exists
 
 
 class FormalitiesChatResponse(BaseModel):
     answer: str
+    session_id: str
     conversation_state: ConversationState
 
 
@@ -241,11 +243,13 @@ class CalculatorChatState(BaseModel):
 
 class CalculatorChatRequest(BaseModel):
     question: str
-    conversation_state: Optional[CalculatorChatState] = None
+    session_id: Optional[str] = Field(None, max_length=64)
+    conversation_state: Optional[CalculatorChatState] = None  # Legacy clients; ignored when the session exists
 
 
 class CalculatorChatResponse(BaseModel):
     answer: str
+    session_id: str
     conversation_state: CalculatorChatState
 
 
@@ -497,6 +501,7 @@ class DocumentResponse(BaseModel):
     version: int
     is_current: bool
     expires_at: Optional[datetime] = None
+    content_hash: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -509,6 +514,23 @@ class OCRResponse(BaseModel):
     raw_text: str
     extracted_data: Dict[str, Any]
     confidence: float = 0.9
+    content_hash: Optional[str] = None
+    file_url: Optional[str] = None  # Stored copy of the upload, for POST /documents
+    cached: bool = False
+
+
+class OCRJobResponse(BaseModel):
+    job_id: UUID
+    filename: str
+    document_type: str
+    status: str  # pending, processing, completed, failed
+    content_hash: Optional[str] = None
+    raw_text: Optional[str] = None
+    extracted_data: Optional[Dict[str, Any]] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
 
 
 # ==================== COMPLIANCE SCHEMAS ====================
@@ -0,0 +1,173 @@
+"""
+Document chunking shared by the RAG ingestion pipelines
+
+Chunks are capped at a token budget counted with tiktoken (see
+app.core.tokens) instead of a word count, so no chunk overruns the
+embedding model or the prompt budget. Markdown headings always start a new
+chunk and name its section. Within a section, text is packed sentence by
+sentence. A full chunk is cut at the last sentence or paragraph end in its
+second half, and the next chunk repeats up to overlap_tokens of trailing
+sentences so context carries across the cut.
+
+Every sentence of a document is counted in one batched tiktoken call, and
+the packing loop only adds integers, so chunking runs at several MB/s.
+"""
+import re
+from typing import Dict, List, Tuple
+
+from app.core.tokens import CHARS_PER_TOKEN_ESTIMATE, count_tokens_batch
+
+CHUNK_MAX_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 50
+DEFAULT_SECTION = "Introduction"
+
+_HEADING_PATTERN = re.compile(r"#{2,6}|#(?:\s|$)")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=\S)")
+_LIST_ITEM_PATTERN = re.compile(r"\s*(?:[-*+•]|\d+[.)])\s")
+_SENTENCE_END = (".", "!", "?", ":", ";")
+
+# One sentence (or fragment of an oversized one): (text, tokens, separator before it)
+Unit = Tuple[str, int, str]
+
+
+def _split_sections(text: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """Split text at markdown headings into (section name, [(sentence, separator)])"""
+    sections = []
+    section = DEFAULT_SECTION
+    sentences: List[Tuple[str, str]] = []
+    blank_lines = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            blank_lines += 1
+            continue
+        if stripped[0] == "#" and _HEADING_PATTERN.match(stripped):
+            if sentences:
+                sections.append((section, sentences))
+                sentences = []
+            section = stripped.strip("#").strip() or section
+            blank_lines = 0
+            continue
+        separator = "\n\n" if blank_lines else "\n"
+        blank_lines = 0
+        for i, sentence in enumerate(_SENTENCE_SPLIT.split(line.rstrip())):
+            sentences.append((sentence, separator if i == 0 else " "))
+    if sentences:
+        sections.append((section, sentences))
+    return sections
+
+
+def _split_oversized(sentence: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """Break a sentence longer than max_tokens at word boundaries"""
+    words = []
+    for word in sentence.split():
+        # A single word over budget (a URL, a table blob) is cut by characters
+        step = max(max_tokens - 1, 1) * CHARS_PER_TOKEN_ESTIMATE
+        words.extend(word[start:start + step] for start in range(0, len(word), step))
+    parts = []
+    current: List[str] = []
+    current_tokens = 0
+    for word, tokens in zip(words, count_tokens_batch(words)):
+        if current and current_tokens + tokens > max_tokens:
+            parts.append((" ".join(current), current_tokens))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        parts.append((" ".join(current), current_tokens))
+    return parts
+
+
+def _cost(unit: Unit, first: bool) -> int:
+    """Tokens a unit adds to a chunk; a newline separator is one more token"""
+    return unit[1] if first or unit[2] == " " else unit[1] + 1
+
+
+def _total(units: List[Unit]) -> int:
+    return sum(_cost(unit, i == 0) for i, unit in enumerate(units))
+
+
+def _is_boundary(unit: Unit, following: Unit) -> bool:
+    """Whether a chunk may end after unit without splitting a thought"""
+    return (
+        unit[0].endswith(_SENTENCE_END)
+        or following[2] == "\n\n"
+        or (following[2] == "\n" and _LIST_ITEM_PATTERN.match(following[0]) is not None)
+    )
+
+
+def _cut_point(current: List[Unit], following: Unit, carried: int, max_tokens: int) -> int:
+    """Number of units to emit: the last boundary in the chunk's second half, else all of them"""
+    running = _total(current)
+    for i in range(len(current), carried, -1):
+        if running < max_tokens // 2:
+            break
+        if _is_boundary(current[i - 1], current[i] if i < len(current) else following):
+            return i
+        running -= _cost(current[i - 1], i == 1)
+    return len(current)
+
+
+def _overlap(emitted: List[Unit], overlap_tokens: int) -> List[Unit]:
+    """Trailing whole sentences of a chunk totalling at most overlap_tokens"""
+    tokens = 0
+    start = len(emitted)
+    while start > 0 and tokens + _cost(emitted[start - 1], False) <= overlap_tokens:
+        start -= 1
+        tokens += _cost(emitted[start], False)
+    return emitted[start:]
+
+
+def _pack(units: List[Unit], max_tokens: int, overlap_tokens: int) -> List[List[Unit]]:
+    """Greedily pack one section's units into chunks of at most max_tokens"""
+    packed = []
+    current: List[Unit] = []
+    current_tokens = 0
+    carried = 0  # Leading units of current repeated from the previous chunk
+    for unit in units:
+        if current and current_tokens + _cost(unit, False) > max_tokens:
+            cut = _cut_point(current, unit, carried, max_tokens)
+            emitted, rest = current[:cut], current[cut:]
+            packed.append(emitted)
+            overlap = _overlap(emitted, overlap_tokens)
+            current, carried = overlap + rest, len(overlap)
+            current_tokens = _total(current)
+            if current_tokens + _cost(unit, not current) > max_tokens and overlap:
+                current, carried = rest, 0
+                current_tokens = _total(current)
+            if current and current_tokens + _cost(unit, False) > max_tokens:
+                packed.append(current)
+                current, carried, current_tokens = [], 0, 0
+        current_tokens += _cost(unit, not current)
+        current.append(unit)
+    if current:
+        packed.append(current)
+    return packed
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[Dict[str, str]]:
+    """Split text into heading-aware chunks of at most max_tokens tokens"""
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    sections = _split_sections(text)
+    counts = iter(count_tokens_batch([sentence for _, sentences in sections for sentence, _ in sentences]))
+
+    chunks = []
+    for section, sentences in sections:
+        units: List[Unit] = []
+        for sentence, separator in sentences:
+            tokens = next(counts)
+            if tokens <= max_tokens:
+                units.append((sentence, tokens, separator))
+                continue
+            for i, (part, part_tokens) in enumerate(_split_oversized(sentence, max_tokens)):
+                units.append((part, part_tokens, separator if i == 0 else " "))
+
+        for chunk_units in _pack(units, max_tokens, overlap_tokens):
+            chunk_text = "".join(separator + sentence for sentence, _, separator in chunk_units).strip()
+            if chunk_text:
+                chunks.append({"text": chunk_text, "section": section})
+    return chunks
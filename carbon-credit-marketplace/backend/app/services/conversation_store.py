@@ -0,0 +1,232 @@
+"""
+Server-side conversation state for the calculator and formalities chats
+
+Clients send only the new message and a session ID. State is kept in an
+in-process LRU by default, or in Postgres (chat_sessions table) or Redis
+when CHAT_STATE_BACKEND is set, so several workers can share sessions.
+History is truncated to CHAT_HISTORY_TOKEN_BUDGET tokens before each save
+and is never sent back to the client.
+"""
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from sqlalchemy import select, and_, delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import get_settings
+from app.core.sse import is_control_message
+from app.core.tokens import count_tokens
+from app.database import AsyncSessionLocal
+from app.models.models import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# Most recent messages kept even if they alone exceed the token budget
+MIN_HISTORY_MESSAGES = 2
+
+StoreKey = Tuple[str, str]
+
+
+def new_session_id() -> str:
+    """Generate a session ID for a new conversation"""
+    return uuid.uuid4().hex
+
+
+def truncate_history(history: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """
+    Keep the most recent messages that fit within the token budget
+
+    Older messages are dropped; the last MIN_HISTORY_MESSAGES are always kept.
+    """
+    total = 0
+    keep = 0
+    for message in reversed(history):
+        total += count_tokens(str(message.get("content", "")))
+        if total > token_budget and keep >= MIN_HISTORY_MESSAGES:
+            break
+        keep += 1
+    return history[len(history) - keep:] if keep else []
+
+
+def client_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """State as sent to the client: everything except the history"""
+    return {key: value for key, value in state.items() if key != "conversation_history"}
+
+
+class MemoryConversationStore:
+    """In-process LRU of conversation states with a TTL (single worker only)"""
+
+    def __init__(self, max_sessions: int, ttl_seconds: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at monotonic, state)
+        self._sessions: "OrderedDict[StoreKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def load(self, agent: str, session_id: str) -> Optional[Dict[str, Any]]:
+        key = (agent, session_id)
+        entry = self._sessions.get(key)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at < time.monotonic():
+            del self._sessions[key]
+            return None
+        self._sessions.move_to_end(key)
+        return state
+
+    async def save(self, agent: str, session_id: str, state: Dict[str, Any]) -> None:
+        key = (agent, session_id)
+        self._sessions[key] = (time.monotonic() + self.ttl_seconds, state)
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, agent: str, session_id: str) -> None:
+        self._sessions.pop((agent, session_id), None)
+
+
+class PostgresConversationStore:
+    """Conversation states in the chat_sessions table"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    async def load(self, agent: str, session_id: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(ChatSession.state).where(
+                    and_(
+                        ChatSession.session_id == session_id,
+                        ChatSession.agent == agent,
+                        ChatSession.expires_at > datetime.now(timezone.utc)
+                    )
+                )
+            )).scalar_one_or_none()
+
+    async def save(self, agent: str, session_id: str, state: Dict[str, Any]) -> None:
+        expires_at = datetime.now(timezone.utc) + self.ttl
+        statement = insert(ChatSession).values(
+            session_id=session_id,
+            agent=agent,
+            state=state,
+            expires_at=expires_at
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ChatSession.session_id, ChatSession.agent],
+            set_={"state": statement.excluded.state, "expires_at": expires_at}
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(statement)
+            await db.commit()
+
+    async def delete(self, agent: str, session_id: str) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(ChatSession).where(
+                    and_(ChatSession.session_id == session_id, ChatSession.agent == agent)
+                )
+            )
+            await db.commit()
+
+
+class RedisConversationStore:
+    """Conversation states as JSON strings in Redis with a key TTL"""
+
+    def __init__(self, url: str, ttl_seconds: int):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CHAT_STATE_BACKEND=redis requires the redis package") from e
+        self.client = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _key(agent: str, session_id: str) -> str:
+        return f"chat_session:{agent}:{session_id}"
+
+    async def load(self, agent: str, session_id: str) -> Optional[Dict[str, Any]]:
+        value = await self.client.get(self._key(agent, session_id))
+        return json.loads(value) if value is not None else None
+
+    async def save(self, agent: str, session_id: str, state: Dict[str, Any]) -> None:
+        await self.client.set(self._key(agent, session_id), json.dumps(state), ex=self.ttl_seconds)
+
+    async def delete(self, agent: str, session_id: str) -> None:
+        await self.client.delete(self._key(agent, session_id))
+
+
+_store = None
+
+
+def get_conversation_store():
+    """Get the configured conversation store (created on first use)"""
+    global _store
+    if _store is None:
+        settings = get_settings()
+        backend = settings.CHAT_STATE_BACKEND.lower()
+        if backend == "postgres":
+            _store = PostgresConversationStore(settings.CHAT_STATE_TTL_SECONDS)
+        elif backend == "redis":
+            _store = RedisConversationStore(settings.CHAT_STATE_REDIS_URL, settings.CHAT_STATE_TTL_SECONDS)
+        else:
+            _store = MemoryConversationStore(settings.CHAT_STATE_MAX_SESSIONS, settings.CHAT_STATE_TTL_SECONDS)
+    return _store
+
+
+async def load_conversation_state(
+    agent: str,
+    session_id: Optional[str],
+    fallback_state: Optional[Dict[str, Any]] = None
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Resolve the session ID and stored state for a chat request
+
+    Unknown or expired sessions fall back to the client-supplied state (older
+    clients still send it) or None to start a new conversation.
+    """
+    if not session_id:
+        return new_session_id(), fallback_state
+    state = await get_conversation_store().load(agent, session_id)
+    return session_id, state if state is not None else fallback_state
+
+
+async def save_conversation_state(agent: str, session_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Truncate the history to the token budget and store the state"""
+    settings = get_settings()
+    state["conversation_history"] = truncate_history(
+        state.get("conversation_history", []), settings.CHAT_HISTORY_TOKEN_BUDGET
+    )
+    try:
+        await get_conversation_store().save(agent, session_id, state)
+    except Exception as e:
+        logger.warning("Failed to save chat session", extra={"agent": agent, "session_id": session_id, "error": str(e)})
+    return state
+
+
+async def persist_conversation_stream(
+    agent: str,
+    session_id: str,
+    chunks: AsyncIterator[str]
+) -> AsyncIterator[str]:
+    """
+    Wrap an agent stream with session handling
+
+    Emits a {"type": "session"} event first, saves every state event the
+    agent yields and forwards it to the client without the history.
+    """
+    yield json.dumps({"type": "session", "session_id": session_id})
+    async for chunk in chunks:
+        if is_control_message(chunk):
+            try:
+                message = json.loads(chunk)
+            except ValueError:
+                message = None
+            if message and message.get("type") == "state":
+                state = await save_conversation_state(agent, session_id, message["conversation_state"])
+                message["conversation_state"] = client_state(state)
+                chunk = json.dumps(message)
+        yield chunk
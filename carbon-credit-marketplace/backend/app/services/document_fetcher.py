@@ -122,6 +122,19 @@ def parse_pdf_to_text(pdf_path: str) -> str:
         raise Exception(f"Error parsing PDF {pdf_path}: {str(e)}")
 
 
+def parse_document(file_path: str, file_type: str) -> str:
+    """
+    Read a local document and return its text
+    
+    Top-level and picklable so ingestion can run it in a process pool.
+    """
+    if file_type == "pdf":
+        return parse_pdf_to_text(file_path)
+    if file_type == "html":
+        return parse_html_to_text(read_local_document(file_path))
+    return read_local_document(file_path)
+
+
 # Future: Web scraping functions (for post-MVP)
 # def fetch_gov_documents():
 #     """Fetch documents from government websites"""
@@ -2,15 +2,195 @@
 Document OCR service using OpenAI Vision API
 """
 import base64
-from typing import Dict, Optional, Any
+import hashlib
+import io
+import json
+from typing import Dict, Optional, Any, Tuple, Union
 from openai import AsyncOpenAI
+from PIL import Image, ImageOps
 from app.config import get_settings
-from app.agents.llm_client import client
+from app.agents.llm_client import create_chat_completion
 
 settings = get_settings()
 
+# Image pre-processing applied before upload to the vision model.
+# Documents are assumed to be at most A4/Letter sized, so the long edge is
+# capped at the target DPI over an 11.7" page.
+OCR_TARGET_DPI = 150
+OCR_MAX_LONG_EDGE = int(11.7 * OCR_TARGET_DPI)
+OCR_IMAGE_QUALITY = 80
+OCR_IMAGE_FORMAT = "WEBP"  # "WEBP" or "JPEG"
 
-async def extract_text_from_image(image_bytes: bytes, mime_type: str) -> str:
+# Extraction prompts for each document type
+EXTRACTION_PROMPTS = {
+    "pan_card": """Extract the following information from this PAN card image:
+- name: Full name
+- pan_number: PAN number (10 characters)
+- father_name: Father's name
+- date_of_birth: Date of birth (format: YYYY-MM-DD)
+
+Return as JSON with these exact keys. If any field is not found, set it to null.""",
+    
+    "gstin": """Extract the following information from this GSTIN certificate image:
+- gstin: GSTIN number (15 characters)
+- legal_name: Legal name of the business
+- trade_name: Trade name (if different)
+- address: Complete address
+- state: State name
+
+Return as JSON with these exact keys. If any field is not found, set it to null.""",
+    
+    "company_registration": """Extract the following information from this company registration document:
+- company_name: Full company name
+- cin: Corporate Identity Number (CIN)
+- registration_date: Date of registration (format: YYYY-MM-DD)
+- address: Registered address
+
+Return as JSON with these exact keys. If any field is not found, set it to null.""",
+    
+    "gci_certificate": """Extract the following information from this GCI Registry Certificate:
+- registration_id: GCI registration ID
+- company_name: Company name
+- issue_date: Issue date (format: YYYY-MM-DD)
+- validity: Validity date or expiry date (format: YYYY-MM-DD)
+
+Return as JSON with these exact keys. If any field is not found, set it to null.""",
+    
+    "bee_certificate": """Extract the following information from this BEE Credit Certificate:
+- certificate_number: Certificate number
+- credits_issued: Number of credits issued
+- project_type: Type of project
+- vintage: Year (if mentioned)
+
+Return as JSON with these exact keys. If any field is not found, set it to null."""
+}
+
+DEFAULT_EXTRACTION_PROMPT = "Extract all relevant information from this document and return as JSON."
+
+COMBINED_EXTRACTION_INSTRUCTIONS = """Also transcribe all text in the document image.
+
+Return a single JSON object with exactly two keys:
+- raw_text: all text in the document as plain text, no formatting
+- extracted_data: an object with the fields requested above"""
+
+
+# Changes whenever prompts, model or pre-processing change, so cached OCR
+# results from an older extraction setup are not reused
+OCR_PROMPT_VERSION = hashlib.sha256(
+    json.dumps({
+        "model": "gpt-4o",
+        "prompts": EXTRACTION_PROMPTS,
+        "default_prompt": DEFAULT_EXTRACTION_PROMPT,
+        "combined": COMBINED_EXTRACTION_INSTRUCTIONS,
+        "preprocess": [OCR_MAX_LONG_EDGE, OCR_IMAGE_QUALITY, OCR_IMAGE_FORMAT]
+    }, sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+# Image data may arrive as bytes or as a zero-copy view of an upload buffer
+ImageBuffer = Union[bytes, memoryview]
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over a buffer, without copying it like BytesIO"""
+    
+    def __init__(self, buffer: ImageBuffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, target) -> int:
+        chunk = self._view[self._pos:self._pos + len(target)]
+        n = len(chunk)
+        target[:n] = chunk
+        self._pos += n
+        return n
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+
+def get_image_format(mime_type: str) -> str:
+    """Determine image format for a data URL from a MIME type"""
+    if 'jpeg' in mime_type or 'jpg' in mime_type:
+        return "jpeg"
+    elif 'png' in mime_type:
+        return "png"
+    elif 'gif' in mime_type:
+        return "gif"
+    elif 'webp' in mime_type:
+        return "webp"
+    return "png"  # Default
+
+
+def build_image_data_url(image_bytes: ImageBuffer, mime_type: str) -> str:
+    """Encode image bytes as a base64 data URL for the vision API"""
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    return f"data:image/{get_image_format(mime_type)};base64,{base64_image}"
+
+
+def prepare_image_for_ocr(
+    image_bytes: ImageBuffer,
+    mime_type: str,
+    max_long_edge: int = OCR_MAX_LONG_EDGE,
+    grayscale: bool = True,
+    image_format: str = OCR_IMAGE_FORMAT,
+    quality: int = OCR_IMAGE_QUALITY
+) -> Tuple[ImageBuffer, str]:
+    """
+    Downscale and re-encode a document image before upload
+    
+    Converts to grayscale, caps the long edge at the target DPI and
+    re-encodes as WebP/JPEG. Falls back to the original bytes if the image
+    cannot be decoded or the result would not be smaller.
+    
+    Returns:
+        Tuple of (image bytes, MIME type)
+    """
+    try:
+        with BufferReader(image_bytes) as reader, Image.open(reader) as image:
+            image = ImageOps.exif_transpose(image)
+            
+            if grayscale:
+                image = image.convert("L")
+            elif image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            
+            long_edge = max(image.size)
+            if long_edge > max_long_edge:
+                scale = max_long_edge / long_edge
+                new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(new_size, Image.LANCZOS)
+            
+            output = io.BytesIO()
+            image.save(output, format=image_format, quality=quality, optimize=True)
+            processed = output.getvalue()
+    except Exception:
+        return image_bytes, mime_type
+    
+    if len(processed) >= len(image_bytes):
+        return image_bytes, mime_type
+    return processed, f"image/{image_format.lower()}"
+
+
+async def extract_text_from_image(image_bytes: ImageBuffer, mime_type: str) -> str:
     """
     Extract raw text from an image using OpenAI Vision API
     
@@ -22,22 +202,9 @@ async def extract_text_from_image(image_bytes: bytes, mime_type: str) -> str:
         Extracted text as string
     """
     try:
-        # Convert image to base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        image_url = build_image_data_url(image_bytes, mime_type)
         
-        # Determine format from mime_type
-        if 'jpeg' in mime_type or 'jpg' in mime_type:
-            image_format = "jpeg"
-        elif 'png' in mime_type:
-            image_format = "png"
-        elif 'gif' in mime_type:
-            image_format = "gif"
-        elif 'webp' in mime_type:
-            image_format = "webp"
-        else:
-            image_format = "png"  # Default
-        
-        response = await client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o",
             messages=[
                 {
@@ -50,7 +217,7 @@ async def extract_text_from_image(image_bytes: bytes, mime_type: str) -> str:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/{image_format};base64,{base64_image}"
+                                "url": image_url
                             }
                         }
                     ]
@@ -65,7 +232,7 @@ async def extract_text_from_image(image_bytes: bytes, mime_type: str) -> str:
 
 
 async def extract_structured_data(
-    image_bytes: bytes,
+    image_bytes: ImageBuffer,
     document_type: str,
     mime_type: str
 ) -> Dict[str, Any]:
@@ -81,71 +248,10 @@ async def extract_structured_data(
         Dictionary with extracted structured data
     """
     try:
-        # Convert image to base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        image_url = build_image_data_url(image_bytes, mime_type)
+        prompt = EXTRACTION_PROMPTS.get(document_type, DEFAULT_EXTRACTION_PROMPT)
         
-        # Determine format from mime_type
-        if 'jpeg' in mime_type or 'jpg' in mime_type:
-            image_format = "jpeg"
-        elif 'png' in mime_type:
-            image_format = "png"
-        elif 'gif' in mime_type:
-            image_format = "gif"
-        elif 'webp' in mime_type:
-            image_format = "webp"
-        else:
-            image_format = "png"
-        
-        # Define extraction prompts for each document type
-        extraction_prompts = {
-            "pan_card": """Extract the following information from this PAN card image:
-- name: Full name
-- pan_number: PAN number (10 characters)
-- father_name: Father's name
-- date_of_birth: Date of birth (format: YYYY-MM-DD)
-
-Return as JSON with these exact keys. If any field is not found, set it to null.""",
-            
-            "gstin": """Extract the following information from this GSTIN certificate image:
-- gstin: GSTIN number (15 characters)
-- legal_name: Legal name of the business
-- trade_name: Trade name (if different)
-- address: Complete address
-- state: State name
-
-Return as JSON with these exact keys. If any field is not found, set it to null.""",
-            
-            "company_registration": """Extract the following information from this company registration document:
-- company_name: Full company name
-- cin: Corporate Identity Number (CIN)
-- registration_date: Date of registration (format: YYYY-MM-DD)
-- address: Registered address
-
-Return as JSON with these exact keys. If any field is not found, set it to null.""",
-            
-            "gci_certificate": """Extract the following information from this GCI Registry Certificate:
-- registration_id: GCI registration ID
-- company_name: Company name
-- issue_date: Issue date (format: YYYY-MM-DD)
-- validity: Validity date or expiry date (format: YYYY-MM-DD)
-
-Return as JSON with these exact keys. If any field is not found, set it to null.""",
-            
-            "bee_certificate": """Extract the following information from this BEE Credit Certificate:
-- certificate_number: Certificate number
-- credits_issued: Number of credits issued
-- project_type: Type of project
-- vintage: Year (if mentioned)
-
-Return as JSON with these exact keys. If any field is not found, set it to null."""
-        }
-        
-        prompt = extraction_prompts.get(
-            document_type,
-            "Extract all relevant information from this document and return as JSON."
-        )
-        
-        response = await client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o",
             messages=[
                 {
@@ -158,7 +264,7 @@ Return as JSON with these exact keys. If any field is not found, set it to null.
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/{image_format};base64,{base64_image}"
+                                "url": image_url
                             }
                         }
                     ]
@@ -168,7 +274,6 @@ Return as JSON with these exact keys. If any field is not found, set it to null.
             response_format={"type": "json_object"}
         )
         
-        import json
         extracted_data = json.loads(response.choices[0].message.content)
         
         return extracted_data
@@ -176,10 +281,69 @@ Return as JSON with these exact keys. If any field is not found, set it to null.
         raise Exception(f"Error extracting structured data: {str(e)}")
 
 
-async def extract_text_and_structured_data(
-    image_bytes: bytes,
+async def extract_combined(
+    image_bytes: ImageBuffer,
     document_type: str,
     mime_type: str
+) -> Dict[str, Any]:
+    """
+    Extract raw text and structured data in a single vision call
+    
+    Args:
+        image_bytes: Image file bytes
+        document_type: Type of document
+        mime_type: MIME type of the image
+    
+    Returns:
+        Dictionary with 'raw_text' and 'extracted_data' keys
+    """
+    try:
+        image_url = build_image_data_url(image_bytes, mime_type)
+        prompt = EXTRACTION_PROMPTS.get(document_type, DEFAULT_EXTRACTION_PROMPT)
+        
+        response = await create_chat_completion(
+            model="gpt-4o",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": f"{prompt}\n\n{COMBINED_EXTRACTION_INSTRUCTIONS}"
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_url
+                            }
+                        }
+                    ]
+                }
+            ],
+            max_tokens=1500,
+            response_format={"type": "json_object"}
+        )
+        
+        content = json.loads(response.choices[0].message.content)
+        extracted_data = content.get("extracted_data")
+        if not isinstance(extracted_data, dict):
+            # Model returned the fields at the top level
+            extracted_data = {k: v for k, v in content.items() if k != "raw_text"}
+        
+        return {
+            "raw_text": str(content.get("raw_text") or "").strip(),
+            "extracted_data": extracted_data
+        }
+    except Exception as e:
+        raise Exception(f"Error extracting combined text and data: {str(e)}")
+
+
+async def extract_text_and_structured_data(
+    image_bytes: ImageBuffer,
+    document_type: str,
+    mime_type: str,
+    combined: bool = True,
+    preprocess: bool = True
 ) -> Dict[str, Any]:
     """
     Extract both raw text and structured data from document
@@ -188,13 +352,23 @@ async def extract_text_and_structured_data(
         image_bytes: Image file bytes
         document_type: Type of document
         mime_type: MIME type of the image
+        combined: Use one vision call for both outputs instead of two
+        preprocess: Downscale and re-encode the image before upload
     
     Returns:
         Dictionary with 'raw_text' and 'extracted_data' keys
     """
     try:
-        raw_text = await extract_text_from_image(image_bytes, mime_type)
-        extracted_data = await extract_structured_data(image_bytes, document_type, mime_type)
+        if preprocess:
+            image_bytes, mime_type = prepare_image_for_ocr(image_bytes, mime_type)
+        
+        if combined:
+            result = await extract_combined(image_bytes, document_type, mime_type)
+            raw_text = result["raw_text"]
+            extracted_data = result["extracted_data"]
+        else:
+            raw_text = await extract_text_from_image(image_bytes, mime_type)
+            extracted_data = await extract_structured_data(image_bytes, document_type, mime_type)
         
         return {
             "raw_text": raw_text,
@@ -1,23 +1,91 @@
 """
 Fraud detection service for registration and document verification
 """
-from typing import Dict, Any, Optional
+import logging
+from typing import Dict, Any, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, func
 from uuid import UUID
-from app.models.models import User
+from app.models.models import User, Document
 from app.agents.llm_client import get_completion
+from app.services.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+# Registration keys seen so far, used to skip the duplicate query when a
+# key is definitely new. Sized for a few million users at ~1% false positives.
+REGISTRATION_BLOOM_CAPACITY = 5_000_000
+registration_bloom = BloomFilter(REGISTRATION_BLOOM_CAPACITY, error_rate=0.01)
+_registration_bloom_loaded = False
+
+
+def _registration_keys(
+    email: Optional[str],
+    pan: Optional[str] = None,
+    gstin: Optional[str] = None
+) -> List[str]:
+    """Build normalized Bloom filter keys for a registration"""
+    keys = []
+    if email:
+        keys.append(f"email:{email.lower()}")
+    if pan:
+        keys.append(f"pan:{pan.upper()}")
+    if gstin:
+        keys.append(f"gstin:{gstin.upper()}")
+    return keys
+
+
+def remember_registration(
+    email: Optional[str],
+    pan: Optional[str] = None,
+    gstin: Optional[str] = None
+) -> None:
+    """Add a registered user's keys to the in-memory Bloom filter"""
+    for key in _registration_keys(email, pan, gstin):
+        registration_bloom.add(key)
+
+
+async def load_registration_bloom(db: AsyncSession, batch_size: int = 10000) -> int:
+    """
+    Populate the Bloom filter from the users table
+    
+    Until this has run, check_duplicate_registration always queries the database.
+    
+    Returns:
+        Number of users loaded
+    """
+    global _registration_bloom_loaded
+    
+    registration_bloom.clear()
+    loaded = 0
+    result = await db.stream(
+        select(User.email, User.pan_number, User.gstin).execution_options(yield_per=batch_size)
+    )
+    async for email, pan, gstin in result:
+        remember_registration(email, pan, gstin)
+        loaded += 1
+    
+    _registration_bloom_loaded = True
+    return loaded
 
 
 async def check_duplicate_registration(
     db: AsyncSession,
     email: str,
     pan: Optional[str] = None,
-    gstin: Optional[str] = None
+    gstin: Optional[str] = None,
+    use_bloom_filter: bool = True
 ) -> Dict[str, bool]:
     """
     Check for duplicate registrations based on email, PAN, or GSTIN
     
+    Uses a single query against the lower(email), upper(pan_number) and
+    upper(gstin) unique indexes. When the Bloom filter is loaded and none of
+    the keys can be present, the query is skipped entirely. The filter is
+    per-process, so the unique indexes remain the source of truth for users
+    registered through other workers.
+    
     Returns:
         Dictionary with duplicate flags for email, pan, gstin
     """
@@ -27,26 +95,32 @@ async def check_duplicate_registration(
         "gstin_duplicate": False
     }
     
+    keys = _registration_keys(email, pan, gstin)
+    if not keys:
+        return result
+    
+    if use_bloom_filter and _registration_bloom_loaded:
+        if not any(key in registration_bloom for key in keys):
+            return result
+    
     try:
-        # Check email
+        conditions = []
         if email:
-            email_query = select(User).where(User.email == email.lower())
-            email_result = await db.execute(email_query)
-            if email_result.scalar_one_or_none():
-                result["email_duplicate"] = True
-        
-        # Check PAN
+            conditions.append(func.lower(User.email) == email.lower())
         if pan:
-            pan_query = select(User).where(User.pan_number == pan.upper())
-            pan_result = await db.execute(pan_query)
-            if pan_result.scalar_one_or_none():
-                result["pan_duplicate"] = True
-        
-        # Check GSTIN
+            conditions.append(func.upper(User.pan_number) == pan.upper())
         if gstin:
-            gstin_query = select(User).where(User.gstin == gstin.upper())
-            gstin_result = await db.execute(gstin_query)
-            if gstin_result.scalar_one_or_none():
+            conditions.append(func.upper(User.gstin) == gstin.upper())
+        
+        query = select(User.email, User.pan_number, User.gstin).where(or_(*conditions)).limit(3)
+        rows = (await db.execute(query)).all()
+        
+        for row_email, row_pan, row_gstin in rows:
+            if email and row_email and row_email.lower() == email.lower():
+                result["email_duplicate"] = True
+            if pan and row_pan and row_pan.upper() == pan.upper():
+                result["pan_duplicate"] = True
+            if gstin and row_gstin and row_gstin.upper() == gstin.upper():
                 result["gstin_duplicate"] = True
         
         return result
@@ -57,7 +131,8 @@ async def check_duplicate_registration(
 
 async def detect_fraud_indicators(
     user_data: Dict[str, Any],
-    documents: Dict[str, Any]
+    documents: Dict[str, Any],
+    raise_errors: bool = False
 ) -> Dict[str, Any]:
     """
     Detect fraud indicators using AI analysis
@@ -65,6 +140,8 @@ async def detect_fraud_indicators(
     Args:
         user_data: User registration data
         documents: Dictionary of document extracted data
+        raise_errors: Re-raise LLM errors instead of returning a low-risk result
+            (used by the background job so failures can be retried)
     
     Returns:
         Dictionary with fraud indicators and suspicious patterns
@@ -130,6 +207,8 @@ Provide your analysis as JSON with the structure specified."""
         
         return result
     except Exception as e:
+        if raise_errors:
+            raise
         return {
             "has_fraud_indicators": False,
             "indicators": [],
@@ -138,13 +217,16 @@ Provide your analysis as JSON with the structure specified."""
         }
 
 
-async def analyze_risk_score(
+def calculate_base_risk_score(
     user_data: Dict[str, Any],
     documents: Dict[str, Any],
     duplicate_check: Dict[str, bool]
 ) -> float:
     """
-    Calculate risk score (0-100) based on various factors
+    Calculate the deterministic part of the risk score (0-100)
+    
+    Uses only rule-based checks so it is cheap enough to run inline during
+    registration. The LLM adjustment is applied later by the fraud job worker.
     
     Args:
         user_data: User registration data
@@ -179,17 +261,88 @@ async def analyze_risk_score(
     if not user_data.get("gstin"):
         risk_score += 5
     
+    # Cap at 100
+    return min(risk_score, 100.0)
+
+
+def get_fraud_risk_adjustment(fraud_result: Dict[str, Any]) -> float:
+    """Translate an AI fraud detection result into a risk score adjustment"""
+    if not fraud_result.get("has_fraud_indicators"):
+        return 0.0
+    
+    risk_level = fraud_result.get("risk_level", "low")
+    if risk_level == "high":
+        return 30.0
+    elif risk_level == "medium":
+        return 15.0
+    elif risk_level == "low":
+        return 5.0
+    return 0.0
+
+
+# Risk added when a user uploads a file byte-identical to another user's document
+SHARED_DOCUMENT_RISK = 30.0
+
+
+async def flag_shared_document(db: AsyncSession, user_id: UUID, content_hash: str) -> bool:
+    """
+    Raise a user's risk score if another user uploaded the same file
+    
+    Identical bytes across accounts (same PAN card scan, same certificate)
+    are a strong impersonation signal. Uses the indexed Document.content_hash
+    so the check costs one lookup. The caller is responsible for committing.
+    
+    Returns:
+        True if the document was flagged
+    """
+    result = await db.execute(
+        select(Document.id).where(
+            Document.content_hash == content_hash,
+            Document.user_id != user_id
+        ).limit(1)
+    )
+    if result.first() is None:
+        return False
+    
+    user_result = await db.execute(select(User).where(User.id == user_id))
+    user = user_result.scalar_one_or_none()
+    if user:
+        user.risk_score = min((user.risk_score or 0.0) + SHARED_DOCUMENT_RISK, 100.0)
+        user.verification_tier = get_verification_tier(user.risk_score)
+    
+    logger.warning("Uploaded document is shared with another account", extra={"content_hash": content_hash[:12], "user_id": str(user_id)})
+    return True
+
+
+def get_verification_tier(risk_score: float) -> str:
+    """Determine verification tier from a risk score"""
+    if risk_score < 20:
+        return "verified"
+    return "basic"
+
+
+async def analyze_risk_score(
+    user_data: Dict[str, Any],
+    documents: Dict[str, Any],
+    duplicate_check: Dict[str, bool]
+) -> float:
+    """
+    Calculate risk score (0-100) based on various factors
+    
+    Args:
+        user_data: User registration data
+        documents: Dictionary of document extracted data
+        duplicate_check: Result from check_duplicate_registration
+    
+    Returns:
+        Risk score from 0 (low risk) to 100 (high risk)
+    """
+    risk_score = calculate_base_risk_score(user_data, documents, duplicate_check)
+    
     # Use AI fraud detection to adjust score
     try:
         fraud_result = await detect_fraud_indicators(user_data, documents)
-        if fraud_result.get("has_fraud_indicators"):
-            risk_level = fraud_result.get("risk_level", "low")
-            if risk_level == "high":
-                risk_score += 30
-            elif risk_level == "medium":
-                risk_score += 15
-            elif risk_level == "low":
-                risk_score += 5
+        risk_score += get_fraud_risk_adjustment(fraud_result)
     except:
         pass  # If AI analysis fails, continue with base score
     
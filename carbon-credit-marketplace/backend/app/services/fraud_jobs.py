@@ -0,0 +1,183 @@
+"""
+Background fraud analysis jobs
+
+Registration creates the user with a provisional risk score from the
+deterministic rules and enqueues a FraudAnalysisJob. The LLM analysis runs
+here, outside the request, and updates the user's risk_score and
+verification_tier when it finishes. Jobs live in Postgres so they survive
+worker restarts and are retried with exponential backoff.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+from uuid import UUID
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import User, FraudAnalysisJob
+from app.services.fraud_detector import (
+    detect_fraud_indicators, get_fraud_risk_adjustment, get_verification_tier
+)
+
+logger = logging.getLogger(__name__)
+
+# Retry policy
+FRAUD_JOB_MAX_ATTEMPTS = 5
+FRAUD_JOB_BASE_BACKOFF_SECONDS = 30
+FRAUD_JOB_POLL_INTERVAL_SECONDS = 10
+# A running job whose worker died is picked up again after this long
+FRAUD_JOB_STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_fraud_analysis(
+    db: AsyncSession,
+    user_id: UUID,
+    user_data: Dict[str, Any],
+    documents: Dict[str, Any],
+    base_risk_score: float
+) -> FraudAnalysisJob:
+    """
+    Add a fraud analysis job to the session
+
+    The job is committed together with the caller's transaction, so a user is
+    never created without its pending analysis.
+    """
+    job = FraudAnalysisJob(
+        user_id=user_id,
+        status="pending",
+        attempts=0,
+        max_attempts=FRAUD_JOB_MAX_ATTEMPTS,
+        payload={
+            "user_data": user_data,
+            "documents": documents,
+            "base_risk_score": base_risk_score
+        }
+    )
+    db.add(job)
+    return job
+
+
+async def claim_fraud_job(db: AsyncSession, job_id: Optional[UUID] = None) -> Optional[FraudAnalysisJob]:
+    """
+    Claim the next runnable job (or a specific one) and mark it running
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so several workers can poll the
+    table without picking up the same job. A stale running job that has used
+    all its attempts (its worker died on the last one) is marked failed
+    instead of being reclaimed.
+    """
+    now = datetime.now(timezone.utc)
+    stale = and_(
+        FraudAnalysisJob.status == "running",
+        FraudAnalysisJob.locked_at < now - FRAUD_JOB_STALE_AFTER
+    )
+    exhausted = await db.execute(
+        update(FraudAnalysisJob)
+        .where(stale, FraudAnalysisJob.attempts >= FraudAnalysisJob.max_attempts)
+        .values(status="failed", last_error="Worker stopped during the last attempt")
+        .execution_options(synchronize_session=False)
+    )
+    if exhausted.rowcount:
+        logger.error("Fraud analysis jobs failed after their worker stopped", extra={"jobs": exhausted.rowcount})
+
+    query = select(FraudAnalysisJob).where(
+        or_(
+            and_(
+                FraudAnalysisJob.status == "pending",
+                FraudAnalysisJob.next_run_at <= now
+            ),
+            and_(stale, FraudAnalysisJob.attempts < FraudAnalysisJob.max_attempts)
+        )
+    )
+    if job_id:
+        query = query.where(FraudAnalysisJob.id == job_id)
+
+    query = query.order_by(FraudAnalysisJob.next_run_at.asc()).limit(1).with_for_update(skip_locked=True)
+
+    result = await db.execute(query)
+    job = result.scalar_one_or_none()
+    if not job:
+        await db.commit()  # Keep any exhausted jobs marked failed above
+        return None
+
+    job.status = "running"
+    job.attempts = (job.attempts or 0) + 1
+    job.locked_at = now
+    await db.commit()
+    return job
+
+
+async def run_fraud_job(job_id: Optional[UUID] = None) -> bool:
+    """
+    Run a single fraud analysis job
+
+    Args:
+        job_id: Run this job if it is runnable; otherwise run the next due job
+
+    Returns:
+        True if a job was claimed (whether it succeeded or not)
+    """
+    async with AsyncSessionLocal() as db:
+        job = await claim_fraud_job(db, job_id)
+        if not job:
+            return False
+
+        claimed_id = job.id
+        payload = job.payload or {}
+        try:
+            fraud_result = await detect_fraud_indicators(
+                payload.get("user_data", {}),
+                payload.get("documents", {}),
+                raise_errors=True
+            )
+
+            risk_score = min(
+                float(payload.get("base_risk_score", 0.0)) + get_fraud_risk_adjustment(fraud_result),
+                100.0
+            )
+
+            result = await db.execute(select(User).where(User.id == job.user_id))
+            user = result.scalar_one_or_none()
+            if user:
+                user.risk_score = risk_score
+                user.verification_tier = get_verification_tier(risk_score)
+
+            job.status = "completed"
+            job.result = fraud_result
+            job.last_error = None
+            job.completed_at = datetime.now(timezone.utc)
+            await db.commit()
+        except Exception as e:
+            # Rollback expires loaded instances, so reload the job before updating it
+            await db.rollback()
+            job = await db.get(FraudAnalysisJob, claimed_id)
+            job.last_error = str(e)
+            if job.attempts >= job.max_attempts:
+                job.status = "failed"
+                logger.error("Fraud analysis job failed", extra={"job_id": str(job.id), "attempts": job.attempts, "error": str(e)})
+            else:
+                delay = FRAUD_JOB_BASE_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+                job.status = "pending"
+                job.next_run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                logger.warning(
+                    "Fraud analysis job attempt failed, retrying",
+                    extra={"job_id": str(job.id), "attempt": job.attempts, "retry_in_seconds": delay, "error": str(e)}
+                )
+            await db.commit()
+
+        return True
+
+
+async def fraud_job_worker(poll_interval: float = FRAUD_JOB_POLL_INTERVAL_SECONDS):
+    """Poll for due fraud analysis jobs until cancelled"""
+    while True:
+        try:
+            while await run_fraud_job():
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Fraud job worker error", extra={"error": str(e)})
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,206 @@
+"""
+In-process hybrid retrieval: exact vector top-k + BM25, fused by RRF
+
+Our RAG corpora are a few hundred chunks, so a NumPy matrix of normalized
+embeddings gives exact cosine top-k in well under a millisecond, and a BM25
+inverted index over the same chunks catches exact terms (form names, section
+numbers, acronyms) that embeddings blur. The two rankings are blended with
+reciprocal rank fusion. The index also serves as the fallback when Qdrant
+or the embedding API is unavailable.
+"""
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+logger = logging.getLogger(__name__)
+
+RRF_K = 60  # Standard reciprocal rank fusion constant
+CANDIDATE_MULTIPLIER = 4  # Each ranker contributes limit * CANDIDATE_MULTIPLIER candidates
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Common English words that add noise to BM25 scores
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this "
+    "to was what when where which who will with you your do does can should".split()
+)
+
+SearchHit = Tuple[Dict[str, Any], float]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse ranked lists of document indices; returns (index, fused score) best first"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_index in enumerate(ranking):
+            fused[doc_index] = fused.get(doc_index, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridIndex:
+    """
+    Chunks with payloads, a BM25 inverted index and (optionally) embeddings
+
+    The index is immutable once built; ingestion builds a new one and swaps
+    it in with a single assignment, so searches never see a partial index.
+    """
+
+    def __init__(self, payloads: List[Dict[str, Any]], texts: List[str], embeddings: Optional[np.ndarray] = None):
+        self.payloads = payloads
+        self.size = len(texts)
+
+        # BM25: token -> (document indices, term frequencies)
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.empty(self.size, dtype=np.float32)
+        for doc_index, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc_index] = len(tokens)
+            for token, count in Counter(tokens).items():
+                doc_indices, frequencies = postings.setdefault(token, ([], []))
+                doc_indices.append(doc_index)
+                frequencies.append(count)
+        self.postings = {
+            token: (np.array(doc_indices, dtype=np.int64), np.array(frequencies, dtype=np.float32))
+            for token, (doc_indices, frequencies) in postings.items()
+        }
+        average_length = float(lengths.mean()) if self.size else 0.0
+        # Per-document BM25 length normalization, precomputed
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average_length, 1e-9))
+        self.idf = {
+            token: math.log(1 + (self.size - len(doc_indices) + 0.5) / (len(doc_indices) + 0.5))
+            for token, (doc_indices, _) in self.postings.items()
+        }
+
+        self.embeddings: Optional[np.ndarray] = None
+        if embeddings is not None and len(embeddings) == self.size and self.size:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self.embeddings = matrix / np.maximum(norms, 1e-12)
+
+    @property
+    def has_vectors(self) -> bool:
+        return self.embeddings is not None
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            doc_indices, frequencies = posting
+            scores[doc_indices] += self.idf[token] * frequencies * (BM25_K1 + 1) / (
+                frequencies + self.length_norm[doc_indices]
+            )
+        return scores
+
+    def bm25_search(self, query: str, limit: int) -> List[int]:
+        scores = self.bm25_scores(query)
+        return [int(i) for i in top_k(scores, limit) if scores[i] > 0]
+
+    def vector_search(self, query_embedding: Sequence[float], limit: int) -> List[Tuple[int, float]]:
+        """Exact cosine top-k"""
+        if self.embeddings is None:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.embeddings @ query
+        return [(int(i), float(scores[i])) for i in top_k(scores, limit)]
+
+    def search(
+        self,
+        query: str,
+        query_embedding: Optional[Sequence[float]] = None,
+        limit: int = 5
+    ) -> List[SearchHit]:
+        """
+        Hybrid search returning (payload, score) pairs
+
+        With a query embedding and stored vectors, vector and BM25 rankings are
+        fused by RRF; otherwise BM25 alone is used. Scores are the fused RRF
+        score or the BM25 score respectively.
+        """
+        if not self.size:
+            return []
+        candidates = limit * CANDIDATE_MULTIPLIER
+        if query_embedding is None or self.embeddings is None:
+            scores = self.bm25_scores(query)
+            return [
+                (self.payloads[i], float(scores[i]))
+                for i in top_k(scores, limit) if scores[i] > 0
+            ]
+
+        vector_ranking = [doc_index for doc_index, _ in self.vector_search(query_embedding, candidates)]
+        bm25_ranking = self.bm25_search(query, candidates)
+        fused = reciprocal_rank_fusion([vector_ranking, bm25_ranking])[:limit]
+        return [(self.payloads[doc_index], score) for doc_index, score in fused]
+
+
+# Named indexes (one per corpus), replaced wholesale on re-ingestion
+_indexes: Dict[str, HybridIndex] = {}
+
+
+def set_local_index(name: str, index: HybridIndex) -> None:
+    _indexes[name] = index
+
+
+def get_local_index(name: str) -> Optional[HybridIndex]:
+    return _indexes.get(name)
+
+
+async def search_corpus(
+    index_name: str,
+    query: str,
+    limit: int,
+    embed: Callable[[str], Awaitable[List[float]]],
+    remote_search: Callable[[List[float], int], Awaitable[List[SearchHit]]],
+    local_max_chunks: int
+) -> List[SearchHit]:
+    """
+    Search a corpus via the in-process index or Qdrant, falling back as needed
+
+    The local index answers directly when it holds the corpus with vectors and
+    has at most local_max_chunks chunks. Otherwise Qdrant is queried, and
+    the local index (BM25-only if the embedding call failed) is the fallback.
+    """
+    index = get_local_index(index_name)
+    try:
+        query_embedding = await embed(query)
+    except Exception as e:
+        logger.warning("Query embedding failed, using keyword search", extra={"error": str(e)})
+        query_embedding = None
+
+    use_local = index is not None and index.size <= local_max_chunks and (
+        index.has_vectors or query_embedding is None
+    )
+    if not use_local and query_embedding is not None:
+        try:
+            return await remote_search(query_embedding, limit)
+        except Exception as e:
+            logger.warning("Qdrant search failed, using in-process index", extra={"error": str(e)})
+
+    if index is None:
+        return []
+    return index.search(query, query_embedding, limit)
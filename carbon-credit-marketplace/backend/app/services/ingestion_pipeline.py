@@ -0,0 +1,458 @@
+"""
+Streaming ingestion pipeline for the RAG corpora
+
+Documents flow through five stages connected by bounded queues:
+
+    discover -> parse -> chunk -> embed (batched) -> upsert (bulk)
+
+PDF/HTML parsing runs in a process pool, plain text is read in a thread,
+embeddings are requested in batches with a few batches in flight, and
+points are upserted to Qdrant one batch at a time. Because the queues are
+bounded, a large document drop never holds more than a few hundred chunks
+in memory between stages.
+
+Each document is recorded in a JSON checkpoint (content sha256 and chunk
+count) once all its chunks are stored. A resumed run skips documents whose
+hash and stored chunk count still match, so an interrupted ingestion picks
+up where it stopped and an unchanged corpus is not re-embedded.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    PointStruct, Filter, FieldCondition, MatchValue, MatchAny, Range, FilterSelector
+)
+
+from app.agents.llm_client import get_embeddings
+from app.services.chunking import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, split_into_chunks
+from app.services.document_fetcher import parse_document
+from app.services.hybrid_index import HybridIndex, set_local_index
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = 64
+EMBED_CONCURRENCY = 4  # Embedding batches in flight
+EMBED_BATCH_MAX_WAIT_SECONDS = 0.5  # Flush a partial batch if no chunk arrives for this long
+QUEUE_SIZE = 256
+MAX_PARSE_WORKERS = 4
+SCROLL_PAGE_SIZE = 256
+PROCESS_POOL_TYPES = {"pdf", "html"}  # CPU-bound parsers; other types are plain reads
+
+_DONE = object()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def point_id(document: str, chunk_index: int) -> str:
+    """Stable Qdrant point ID for a chunk, so re-ingestion overwrites in place"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{document}#{chunk_index}"))
+
+
+class StageStats:
+    """Work done by one pipeline stage"""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def record(self, items: int, seconds: float) -> None:
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - seconds
+        self.finished = now
+        self.items += items
+        self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        """Items per second over the stage's active wall-clock window"""
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.items / (self.finished - self.started)
+
+
+class PipelineStats:
+    """Per-stage throughput and document outcomes for one run"""
+
+    def __init__(self):
+        self.stages = {
+            name: StageStats(name, unit)
+            for name, unit in (
+                ("discover", "docs"), ("parse", "docs"), ("chunk", "chunks"),
+                ("embed", "chunks"), ("upsert", "chunks"),
+            )
+        }
+        self.documents = 0
+        self.skipped = 0
+        self.failed = 0
+        self.completed = 0
+        self.elapsed = 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"📊 {self.documents} documents: {self.completed} ingested, "
+            f"{self.skipped} unchanged (skipped), {self.failed} failed in {self.elapsed:.2f}s"
+        ]
+        for stage in self.stages.values():
+            lines.append(
+                f"  {stage.name:9} {stage.items:>7} {stage.unit:6} "
+                f"{stage.throughput:>10.1f} {stage.unit}/s  busy {stage.busy_seconds:7.2f}s"
+            )
+        return "\n".join(lines)
+
+
+class IngestionPipeline:
+    """Ingest a set of local documents into one Qdrant collection and in-process index"""
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        index_name: str,
+        checkpoint_path: Optional[str] = None,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        parse_workers: Optional[int] = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        embed_concurrency: int = EMBED_CONCURRENCY,
+        queue_size: int = QUEUE_SIZE
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.index_name = index_name
+        self.checkpoint_path = checkpoint_path
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.parse_workers = parse_workers or min(MAX_PARSE_WORKERS, os.cpu_count() or 1)
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.queue_size = queue_size
+
+    # ---------- checkpoint and store ----------
+
+    def _chunking_key(self) -> List[int]:
+        """Chunking parameters recorded in the checkpoint; changing them re-chunks everything"""
+        return [self.max_tokens, self.overlap_tokens]
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        if not self.checkpoint_path:
+            return {}
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("collection") != self.collection_name or data.get("chunking") != self._chunking_key():
+            return {}
+        return data.get("documents", {})
+
+    def _save_checkpoint(self, documents: Dict[str, Dict[str, Any]]) -> None:
+        if not self.checkpoint_path:
+            return
+        data = {"collection": self.collection_name, "chunking": self._chunking_key(), "documents": documents}
+        # Every worker ingests at startup; a temp file per writer keeps their writes apart
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=os.path.dirname(self.checkpoint_path) or ".",
+            prefix=f"{os.path.basename(self.checkpoint_path)}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            try:
+                json.dump(data, f, indent=2, sort_keys=True)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _scroll_stored_points(self) -> Dict[str, List[Tuple[Dict[str, Any], List[float]]]]:
+        """All stored (payload, vector) pairs grouped by document"""
+        stored: Dict[str, List[Tuple[Dict[str, Any], List[float]]]] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                document = (point.payload or {}).get("document")
+                if document:
+                    stored.setdefault(document, []).append((point.payload, point.vector))
+            if offset is None:
+                return stored
+
+    def _delete_stale_points(self, present_documents: List[str], chunk_counts: Dict[str, int]) -> None:
+        """Drop points of documents no longer present and tails of re-chunked documents that shrank"""
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must_not=[
+                FieldCondition(key="document", match=MatchAny(any=present_documents))
+            ]))
+        )
+        for document, count in chunk_counts.items():
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(filter=Filter(must=[
+                    FieldCondition(key="document", match=MatchValue(value=document)),
+                    FieldCondition(key="chunk_index", range=Range(gte=count))
+                ]))
+            )
+
+    # ---------- run ----------
+
+    async def run(self, documents: List[Dict[str, Any]], base_dir: str, resume: bool = False) -> PipelineStats:
+        """
+        Ingest documents (as returned by get_local_documents) found under base_dir
+
+        Returns per-stage statistics. The in-process index is replaced with
+        every chunk of the corpus, including documents skipped on resume.
+        """
+        stats = PipelineStats()
+        stats.documents = len(documents)
+        run_start = time.perf_counter()
+
+        checkpoint = self._load_checkpoint() if resume else {}
+        stored: Dict[str, List[Tuple[Dict[str, Any], List[float]]]] = {}
+        if resume and checkpoint:
+            try:
+                stored = await asyncio.to_thread(self._scroll_stored_points)
+            except Exception as e:
+                logger.warning("Could not read stored chunks, re-ingesting everything", extra={"error": str(e)})
+                checkpoint = {}
+
+        parse_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        batch_queue: asyncio.Queue = asyncio.Queue(self.embed_concurrency * 2)
+        upsert_queue: asyncio.Queue = asyncio.Queue(self.embed_concurrency * 2)
+
+        # document -> {"sha256", "chunks", "remaining", "failed"} for documents in flight
+        pending: Dict[str, Dict[str, Any]] = {}
+        completed_checkpoint = dict(checkpoint)
+        present_documents: List[str] = []
+        # Chunk counts of documents re-chunked in this run
+        chunk_counts: Dict[str, int] = {}
+        # (payload, vector or None) for every chunk of the corpus
+        corpus: List[Tuple[Dict[str, Any], Optional[List[float]]]] = []
+        process_pool: Optional[ProcessPoolExecutor] = None
+        loop = asyncio.get_running_loop()
+
+        def mark_done(document: str) -> None:
+            state = pending.pop(document)
+            if state["failed"]:
+                stats.failed += 1
+                completed_checkpoint.pop(document, None)
+                return
+            stats.completed += 1
+            completed_checkpoint[document] = {"sha256": state["sha256"], "chunks": state["chunks"]}
+
+        async def discover() -> None:
+            stage = stats.stages["discover"]
+            for doc in documents:
+                start = time.perf_counter()
+                document = os.path.relpath(doc["path"], base_dir)
+                present_documents.append(document)
+                try:
+                    sha256 = await asyncio.to_thread(file_sha256, doc["path"])
+                except OSError as e:
+                    logger.warning("Error reading document", extra={"document": doc["filename"], "error": str(e)})
+                    stats.failed += 1
+                    continue
+                previous = checkpoint.get(document)
+                stored_chunks = stored.get(document, [])
+                stage.record(1, time.perf_counter() - start)
+                if previous and previous["sha256"] == sha256 and len(stored_chunks) == previous["chunks"]:
+                    stats.skipped += 1
+                    corpus.extend(sorted(stored_chunks, key=lambda item: item[0].get("chunk_index", 0)))
+                    continue
+                await parse_queue.put((doc, document, sha256))
+            for _ in range(self.parse_workers):
+                await parse_queue.put(_DONE)
+
+        async def parse_worker() -> None:
+            nonlocal process_pool
+            stage = stats.stages["parse"]
+            while (item := await parse_queue.get()) is not _DONE:
+                doc, document, sha256 = item
+                start = time.perf_counter()
+                try:
+                    if doc["type"] in PROCESS_POOL_TYPES:
+                        if process_pool is None:
+                            process_pool = ProcessPoolExecutor(
+                                max_workers=self.parse_workers,
+                                mp_context=multiprocessing.get_context("spawn")
+                            )
+                        text = await loop.run_in_executor(process_pool, parse_document, doc["path"], doc["type"])
+                    else:
+                        text = await asyncio.to_thread(parse_document, doc["path"], doc["type"])
+                except Exception as e:
+                    logger.warning("Error processing document", extra={"document": doc["filename"], "error": str(e)})
+                    stats.failed += 1
+                    continue
+                stage.record(1, time.perf_counter() - start)
+                await chunk_queue.put((doc, document, sha256, text))
+            await chunk_queue.put(_DONE)
+
+        async def chunk_stage() -> None:
+            stage = stats.stages["chunk"]
+            finished_workers = 0
+            while finished_workers < self.parse_workers:
+                item = await chunk_queue.get()
+                if item is _DONE:
+                    finished_workers += 1
+                    continue
+                doc, document, sha256, text = item
+                start = time.perf_counter()
+                chunks = split_into_chunks(text, self.max_tokens, self.overlap_tokens)
+                stage.record(len(chunks), time.perf_counter() - start)
+                logger.info("Processing document", extra={"document": doc["filename"], "chunks": len(chunks)})
+
+                chunk_counts[document] = len(chunks)
+                pending[document] = {"sha256": sha256, "chunks": len(chunks), "remaining": len(chunks), "failed": False}
+                if not chunks:
+                    mark_done(document)
+                    continue
+                for chunk_index, chunk in enumerate(chunks):
+                    await embed_queue.put({
+                        "text": chunk["text"],
+                        "section": chunk.get("section", "Unknown"),
+                        "chunk_index": chunk_index,
+                        "source": doc["filename"],
+                        "document": document,
+                        "category": doc.get("category", "general"),
+                        "file_type": doc["type"]
+                    })
+            await embed_queue.put(_DONE)
+
+        async def batcher() -> None:
+            batch: List[Dict[str, Any]] = []
+            while True:
+                try:
+                    item = await asyncio.wait_for(embed_queue.get(), EMBED_BATCH_MAX_WAIT_SECONDS if batch else None)
+                except asyncio.TimeoutError:
+                    await batch_queue.put(batch)
+                    batch = []
+                    continue
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= self.embed_batch_size:
+                    await batch_queue.put(batch)
+                    batch = []
+            if batch:
+                await batch_queue.put(batch)
+            for _ in range(self.embed_concurrency):
+                await batch_queue.put(_DONE)
+
+        async def embed_worker() -> None:
+            stage = stats.stages["embed"]
+            while (batch := await batch_queue.get()) is not _DONE:
+                start = time.perf_counter()
+                try:
+                    vectors = await get_embeddings([payload["text"] for payload in batch])
+                except Exception as e:
+                    logger.warning("Error embedding chunks", extra={"chunks": len(batch), "error": str(e)})
+                    vectors = [None] * len(batch)
+                stage.record(len(batch), time.perf_counter() - start)
+                await upsert_queue.put(list(zip(batch, vectors)))
+            await upsert_queue.put(_DONE)
+
+        async def upsert_stage() -> None:
+            stage = stats.stages["upsert"]
+            finished_workers = 0
+            while finished_workers < self.embed_concurrency:
+                batch = await upsert_queue.get()
+                if batch is _DONE:
+                    finished_workers += 1
+                    continue
+                corpus.extend(batch)
+                points = [
+                    PointStruct(id=point_id(payload["document"], payload["chunk_index"]), vector=vector, payload=payload)
+                    for payload, vector in batch if vector is not None
+                ]
+                stored_ok = len(points) == len(batch)
+                if points:
+                    start = time.perf_counter()
+                    try:
+                        await asyncio.to_thread(
+                            self.client.upsert, collection_name=self.collection_name, points=points
+                        )
+                        stage.record(len(points), time.perf_counter() - start)
+                    except Exception as e:
+                        logger.warning("Error upserting chunks", extra={"chunks": len(points), "error": str(e)})
+                        stored_ok = False
+
+                finished_documents = []
+                for payload, vector in batch:
+                    state = pending[payload["document"]]
+                    state["remaining"] -= 1
+                    state["failed"] = state["failed"] or not stored_ok
+                    if state["remaining"] == 0:
+                        finished_documents.append(payload["document"])
+                for document in finished_documents:
+                    mark_done(document)
+                if finished_documents:
+                    await asyncio.to_thread(self._save_checkpoint, dict(completed_checkpoint))
+
+        tasks = [
+            asyncio.create_task(stage_coroutine) for stage_coroutine in (
+                discover(),
+                *(parse_worker() for _ in range(self.parse_workers)),
+                chunk_stage(),
+                batcher(),
+                *(embed_worker() for _ in range(self.embed_concurrency)),
+                upsert_stage()
+            )
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed stage stops feeding its queue, so the others would wait forever; cancel them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown(wait=False, cancel_futures=True)
+
+        # Forget documents that disappeared, and prune their stored points
+        for document in set(completed_checkpoint) - set(present_documents):
+            completed_checkpoint.pop(document)
+        await asyncio.to_thread(self._save_checkpoint, completed_checkpoint)
+        if present_documents:
+            try:
+                await asyncio.to_thread(self._delete_stale_points, present_documents, chunk_counts)
+            except Exception as e:
+                logger.warning("Could not prune stale chunks", extra={"error": str(e)})
+
+        if corpus:
+            payloads = [payload for payload, _ in corpus]
+            vectors = [vector for _, vector in corpus]
+            # Exact vector search needs every chunk embedded; otherwise stay keyword-only
+            embeddings = vectors if all(vector is not None for vector in vectors) else None
+            set_local_index(self.index_name, HybridIndex(payloads, [payload["text"] for payload in payloads], embeddings))
+
+        stats.elapsed = time.perf_counter() - run_start
+        return stats
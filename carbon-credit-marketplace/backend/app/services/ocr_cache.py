@@ -0,0 +1,154 @@
+"""
+Content-addressed cache for OCR results
+
+Results are keyed by (sha256(image bytes), document_type, prompt version),
+held in a small in-process LRU and persisted in Postgres so re-uploads of
+the same PAN card or certificate skip the vision API entirely.
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy import select, and_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import OCRCacheEntry
+from app.services.document_ocr import extract_text_and_structured_data, ImageBuffer, OCR_PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_TTL = timedelta(days=30)
+OCR_MEMORY_CACHE_SIZE = 1024
+OCR_MEMORY_CACHE_TTL_SECONDS = 3600
+
+CacheKey = Tuple[str, str, str]
+
+# In-process LRU: key -> (expires_at monotonic, result)
+_memory_cache: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def compute_content_hash(data: ImageBuffer) -> str:
+    """Compute the sha256 hex digest of file contents"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _memory_get(key: CacheKey) -> Optional[Dict[str, Any]]:
+    entry = _memory_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, result = entry
+    if expires_at < time.monotonic():
+        del _memory_cache[key]
+        return None
+    _memory_cache.move_to_end(key)
+    return result
+
+
+def _memory_set(key: CacheKey, result: Dict[str, Any]) -> None:
+    _memory_cache[key] = (time.monotonic() + OCR_MEMORY_CACHE_TTL_SECONDS, result)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > OCR_MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+
+async def get_cached_ocr_result(
+    db: AsyncSession,
+    content_hash: str,
+    document_type: str
+) -> Optional[Dict[str, Any]]:
+    """Look up a cached OCR result in memory, then in Postgres"""
+    key = (content_hash, document_type, OCR_PROMPT_VERSION)
+    result = _memory_get(key)
+    if result is not None:
+        return result
+
+    row = (await db.execute(
+        select(OCRCacheEntry.id, OCRCacheEntry.result).where(
+            and_(
+                OCRCacheEntry.content_hash == content_hash,
+                OCRCacheEntry.document_type == document_type,
+                OCRCacheEntry.prompt_version == OCR_PROMPT_VERSION,
+                OCRCacheEntry.expires_at > datetime.now(timezone.utc)
+            )
+        )
+    )).first()
+    if row is None:
+        return None
+
+    entry_id, result = row
+    await db.execute(
+        update(OCRCacheEntry)
+        .where(OCRCacheEntry.id == entry_id)
+        .values(hit_count=OCRCacheEntry.hit_count + 1)
+    )
+    await db.commit()
+
+    _memory_set(key, result)
+    return result
+
+
+async def store_ocr_result(
+    db: AsyncSession,
+    content_hash: str,
+    document_type: str,
+    result: Dict[str, Any]
+) -> None:
+    """Persist an OCR result, replacing any stale entry for the same key"""
+    expires_at = datetime.now(timezone.utc) + OCR_CACHE_TTL
+    statement = insert(OCRCacheEntry).values(
+        content_hash=content_hash,
+        document_type=document_type,
+        prompt_version=OCR_PROMPT_VERSION,
+        result=result,
+        hit_count=0,
+        expires_at=expires_at
+    ).on_conflict_do_update(
+        index_elements=["content_hash", "document_type", "prompt_version"],
+        set_={"result": result, "expires_at": expires_at}
+    )
+    await db.execute(statement)
+    await db.commit()
+
+    _memory_set((content_hash, document_type, OCR_PROMPT_VERSION), result)
+
+
+async def extract_with_cache(
+    db: AsyncSession,
+    image_bytes: ImageBuffer,
+    document_type: str,
+    mime_type: str,
+    content_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Extract text and structured data, serving repeated images from the cache
+
+    Returns:
+        Dictionary with 'raw_text', 'extracted_data', 'confidence',
+        'content_hash' and 'cached' keys
+    """
+    if content_hash is None:
+        content_hash = compute_content_hash(image_bytes)
+
+    result = await get_cached_ocr_result(db, content_hash, document_type)
+    cached = result is not None
+
+    if not cached:
+        # End the lookup's transaction so the pooled connection is not held
+        # idle-in-transaction for the whole vision call
+        await db.commit()
+        result = await extract_text_and_structured_data(
+            image_bytes=image_bytes,
+            document_type=document_type,
+            mime_type=mime_type
+        )
+        try:
+            await store_ocr_result(db, content_hash, document_type, result)
+        except Exception as e:
+            # A failed cache write should not fail the OCR request
+            await db.rollback()
+            logger.warning("Error caching OCR result", extra={"error": str(e)})
+
+    return {**result, "content_hash": content_hash, "cached": cached}
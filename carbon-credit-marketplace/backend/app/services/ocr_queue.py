@@ -0,0 +1,299 @@
+"""
+Asynchronous OCR job queue
+
+Bulk uploads are written to disk and recorded as Document rows with
+ocr_status='pending'; the document id is the job id. A pool of worker tasks
+drains an in-process queue of candidate ids. A worker runs a job only after
+claiming its row in Postgres, which marks it 'processing' under a lease and
+caps the number of live leases across all worker processes, so every job runs
+once and the vision API sees a global concurrency limit. A claim whose worker
+died expires after OCR_JOB_STALE_AFTER and is picked up by the periodic
+recovery sweep. Vision calls go through the LLM gateway, which is the only
+layer retrying rate limits; a job whose call still fails is retried as a
+whole, up to OCR_JOB_MAX_ATTEMPTS. Results are written to
+Document.extracted_data.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Any, Iterable, Optional, Set
+from uuid import UUID
+from sqlalchemy import select, and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.models import Document
+from app.services.document_ocr import ImageBuffer
+from app.services.ocr_cache import extract_with_cache
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+OCR_JOB_MAX_ATTEMPTS = 3
+# A processing claim whose worker died is picked up again after this long
+OCR_JOB_STALE_AFTER = timedelta(minutes=10)
+OCR_RECOVERY_INTERVAL_SECONDS = 60
+# How long a worker waits before retrying a claim refused by the global cap
+OCR_CAPACITY_RETRY_SECONDS = 0.5
+# pg_advisory_xact_lock key serializing claims, so the live-lease count is exact
+OCR_CLAIM_LOCK_KEY = 0x4F435201
+
+# Extraction function signature: (db, image_bytes, document_type, mime_type, content_hash) -> result
+ExtractFn = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+def get_upload_path(content_hash: str) -> str:
+    """Content-addressed location of an uploaded file"""
+    return os.path.join(settings.UPLOAD_DIR, content_hash[:2], content_hash)
+
+
+def _write_file(path: str, data: ImageBuffer) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        return  # Same hash, same bytes
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def save_upload(content_hash: str, data: ImageBuffer) -> str:
+    """Write upload bytes to content-addressed storage off the event loop"""
+    path = get_upload_path(content_hash)
+    await asyncio.to_thread(_write_file, path, data)
+    return path
+
+
+async def hash_stored_upload(file_url: str) -> Optional[str]:
+    """
+    sha256 of a file in upload storage, read from disk
+
+    Returns None for anything outside UPLOAD_DIR (external URLs, other
+    paths) or missing, so callers never trust a hash they did not compute.
+    """
+    upload_dir = os.path.realpath(settings.UPLOAD_DIR)
+    path = os.path.realpath(file_url)
+    if os.path.commonpath([upload_dir, path]) != upload_dir or not os.path.isfile(path):
+        return None
+    return await asyncio.to_thread(_hash_file, path)
+
+
+class OCRCapacityReached(Exception):
+    """Raised by claim_ocr_job when the global number of running OCR jobs is at the limit"""
+
+
+def _claimable(now: datetime):
+    return or_(
+        Document.ocr_status == "pending",
+        and_(
+            Document.ocr_status == "processing",
+            or_(Document.ocr_locked_at.is_(None), Document.ocr_locked_at < now - OCR_JOB_STALE_AFTER)
+        )
+    )
+
+
+async def claim_ocr_job(db: AsyncSession, document_id: UUID, limit: int) -> Optional[Document]:
+    """
+    Claim a pending (or abandoned) OCR job and mark it processing
+
+    Claims are serialized with a transaction-scoped advisory lock and refused
+    with OCRCapacityReached while `limit` unexpired claims exist, so the
+    limit holds across every worker process sharing the database. The row
+    itself is locked with SELECT ... FOR UPDATE SKIP LOCKED, as for fraud
+    jobs. Returns None if the job is done, failed or claimed elsewhere.
+    """
+    now = datetime.now(timezone.utc)
+    await db.execute(select(func.pg_advisory_xact_lock(OCR_CLAIM_LOCK_KEY)))
+
+    result = await db.execute(
+        select(Document).where(Document.id == document_id, _claimable(now)).with_for_update(skip_locked=True)
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        await db.rollback()
+        return None
+
+    running = await db.scalar(
+        select(func.count()).select_from(Document).where(
+            Document.ocr_status == "processing",
+            Document.ocr_locked_at >= now - OCR_JOB_STALE_AFTER
+        )
+    )
+    if running >= limit:
+        await db.rollback()
+        raise OCRCapacityReached(f"{running} OCR jobs running")
+
+    document.ocr_status = "processing"
+    document.ocr_attempts = (document.ocr_attempts or 0) + 1
+    document.ocr_locked_at = now
+    await db.commit()
+    return document
+
+
+class OCRWorkerPool:
+    """
+    Fixed-size pool of OCR workers
+
+    `concurrency` is both the number of workers and the global limit on
+    running jobs passed to claim_ocr_job.
+    """
+
+    def __init__(self, concurrency: int, extract_fn: ExtractFn = extract_with_cache):
+        self.concurrency = concurrency
+        self.extract_fn = extract_fn
+        self.queue: "asyncio.Queue[UUID]" = asyncio.Queue()
+        self.queued: Set[UUID] = set()
+        self.workers: list = []
+        self.completed = 0
+        self.failed = 0
+        self._updated = asyncio.Condition()
+
+    def start(self) -> None:
+        if self.workers:
+            return
+        self.workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.concurrency)
+        ]
+        self.workers.append(asyncio.create_task(self._recovery_sweeper()))
+
+    async def stop(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def enqueue(self, document_ids: Iterable[UUID]) -> None:
+        for document_id in document_ids:
+            # Recovery sweeps re-find queued jobs; keep one entry per job
+            if document_id not in self.queued:
+                self.queued.add(document_id)
+                self.queue.put_nowait(document_id)
+
+    async def wait_for_update(self, timeout: float) -> None:
+        """Block until any job finishes in this process, or the timeout expires"""
+        async with self._updated:
+            try:
+                await asyncio.wait_for(self._updated.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _notify(self) -> None:
+        async with self._updated:
+            self._updated.notify_all()
+
+    async def _worker(self, worker_index: int) -> None:
+        while True:
+            document_id = await self.queue.get()
+            self.queued.discard(document_id)
+            try:
+                await self.process(document_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("OCR worker error", extra={"worker": worker_index, "document_id": str(document_id), "error": str(e)})
+            finally:
+                self.queue.task_done()
+
+    async def _recovery_sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(OCR_RECOVERY_INTERVAL_SECONDS)
+            try:
+                await self.recover_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("OCR recovery sweep failed", extra={"error": str(e)})
+
+    async def _claim(self, db: AsyncSession, document_id: UUID) -> Optional[Document]:
+        """Claim the job, waiting while the global limit is reached"""
+        while True:
+            try:
+                return await claim_ocr_job(db, document_id, self.concurrency)
+            except OCRCapacityReached:
+                await asyncio.sleep(OCR_CAPACITY_RETRY_SECONDS * random.uniform(1.0, 2.0))
+
+    async def process(self, document_id: UUID) -> None:
+        """Run OCR for one document and record the outcome on its row"""
+        async with AsyncSessionLocal() as db:
+            document = await self._claim(db, document_id)
+            if not document:
+                return
+
+            try:
+                image_bytes = await asyncio.to_thread(_read_file, document.file_url)
+                document_type = document.document_type
+                mime_type = document.mime_type or "image/png"
+                content_hash = document.content_hash
+                result = await self.extract_fn(
+                    db,
+                    image_bytes=image_bytes,
+                    document_type=document_type,
+                    mime_type=mime_type,
+                    content_hash=content_hash
+                )
+            except Exception as e:
+                await db.rollback()
+                document = await db.get(Document, document_id)
+                document.ocr_error = str(e)
+                document.ocr_locked_at = None
+                if document.ocr_attempts >= OCR_JOB_MAX_ATTEMPTS:
+                    document.ocr_status = "failed"
+                    self.failed += 1
+                else:
+                    document.ocr_status = "pending"
+                await db.commit()
+                if document.ocr_status == "pending":
+                    self.enqueue([document_id])
+                await self._notify()
+                return
+
+            document.extracted_data = {
+                "raw_text": result["raw_text"],
+                "extracted_data": result["extracted_data"],
+                "confidence": result["confidence"]
+            }
+            document.ocr_status = "completed"
+            document.ocr_error = None
+            document.ocr_locked_at = None
+            document.ocr_completed_at = datetime.now(timezone.utc)
+            await db.commit()
+            self.completed += 1
+            await self._notify()
+
+    async def recover_pending(self) -> int:
+        """Enqueue pending jobs and jobs whose processing claim has expired"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Document.id).where(_claimable(datetime.now(timezone.utc)))
+            )
+            document_ids = [row[0] for row in result.all()]
+        self.enqueue(document_ids)
+        return len(document_ids)
+
+
+ocr_worker_pool: Optional[OCRWorkerPool] = None
+
+
+def get_ocr_worker_pool() -> OCRWorkerPool:
+    """Get the process-wide OCR worker pool, creating it on first use"""
+    global ocr_worker_pool
+    if ocr_worker_pool is None:
+        ocr_worker_pool = OCRWorkerPool(settings.OCR_MAX_CONCURRENCY)
+    return ocr_worker_pool
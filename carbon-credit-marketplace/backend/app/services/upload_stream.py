@@ -0,0 +1,348 @@
+"""
+Streaming multipart upload handling
+
+Parses multipart/form-data straight from the request body instead of
+letting the framework buffer every file first. Size limits and image MIME
+sniffing are enforced while chunks arrive, the sha256 content hash is
+computed incrementally, and file data is spooled to memory (small files) or
+a temp file (large files). Consumers get a zero-copy memoryview of the data.
+"""
+import asyncio
+import hashlib
+import io
+import mmap
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Files up to this size stay in memory; larger ones roll over to a temp file
+UPLOAD_SPOOL_MAX_MEMORY = 1024 * 1024
+# Allowance for multipart boundaries and part headers in body size checks
+MULTIPART_OVERHEAD_PER_FILE = 16 * 1024
+# Largest non-file form field; also the body allowance for fields
+MULTIPART_MAX_FIELD_SIZE = 64 * 1024
+# Bytes needed to recognise every supported image signature
+SNIFF_BYTES = 12
+
+
+def sniff_image_mime(header: bytes) -> Optional[str]:
+    """Detect an image MIME type from its leading bytes"""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class StreamedUpload:
+    """A file received from a streamed multipart body"""
+
+    def __init__(self, field_name: str, filename: str, declared_content_type: str):
+        self.field_name = field_name
+        self.filename = filename
+        self.declared_content_type = declared_content_type
+        self.content_type: Optional[str] = None  # Sniffed from the file's bytes
+        self.size = 0
+        # BytesIO until the file passes UPLOAD_SPOOL_MAX_MEMORY, then an anonymous temp file
+        self.file: Any = io.BytesIO()
+        self._hasher = hashlib.sha256()
+        self._header = b""
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    @property
+    def content_hash(self) -> str:
+        return self._hasher.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return isinstance(self.file, io.BytesIO)
+
+    def write(self, chunk: bytes) -> None:
+        """Append to the file, moving it to disk once it outgrows the memory spool"""
+        if self.in_memory and self.file.tell() + len(chunk) > UPLOAD_SPOOL_MAX_MEMORY:
+            rolled = tempfile.TemporaryFile()
+            with self.file.getbuffer() as view:
+                rolled.write(view)
+            self.file.close()
+            self.file = rolled
+        self.file.write(chunk)
+
+    def getbuffer(self) -> memoryview:
+        """
+        Zero-copy view of the file contents
+
+        In-memory files expose the BytesIO buffer; rolled-over files are
+        memory-mapped. The view is released by close().
+        """
+        if self._view is None:
+            if self.in_memory:
+                self._view = self.file.getbuffer()
+            elif self.size == 0:
+                self._view = memoryview(b"")
+            else:
+                self.file.flush()
+                self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+        return self._view
+
+    def close(self) -> None:
+        try:
+            if self._view is not None:
+                self._view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # A consumer still holds a slice of the buffer; it is freed with them
+            pass
+        finally:
+            try:
+                self.file.close()
+            except BufferError:
+                pass  # Same for an in-memory file whose buffer is still sliced
+            self._view = None
+            self._mmap = None
+
+
+class MultipartUploadStream:
+    """Incremental multipart parser with per-file limits"""
+
+    def __init__(
+        self,
+        max_file_size: int,
+        max_files: int,
+        allowed_mime_prefix: Optional[str] = "image/"
+    ):
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.allowed_mime_prefix = allowed_mime_prefix
+        self.files: List[StreamedUpload] = []
+        self.fields: Dict[str, str] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._part_headers: Dict[bytes, bytes] = {}
+        self._current_file: Optional[StreamedUpload] = None
+        self._current_field: Optional[str] = None
+        self._field_data = bytearray()
+        self._pending_writes: List[Tuple[StreamedUpload, bytes]] = []
+
+    # ---- parser callbacks (synchronous; file writes are deferred) ----
+
+    def on_part_begin(self) -> None:
+        self._part_headers = {}
+        self._current_file = None
+        self._current_field = None
+        self._field_data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._part_headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._part_headers.get(b"content-disposition", b""))
+        field_name = options.get(b"name", b"").decode("utf-8", errors="replace")
+
+        if b"filename" not in options:
+            self._current_field = field_name
+            return
+
+        if len(self.files) >= self.max_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many files. Maximum number of files is {self.max_files}"
+            )
+
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        declared_type = self._part_headers.get(b"content-type", b"").decode("latin-1")
+        if self.allowed_mime_prefix and not declared_type.startswith(self.allowed_mime_prefix):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Only image files are supported for OCR: {filename}"
+            )
+
+        self._current_file = StreamedUpload(field_name, filename, declared_type)
+        self.files.append(self._current_file)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        if self._current_file is None:
+            if len(self._field_data) + len(chunk) > MULTIPART_MAX_FIELD_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Form field exceeds {MULTIPART_MAX_FIELD_SIZE // 1024}KB limit"
+                )
+            self._field_data += chunk
+            return
+
+        upload = self._current_file
+        upload.size += len(chunk)
+        if upload.size > self.max_file_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File size exceeds {self.max_file_size // (1024 * 1024)}MB limit: {upload.filename}"
+            )
+
+        if upload.content_type is None:
+            upload._header += chunk[:SNIFF_BYTES]
+            if len(upload._header) >= SNIFF_BYTES:
+                self._sniff(upload)
+
+        upload._hasher.update(chunk)
+        self._pending_writes.append((upload, chunk))
+
+    def on_part_end(self) -> None:
+        if self._current_file is not None:
+            if self._current_file.content_type is None:
+                self._sniff(self._current_file)
+        elif self._current_field is not None:
+            self.fields[self._current_field] = self._field_data.decode("utf-8", errors="replace")
+
+    def _sniff(self, upload: StreamedUpload) -> None:
+        sniffed = sniff_image_mime(upload._header)
+        if self.allowed_mime_prefix and (sniffed is None or not sniffed.startswith(self.allowed_mime_prefix)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File content is not a supported image (PNG, JPEG, GIF or WebP): {upload.filename}"
+            )
+        upload.content_type = sniffed or upload.declared_content_type
+
+    # ---- driver ----
+
+    async def _flush_writes(self) -> None:
+        for upload, chunk in self._pending_writes:
+            if upload.in_memory and upload.file.tell() + len(chunk) <= UPLOAD_SPOOL_MAX_MEMORY:
+                upload.write(chunk)
+            else:
+                # Disk-backed writes (and the rollover to disk) run off the event loop
+                await asyncio.to_thread(upload.write, chunk)
+        self._pending_writes = []
+
+    async def parse(self, request: Request) -> Tuple[List[StreamedUpload], Dict[str, str]]:
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a multipart/form-data request"
+            )
+
+        # Reject oversized bodies before reading anything; the streamed byte count
+        # below covers chunked requests, which have no Content-Length
+        content_length = request.headers.get("content-length")
+        max_body = self.max_files * (self.max_file_size + MULTIPART_OVERHEAD_PER_FILE) + MULTIPART_MAX_FIELD_SIZE
+        too_large = HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds {self.max_file_size // (1024 * 1024)}MB limit"
+        )
+        if content_length and content_length.isdigit() and int(content_length) > max_body:
+            raise too_large
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+        received = 0
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_body:
+                    raise too_large
+                parser.write(chunk)
+                await self._flush_writes()
+            parser.finalize()
+        except Exception:
+            for upload in self.files:
+                upload.close()
+            raise
+
+        for upload in self.files:
+            upload.file.seek(0)
+        return self.files, self.fields
+
+
+def multipart_upload_openapi(multiple: bool, field_name: str = "file") -> Dict[str, Any]:
+    """
+    OpenAPI request body for endpoints that parse multipart uploads themselves
+
+    Those endpoints take the raw Request, so FastAPI cannot infer the body.
+    """
+    file_schema: Dict[str, Any] = {"type": "string", "format": "binary"}
+    if multiple:
+        field_name = "files"
+        file_schema = {"type": "array", "items": file_schema}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [field_name],
+                        "properties": {field_name: file_schema}
+                    }
+                }
+            }
+        }
+    }
+
+
+async def read_body_limited(request: Request, max_size: int) -> memoryview:
+    """
+    Read a raw request body, failing with 413 as soon as it passes max_size
+
+    Returns a view of the receive buffer rather than a bytes copy of it.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds {max_size // (1024 * 1024)}MB limit"
+        )
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request body exceeds {max_size // (1024 * 1024)}MB limit"
+            )
+    return memoryview(body)
+
+
+async def stream_multipart_uploads(
+    request: Request,
+    max_file_size: int,
+    max_files: int = 1,
+    allowed_mime_prefix: Optional[str] = "image/"
+) -> Tuple[List[StreamedUpload], Dict[str, str]]:
+    """
+    Receive files from a multipart request without buffering them up front
+
+    Raises HTTPException (413) as soon as any file passes max_file_size, and
+    (400) when a file's declared or sniffed type is not allowed.
+
+    Returns:
+        Tuple of (uploaded files, plain form fields). Callers must close()
+        each upload when done.
+    """
+    stream = MultipartUploadStream(max_file_size, max_files, allowed_mime_prefix)
+    return await stream.parse(request)
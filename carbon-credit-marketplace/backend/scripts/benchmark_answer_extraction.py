@@ -0,0 +1,151 @@
+"""
+Measure how many calculator chat turns avoid an LLM call
+
+Runs a corpus of real-style questionnaire replies through the previous
+regex/substring extraction and through app.agents.answer_extraction, and
+reports for each the fraction answered locally (no LLM call) and the
+fraction answered correctly. Replies that no parser should answer ("not
+sure, will check") count as correct when left to the LLM.
+
+Usage:
+    python scripts/benchmark_answer_extraction.py
+"""
+import os
+import re
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.answer_extraction import parse_answer
+from app.data.emission_factors import QUESTIONNAIRES
+
+
+def question(sector: str, question_id: str) -> dict:
+    return next(q for q in QUESTIONNAIRES[sector] if q["id"] == question_id)
+
+
+CLINKER = question("cement", "clinker_production")
+ELECTRICITY = question("cement", "electricity")
+DIESEL = question("cement", "fuel_diesel")
+GAS = question("fertilizer", "fuel_natural_gas")
+WATER = question("pulp_paper", "water_treatment")
+ROUTE = question("iron_steel", "production_method")
+
+# (sector, question, reply, expected answer or None when only a human/LLM could tell)
+CORPUS = [
+    ("cement", CLINKER, "250000", 250000),
+    ("cement", CLINKER, "2,50,000", 250000),
+    ("cement", CLINKER, "1,20,000 tonnes", 120000),
+    ("cement", CLINKER, "2.5 lakh tonnes", 250000),
+    ("cement", CLINKER, "around 2.5 lakh tonnes last year", 250000),
+    ("cement", CLINKER, "approx 3 lakhs", 300000),
+    ("cement", CLINKER, "1.2 million tonnes", 1200000),
+    ("cement", CLINKER, "1.2 MTPA", 1200000),
+    ("cement", CLINKER, "we made 450 kt of clinker", 450000),
+    ("cement", CLINKER, "In FY 2023 we produced 3.2 lakh t", 320000),
+    ("cement", CLINKER, "In 2023 we produced 320000 tonnes", 320000),
+    ("cement", CLINKER, "500000 kg", 500),
+    ("cement", CLINKER, "about 80k tonnes", 80000),
+    ("cement", CLINKER, "1 crore kg", 10000),
+    ("cement", CLINKER, "Clinker output was 95,000 t", 95000),
+    ("cement", CLINKER, "not sure, I will check with the plant", None),
+    ("cement", CLINKER, "roughly a quarter million tonnes", None),
+    ("cement", ELECTRICITY, "3k MWh", 3000),
+    ("cement", ELECTRICITY, "45000 MWh", 45000),
+    ("cement", ELECTRICITY, "45,000", 45000),
+    ("cement", ELECTRICITY, "4.5 crore units", 45000),
+    ("cement", ELECTRICITY, "12 GWh", 12000),
+    ("cement", ELECTRICITY, "18,50,000 kWh", 1850),
+    ("cement", ELECTRICITY, "approximately 52000 mwh per year", 52000),
+    ("cement", ELECTRICITY, "We consume about 60 GWh annually", 60000),
+    ("cement", ELECTRICITY, "our grid share is 80% of 50,000 MWh", 50000),
+    ("cement", ELECTRICITY, "between 40000 and 45000", None),
+    ("cement", DIESEL, "1200 kl", 1200),
+    ("cement", DIESEL, "12 lakh litres", 1200),
+    ("cement", DIESEL, "850", 850),
+    ("cement", DIESEL, "approx 900 kilolitres", 900),
+    ("cement", DIESEL, "5,00,000 L", 500),
+    ("cement", DIESEL, "none, we don't use diesel", None),
+    ("fertilizer", GAS, "35000", 35000),
+    ("fertilizer", GAS, "35 million m3", 35000),
+    ("fertilizer", GAS, "35 MMSCM", 35000),
+    ("fertilizer", GAS, "3.5 crore scm", 35000),
+    ("pulp_paper", WATER, "2 lakh m3", 200000),
+    ("pulp_paper", WATER, "150000 cubic meters", 150000),
+    ("pulp_paper", WATER, "1.5 lakh", 150000),
+    ("iron_steel", ROUTE, "Blast Furnace", "Blast Furnace"),
+    ("iron_steel", ROUTE, "blast furnace", "Blast Furnace"),
+    ("iron_steel", ROUTE, "BF", "Blast Furnace"),
+    ("iron_steel", ROUTE, "bf-bof route", "Blast Furnace"),
+    ("iron_steel", ROUTE, "We use EAF", "Electric Arc Furnace"),
+    ("iron_steel", ROUTE, "electric arc", "Electric Arc Furnace"),
+    ("iron_steel", ROUTE, "electrc arc furnance", "Electric Arc Furnace"),
+    ("iron_steel", ROUTE, "mostly the blast route", "Blast Furnace"),
+    ("iron_steel", ROUTE, "both", "Both"),
+    ("iron_steel", ROUTE, "we run both routes", "Both"),
+    ("iron_steel", ROUTE, "the arc furnace one", "Electric Arc Furnace"),
+    ("iron_steel", ROUTE, "induction furnace", None),
+    ("iron_steel", ROUTE, "furnace", None),
+]
+
+
+def legacy_parse(current_question: dict, message: str):
+    """The extraction that ran before the LLM fallback previously"""
+    if current_question["type"] == "number":
+        numbers = re.findall(r'\d+\.?\d*', message.replace(',', ''))
+        if numbers:
+            value = float(numbers[0])
+            if value > 0:
+                return value
+        return None
+
+    options = current_question.get("options", [])
+    message_lower = message.lower().strip()
+    for option in options:
+        if option.lower() == message_lower:
+            return option
+        if option.lower() in message_lower or message_lower in option.lower():
+            return option
+    for option in options:
+        option_words = option.lower().split()
+        if any(word in message_lower for word in option_words if len(word) > 3):
+            return option
+    return None
+
+
+def evaluate(label: str, parse) -> None:
+    local = correct = wrong_local = 0
+    start = time.perf_counter()
+    for sector, current_question, message, expected in CORPUS:
+        answer = parse(sector, current_question, message)
+        if answer is not None:
+            local += 1
+            if answer == expected:
+                correct += 1
+            else:
+                wrong_local += 1
+        elif expected is None:
+            correct += 1  # Correctly left to the LLM
+    elapsed_us = (time.perf_counter() - start) * 1e6 / len(CORPUS)
+    total = len(CORPUS)
+    print(
+        f"  {label:10} no-LLM turns {local / total:6.1%}   correct {correct / total:6.1%}   "
+        f"wrong local answers {wrong_local:3}   {elapsed_us:6.1f} µs/turn"
+    )
+
+
+def main():
+    print(f"🚀 {len(CORPUS)} replies ({sum(expected is None for *_, expected in CORPUS)} need a human or LLM)")
+    evaluate("legacy", lambda sector, q, message: legacy_parse(q, message))
+    evaluate("local", parse_answer)
+
+    for sector, current_question, message, expected in CORPUS:
+        answer = parse_answer(sector, current_question, message)
+        if answer is not None and answer != expected:
+            print(f"  ❌ {message!r}: got {answer!r}, expected {expected!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the vectorized batch emissions calculator
+
+Generates synthetic facility answers across all sectors, then times CSV
+parsing, the NumPy calculation and result formatting. The scalar
+calculate_emissions() loop is timed on a sample and extrapolated, and
+results for the sample are checked for exact agreement.
+
+Usage:
+    python scripts/benchmark_batch_calculator.py [--rows 1000000] [--sample 50000]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.agents.calculator_agent import calculate_emissions
+from app.data.emission_factors import EMISSION_FACTORS, QUESTIONNAIRES
+from app.services.emissions_batch import calculate_batch, parse_batch_input, iter_batch_results
+
+
+def generate_columns(rows: int, seed: int = 42) -> dict:
+    """Synthetic facility answers as column arrays"""
+    rng = np.random.default_rng(seed)
+    sectors = np.array(list(EMISSION_FACTORS))
+    answer_keys = sorted({q["id"] for questions in QUESTIONNAIRES.values() for q in questions if q["type"] == "number"})
+
+    columns = {
+        "facility_id": np.char.add("PLANT-", np.arange(rows).astype(str)),
+        "sector": sectors[rng.integers(0, len(sectors), rows)],
+        "production_method": np.array(["Blast Furnace", "Electric Arc Furnace", "Both"])[rng.integers(0, 3, rows)],
+    }
+    for key in answer_keys:
+        columns[key] = np.round(rng.uniform(0, 100000, rows), 2)
+    return columns
+
+
+def to_csv(columns: dict) -> bytes:
+    names = list(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    writer.writerows(zip(*(columns[name].tolist() for name in names)))
+    return buffer.getvalue().encode("utf-8")
+
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:28} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=50_000, help="Rows to run through the scalar calculator")
+    args = parser.parse_args()
+
+    print(f"🚀 Generating {args.rows:,} facilities")
+    columns = generate_columns(args.rows)
+    data = to_csv(columns)
+    print(f"  CSV size: {len(data) / 1024 / 1024:.1f} MB")
+
+    print("⏱️  Vectorized")
+    parsed, parse_time = timed("parse CSV", parse_batch_input, data, "csv")
+    result, calc_time = timed("calculate", calculate_batch, parsed)
+    output, format_time = timed("format NDJSON", lambda: sum(len(chunk) for chunk in iter_batch_results(result)))
+    total = parse_time + calc_time + format_time
+    print(f"  {'total':28} {total:8.3f}s  ({args.rows / total:,.0f} rows/s)")
+
+    sample = min(args.sample, args.rows)
+    records = [
+        {name: values[i].item() for name, values in columns.items()}
+        for i in range(sample)
+    ]
+    print(f"⏱️  Scalar calculate_emissions on {sample:,} rows")
+    start = time.perf_counter()
+    expected = [calculate_emissions(record["sector"], record) for record in records]
+    scalar_time = time.perf_counter() - start
+    extrapolated = scalar_time * args.rows / sample
+    print(f"  {'calculate':28} {scalar_time:8.3f}s  (~{extrapolated:.1f}s for {args.rows:,} rows)")
+    print(f"🏁 Calculation speedup: {extrapolated / calc_time:.0f}x")
+
+    mismatches = 0
+    lines = "".join(iter_batch_results(calculate_batch(
+        {name: values[:sample] for name, values in parsed.items()}
+    ))).splitlines()
+    for line, scalar in zip(lines, expected):
+        row = json.loads(line)
+        if any(row[key] != scalar[key] for key in (
+            "scope1_emissions", "scope2_emissions", "scope3_emissions",
+            "total_emissions", "credits_needed", "cost_estimate"
+        )):
+            mismatches += 1
+    print(f"{'✅' if mismatches == 0 else '❌'} {mismatches} mismatches against the scalar calculator")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark the token-aware chunker against the previous word-count chunker
+
+Builds a synthetic regulatory corpus by repeating the education and
+formalities documents up to --mb megabytes, chunks it with both chunkers,
+and reports throughput (MB/min), chunk counts and the token size of the
+chunks against the budget.
+
+Token counts use tiktoken's cl100k_base when its encoding can be loaded,
+otherwise the character estimate from app.core.tokens; the mode is printed.
+
+Usage:
+    python scripts/benchmark_chunking.py [--mb 50] [--max-tokens 400] [--overlap 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.agents.formalities_qdrant import get_formalities_documents_dir
+from app.core.tokens import count_tokens_batch, get_encoding
+from app.services.chunking import split_into_chunks
+
+# Documents are chunked one at a time, as the ingestion pipeline does
+DOCUMENT_BYTES = 1024 * 1024
+
+
+def legacy_split_into_chunks(text: str, chunk_size: int = 500) -> list:
+    """The previous chunker: ~chunk_size whitespace words, ## headings, no overlap"""
+    chunks = []
+    section = "Introduction"
+    lines = []
+    words = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("##"):
+            if lines and "\n".join(lines).strip():
+                chunks.append({"text": "\n".join(lines).strip(), "section": section})
+            lines, words = [], 0
+            section = stripped.lstrip("#").strip() or section
+            continue
+        if not stripped and not lines:
+            continue
+        line_words = len(stripped.split())
+        if words + line_words >= chunk_size and lines:
+            chunks.append({"text": "\n".join(lines).strip(), "section": section})
+            lines, words = [line], line_words
+        else:
+            lines.append(line)
+            words += line_words
+    if lines and "\n".join(lines).strip():
+        chunks.append({"text": "\n".join(lines).strip(), "section": section})
+    return chunks
+
+
+def build_documents(megabytes: float) -> list:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = [os.path.join(backend_dir, "documents", "carbon_research.md")]
+    formalities_dir = get_formalities_documents_dir()
+    paths += sorted(os.path.join(formalities_dir, name) for name in os.listdir(formalities_dir) if name.endswith(".md"))
+    source = ""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            source += f.read() + "\n\n"
+
+    copies = max(1, DOCUMENT_BYTES // len(source.encode("utf-8")))
+    document = source * copies
+    count = max(1, int(megabytes * 1024 * 1024 / len(document.encode("utf-8"))))
+    return [document] * count
+
+
+def measure(label: str, chunker, documents: list, max_tokens: int) -> None:
+    total_mb = sum(len(document.encode("utf-8")) for document in documents) / (1024 * 1024)
+    start = time.perf_counter()
+    chunks = [chunk for document in documents for chunk in chunker(document)]
+    elapsed = time.perf_counter() - start
+
+    # Token sizes are measured on the first document only (the rest are copies)
+    sizes = np.array(count_tokens_batch([chunk["text"] for chunk in chunker(documents[0])]))
+    print(
+        f"  {label:8} {total_mb / elapsed * 60:9.0f} MB/min   {len(chunks):>8} chunks   "
+        f"tokens mean {sizes.mean():5.0f} p95 {np.percentile(sizes, 95):5.0f} max {sizes.max():5}   "
+        f"over {max_tokens}: {(sizes > max_tokens).mean():6.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=50, help="Corpus size in megabytes")
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    mode = "tiktoken cl100k_base" if get_encoding() is not None else "character estimate (tiktoken unavailable)"
+    documents = build_documents(args.mb)
+    print(f"🚀 {len(documents)} documents of ~{len(documents[0]) / (1024 * 1024):.1f} MB, token counts: {mode}")
+
+    measure("legacy", legacy_split_into_chunks, documents, args.max_tokens)
+    measure("tokens", lambda text: split_into_chunks(text, args.max_tokens, args.overlap), documents, args.max_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark OCR payload size and latency on a directory of document images
+
+Reports the upload size and estimated vision tokens before and after
+pre-processing. With --live, also times the legacy two-call extraction
+against the combined single-call mode (requires OPENAI_API_KEY).
+
+Usage:
+    python scripts/benchmark_ocr.py path/to/images --document-type pan_card [--live]
+"""
+import argparse
+import asyncio
+import io
+import math
+import mimetypes
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from app.services.document_ocr import prepare_image_for_ocr, extract_text_and_structured_data
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+
+def estimate_vision_tokens(image_bytes: bytes) -> int:
+    """Estimate GPT-4o high-detail image tokens (85 base + 170 per 512px tile)"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+async def time_extraction(image_bytes: bytes, mime_type: str, document_type: str, combined: bool) -> float:
+    start = time.perf_counter()
+    await extract_text_and_structured_data(
+        image_bytes, document_type, mime_type, combined=combined, preprocess=combined
+    )
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory")
+    parser.add_argument("--document-type", default="pan_card")
+    parser.add_argument("--live", action="store_true", help="Call the vision API and compare latency")
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.directory, f) for f in os.listdir(args.directory)
+        if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not files:
+        print(f"❌ No images found in {args.directory}")
+        sys.exit(1)
+
+    total_before = total_after = 0
+    tokens_before = tokens_after = 0
+    legacy_latency = combined_latency = 0.0
+
+    print(f"{'file':40} {'bytes':>10} {'-> bytes':>10} {'tokens x2':>10} {'-> tokens':>10}")
+    for path in files:
+        with open(path, "rb") as f:
+            original = f.read()
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        processed, processed_mime = prepare_image_for_ocr(original, mime_type)
+
+        # The legacy path uploads the original image twice
+        before_bytes = 2 * len(original)
+        before_tokens = 2 * estimate_vision_tokens(original)
+        after_tokens = estimate_vision_tokens(processed)
+
+        total_before += before_bytes
+        total_after += len(processed)
+        tokens_before += before_tokens
+        tokens_after += after_tokens
+        print(f"{os.path.basename(path)[:40]:40} {before_bytes:>10} {len(processed):>10} {before_tokens:>10} {after_tokens:>10}")
+
+        if args.live:
+            legacy_latency += await time_extraction(original, mime_type, args.document_type, combined=False)
+            combined_latency += await time_extraction(original, mime_type, args.document_type, combined=True)
+
+    print()
+    print(f"📦 Upload bytes: {total_before:,} -> {total_after:,} ({100 * (1 - total_after / total_before):.1f}% smaller)")
+    print(f"🔢 Image tokens: {tokens_before:,} -> {tokens_after:,} ({100 * (1 - tokens_after / tokens_before):.1f}% fewer)")
+    if args.live:
+        n = len(files)
+        print(f"⏱️  Mean latency: {legacy_latency / n:.2f}s -> {combined_latency / n:.2f}s per document")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Benchmark in-process hybrid retrieval against Qdrant
+
+Builds the education and formalities chunks, embeds them, and samples a
+short query from each chunk whose relevant answer is that chunk.
+Reports recall@k and per-query latency for exact vector search, BM25,
+RRF-fused hybrid search and (if reachable) Qdrant on the same vectors.
+A synthetic scale test then times exact top-k as the corpus grows.
+
+Embeddings default to a deterministic feature-hashing embedding so the
+benchmark runs offline; pass --openai to use text-embedding-3-small.
+
+Usage:
+    python scripts/benchmark_retrieval.py [--k 3] [--openai] [--scale 100000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+import zlib
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.chunking import split_into_chunks
+from app.agents.formalities_qdrant import get_formalities_documents_dir
+from app.services.hybrid_index import HybridIndex, top_k, tokenize
+
+DIMENSIONS = 1536
+BENCHMARK_COLLECTION = "benchmark_retrieval"
+
+
+def hashed_embedding(text: str) -> np.ndarray:
+    """Unigram + bigram feature hashing, a stand-in for a real embedding model"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    tokens = tokenize(text)
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % DIMENSIONS] += 1.0 if digest & 1 << 31 else -1.0
+    return vector
+
+
+def load_chunks() -> list:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = [os.path.join(backend_dir, "documents", "carbon_research.md")]
+    formalities_dir = get_formalities_documents_dir()
+    paths += sorted(os.path.join(formalities_dir, name) for name in os.listdir(formalities_dir) if name.endswith(".md"))
+    chunks = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            # Smaller chunks than production so each corpus has enough of them to rank
+            chunks += split_into_chunks(f.read(), max_tokens=160)
+    return chunks
+
+
+def make_queries(chunks: list, seed: int = 7) -> list:
+    """
+    One query per chunk: a few words sampled from one of its sentences
+
+    Dropping most of the sentence makes queries short and partial like real
+    questions, so the rankers actually have to discriminate.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for index, chunk in enumerate(chunks):
+        sentences = [s.strip(" -*#") for s in re.split(r"[.\n]", chunk["text"]) if len(s.split()) >= 8]
+        if sentences:
+            words = rng.choice(sentences).split()
+            kept = sorted(rng.sample(range(len(words)), max(3, len(words) // 3)))
+            queries.append((" ".join(words[i] for i in kept), index))
+    return queries
+
+
+async def embed_all(texts: list, use_openai: bool) -> np.ndarray:
+    if not use_openai:
+        return np.stack([hashed_embedding(text) for text in texts])
+    from app.agents.llm_client import get_embedding
+    return np.array(await asyncio.gather(*(get_embedding(text) for text in texts)), dtype=np.float32)
+
+
+def evaluate(label: str, search, queries: list, k: int) -> None:
+    hits = 0
+    start = time.perf_counter()
+    for query, query_vector, relevant in queries:
+        if relevant in search(query, query_vector, k):
+            hits += 1
+    latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"  {label:10} recall@{k} {hits / len(queries):6.1%}   {latency_ms:7.3f} ms/query")
+
+
+def qdrant_client_or_none():
+    try:
+        from qdrant_client import QdrantClient
+        from app.config import get_settings
+        client = QdrantClient(url=get_settings().QDRANT_URL, timeout=2)
+        client.get_collections()
+        return client
+    except Exception as e:
+        print(f"  (Qdrant unavailable, skipping: {str(e)[:80]})")
+        return None
+
+
+def load_into_qdrant(client, vectors: np.ndarray) -> None:
+    from qdrant_client.models import Distance, VectorParams, PointStruct
+    client.recreate_collection(
+        collection_name=BENCHMARK_COLLECTION,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE)
+    )
+    for start in range(0, len(vectors), 1000):
+        client.upsert(
+            collection_name=BENCHMARK_COLLECTION,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist(), payload={"index": i})
+                for i in range(start, min(start + 1000, len(vectors)))
+            ]
+        )
+
+
+def qdrant_search(client, vector: np.ndarray, k: int) -> list:
+    results = client.search(collection_name=BENCHMARK_COLLECTION, query_vector=vector.tolist(), limit=k)
+    return [result.id for result in results]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--openai", action="store_true", help="Use OpenAI embeddings instead of hashed features")
+    parser.add_argument("--scale", type=int, default=100_000, help="Largest synthetic corpus for the latency test")
+    args = parser.parse_args()
+
+    chunks = load_chunks()
+    texts = [chunk["text"] for chunk in chunks]
+    queries = make_queries(chunks)
+    print(f"🚀 {len(chunks)} chunks, {len(queries)} queries, {'OpenAI' if args.openai else 'hashed'} embeddings")
+
+    vectors = await embed_all(texts, args.openai)
+    query_vectors = await embed_all([query for query, _ in queries], args.openai)
+    cases = [(query, query_vectors[i], relevant) for i, (query, relevant) in enumerate(queries)]
+
+    build_start = time.perf_counter()
+    index = HybridIndex([{"index": i} for i in range(len(chunks))], texts, vectors)
+    print(f"  index build {1000 * (time.perf_counter() - build_start):.1f} ms")
+
+    evaluate("vector", lambda q, v, k: [i for i, _ in index.vector_search(v, k)], cases, args.k)
+    evaluate("bm25", lambda q, v, k: index.bm25_search(q, k), cases, args.k)
+    evaluate("hybrid", lambda q, v, k: [p["index"] for p, _ in index.search(q, v, k)], cases, args.k)
+
+    client = qdrant_client_or_none()
+    if client is not None:
+        load_into_qdrant(client, vectors)
+        evaluate("qdrant", lambda q, v, k: qdrant_search(client, v, k), cases, args.k)
+
+    print(f"⏱️  Exact vector top-{args.k} latency vs corpus size (synthetic vectors)")
+    rng = np.random.default_rng(0)
+    size = 1_000
+    while size <= args.scale:
+        matrix = rng.standard_normal((size, DIMENSIONS), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        probes = rng.standard_normal((50, DIMENSIONS), dtype=np.float32)
+        start = time.perf_counter()
+        exact = [top_k(matrix @ probe, args.k) for probe in probes]
+        local_ms = (time.perf_counter() - start) * 1000 / len(probes)
+        line = f"  {size:>8,} chunks  local {local_ms:7.3f} ms/query"
+        if client is not None:
+            load_into_qdrant(client, matrix)
+            start = time.perf_counter()
+            found = [qdrant_search(client, probe, args.k) for probe in probes]
+            qdrant_ms = (time.perf_counter() - start) * 1000 / len(probes)
+            recall = np.mean([len(set(e.tolist()) & set(f)) / args.k for e, f in zip(exact, found)])
+            line += f"   qdrant {qdrant_ms:7.3f} ms/query (recall@{args.k} vs exact {recall:.1%})"
+        print(line)
+        size *= 10
+
+    if client is not None:
+        client.delete_collection(BENCHMARK_COLLECTION)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
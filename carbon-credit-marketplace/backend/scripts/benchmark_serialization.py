@@ -0,0 +1,175 @@
+"""
+Benchmark list-response serialization: per-row Pydantic models vs RowSerializer
+
+Builds N in-memory ORM rows for each large list endpoint and times the old
+response path (a model per row, FastAPI's response_model validation and
+jsonable_encoder, JSONResponse) against RowSerializer + orjson, checking that
+both produce the same JSON.
+
+Usage:
+    python scripts/benchmark_serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.compliance import COMPLIANCE_RECORD_SERIALIZER
+from app.api.market_data import PRICE_HISTORY_SERIALIZER
+from app.api.marketplace import format_listing_response, parse_co_benefits
+from app.core.serialization import RowSerializer
+from app.models.models import ComplianceRecord, CreditListing, PriceHistory, Transaction, User
+from app.schemas.schemas import (
+    ComplianceRecordResponse, ListingResponse, PriceHistoryResponse, TransactionWithDetails
+)
+
+PROJECT_TYPES = ["Renewable Energy", "Forestry", "Energy Efficiency", "Waste Management", "Agriculture"]
+
+
+def make_rows(rows: int, seed: int = 42) -> dict:
+    """Transient ORM instances with realistic values"""
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    sellers = [User(id=uuid.uuid4(), company_name=f"Seller {i} Pvt Ltd") for i in range(50)]
+
+    listings = [
+        CreditListing(
+            id=uuid.uuid4(),
+            seller_id=sellers[i % 50].id,
+            seller=sellers[i % 50],
+            quantity=int(rng.integers(100, 10000)),
+            available_quantity=int(rng.integers(0, 100)),
+            price_per_credit=float(np.round(rng.uniform(500, 3000), 2)),
+            vintage=int(rng.integers(2018, 2025)),
+            project_type=PROJECT_TYPES[i % len(PROJECT_TYPES)],
+            verification_status="verified",
+            is_active=True,
+            description="Verified emission reductions from a grid-connected project",
+            methodology="AMS-I.D",
+            project_location="Gujarat, India",
+            serial_number_start=f"IN-{i:08d}-0001",
+            serial_number_end=f"IN-{i:08d}-9999",
+            co_benefits='["SDG 7", "SDG 13"]',
+            additionality_score=float(np.round(rng.uniform(0, 100), 1)),
+            permanence_score=float(np.round(rng.uniform(0, 100), 1)),
+            created_at=now - timedelta(minutes=i)
+        )
+        for i in range(rows)
+    ]
+    records = [
+        ComplianceRecord(
+            id=uuid.uuid4(), user_id=sellers[0].id, compliance_period=f"{2000 + i % 25}-{(i % 25) + 1:02d}",
+            sector="cement", target_emission_intensity=0.8, baseline_emission_intensity=0.85,
+            actual_emissions=float(rng.uniform(1e4, 1e6)), actual_production=float(rng.uniform(1e4, 1e6)),
+            actual_emission_intensity=float(rng.uniform(0.5, 1.0)), credits_required=int(rng.integers(0, 1000)),
+            credits_earned=0, credits_surrendered=0, credits_shortfall=int(rng.integers(0, 1000)),
+            status="at_risk", deadline=now, submitted_at=now, verified_at=None,
+            penalty_amount=float(rng.uniform(0, 1e6)), penalty_paid=False, created_at=now
+        )
+        for i in range(rows)
+    ]
+    history = [
+        PriceHistory(
+            id=uuid.uuid4(), date=date.today() - timedelta(days=i % 365),
+            project_type=PROJECT_TYPES[i % len(PROJECT_TYPES)], vintage=2020 + i % 5,
+            open_price=1200.5, close_price=1210.25, high_price=1250.0, low_price=1190.0, average_price=1215.75,
+            volume=int(rng.integers(0, 10000)), num_transactions=int(rng.integers(0, 100))
+        )
+        for i in range(rows)
+    ]
+    transactions = [
+        Transaction(
+            id=uuid.uuid4(), transaction_number=f"TXN-{i:010d}", buyer_id=sellers[1].id, seller_id=sellers[i % 50].id,
+            listing_id=listings[i].id, order_id=None, quantity=int(rng.integers(1, 1000)),
+            price_per_credit=1500.0, total_amount=float(rng.uniform(1e3, 1e6)), platform_fee=100.0, gst_amount=18.0,
+            status="completed", transaction_date=now, payment_completed_at=now, credits_transferred_at=now,
+            completed_at=now, created_at=now
+        )
+        for i in range(rows)
+    ]
+    names = {seller.id: seller.company_name for seller in sellers}
+    return {"listings": listings, "compliance": records, "price_history": history, "transactions": transactions, "names": names}
+
+
+async def old_path(model, rows, build) -> bytes:
+    """What the endpoints did before: model per row, then FastAPI's response_model pass"""
+    content = [build(row) for row in rows]
+    field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs")
+    args = parser.parse_args()
+
+    print(f"🚀 Building {args.rows:,} rows per endpoint")
+    data = make_rows(args.rows)
+    names = data["names"]
+    # The endpoints now serialize projected Rows; these read the same fields off entities
+    listing_serializer = RowSerializer(ListingResponse, computed={
+        "seller_name": lambda listing: listing.seller.company_name,
+        "available_quantity": lambda listing: listing.available_quantity or listing.quantity,
+        "co_benefits": lambda listing: parse_co_benefits(listing.co_benefits) if listing.co_benefits else None,
+    })
+    transaction_serializer = RowSerializer(TransactionWithDetails, computed={
+        "buyer_name": lambda txn: names.get(txn.buyer_id, "Unknown"),
+        "seller_name": lambda txn: names.get(txn.seller_id, "Unknown"),
+        "listing": lambda txn: None,
+        "payment": lambda txn: None,
+    })
+
+    cases = [
+        ("get_listings", ListingResponse, data["listings"],
+         lambda row: ListingResponse(**format_listing_response(row, row.seller)), listing_serializer),
+        ("get_compliance_records", ComplianceRecordResponse, data["compliance"],
+         ComplianceRecordResponse.model_validate, COMPLIANCE_RECORD_SERIALIZER),
+        ("get_price_history", PriceHistoryResponse, data["price_history"],
+         PriceHistoryResponse.model_validate, PRICE_HISTORY_SERIALIZER),
+        ("get_user_transactions", TransactionWithDetails, data["transactions"],
+         lambda txn: TransactionWithDetails.model_validate({
+             **{name: getattr(txn, name) for name in TransactionWithDetails.model_fields if name not in (
+                 "buyer_name", "seller_name", "listing", "payment")},
+             "buyer_name": names[txn.buyer_id], "seller_name": names[txn.seller_id]
+         }), transaction_serializer),
+    ]
+
+    loop = asyncio.new_event_loop()
+    print(f"{'endpoint':24} {'pydantic':>10} {'orjson':>10} {'speedup':>8} {'size':>9}  match")
+    for name, model, rows, build, serializer in cases:
+        old_body, old_time = timed(lambda: loop.run_until_complete(old_path(model, rows, build)), args.repeat)
+        new_body, new_time = timed(lambda: serializer.dumps(rows), args.repeat)
+        match = json.loads(old_body) == json.loads(new_body)
+        print(
+            f"{name:24} {old_time * 1000:8.1f}ms {new_time * 1000:8.1f}ms {old_time / new_time:7.1f}x "
+            f"{len(new_body) / 1024:7.0f}KB  {'✅' if match else '❌'}"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
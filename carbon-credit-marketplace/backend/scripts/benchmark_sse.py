@@ -0,0 +1,140 @@
+"""
+Benchmark SSE chat streaming: per-character frames vs coalesced events
+
+Drives the ASGI app directly with a static calculator-style reply and with
+a simulated LLM token stream, and reports bytes on the wire, ASGI body
+writes (one per socket write) and CPU time per response for the legacy
+framing and for app.core.sse.
+
+Usage:
+    python scripts/benchmark_sse.py [--responses 200] [--reply-chars 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.core.sse import sse_response
+
+STATE_EVENT = json.dumps({"type": "state", "conversation_state": {"status": "asking_questions", "answers": {}}})
+
+
+def make_reply(chars: int) -> str:
+    line = "**Question 3 of 5:** Annual electricity consumption (MWh)?\n"
+    return (line * (chars // len(line) + 1))[:chars]
+
+
+async def static_reply_per_char(reply: str):
+    # What the agents did before: one chunk per character
+    for char in reply:
+        yield char
+    yield STATE_EVENT
+
+
+async def static_reply_whole(reply: str):
+    yield reply
+    yield STATE_EVENT
+
+
+async def llm_tokens(reply: str, token_chars: int = 4):
+    for i in range(0, len(reply), token_chars):
+        yield reply[i:i + token_chars]
+    yield STATE_EVENT
+
+
+def legacy_response(chunks):
+    """The previous API-layer framing: one data: frame per chunk"""
+    async def generate():
+        async for chunk in chunks:
+            yield f"data: {chunk}\n\n"
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+async def run_asgi(app: FastAPI, path: str) -> tuple:
+    """Call the app once, returning (bytes, body writes)"""
+    body_bytes = 0
+    writes = 0
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal body_bytes, writes
+        if message["type"] == "http.response.body" and message.get("body"):
+            body_bytes += len(message["body"])
+            writes += 1
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    disconnected.set()
+    return body_bytes, writes
+
+
+def build_app(reply: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/static/legacy")
+    async def static_legacy():
+        return legacy_response(static_reply_per_char(reply))
+
+    @app.get("/static/coalesced")
+    async def static_coalesced():
+        return sse_response(static_reply_whole(reply))
+
+    @app.get("/llm/legacy")
+    async def llm_legacy():
+        return legacy_response(llm_tokens(reply))
+
+    @app.get("/llm/coalesced")
+    async def llm_coalesced():
+        return sse_response(llm_tokens(reply))
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, responses: int) -> tuple:
+    await run_asgi(app, path)  # Warm up
+    start = time.process_time()
+    for _ in range(responses):
+        body_bytes, writes = await run_asgi(app, path)
+    cpu_ms = (time.process_time() - start) * 1000 / responses
+    return body_bytes, writes, cpu_ms
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--responses", type=int, default=200)
+    parser.add_argument("--reply-chars", type=int, default=500)
+    args = parser.parse_args()
+
+    app = build_app(make_reply(args.reply_chars))
+
+    print(f"🚀 {args.reply_chars}-char reply, {args.responses} responses per case")
+    print(f"{'case':22} {'bytes':>8} {'writes':>8} {'CPU ms/resp':>12}")
+    for case in ("static", "llm"):
+        for variant in ("legacy", "coalesced"):
+            body_bytes, writes, cpu_ms = await measure(app, f"/{case}/{variant}", args.responses)
+            print(f"{case + ' ' + variant:22} {body_bytes:>8} {writes:>8} {cpu_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
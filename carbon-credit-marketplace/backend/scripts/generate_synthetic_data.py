@@ -0,0 +1,95 @@
+"""
+Generate a production-scale synthetic dataset for local performance work
+
+Writes buyers, sellers, credit accounts, listings, orders, transactions,
+payments, credit ledger entries and daily price history with
+app.data.synthetic_data (bulk COPY, one shared password hash, deterministic
+seeds). Every synthetic user logs in with the password "demo123".
+
+--reset first drops and recreates all tables and loads the demo seed data,
+exactly like application startup. Without it the data is appended to the
+existing tables; use a different --seed for each dataset sharing a database.
+
+Usage:
+    python scripts/generate_synthetic_data.py [--database-url URL] [--reset]
+        [--buyers 100000] [--sellers 5000] [--listings 200000]
+        [--transactions 2000000] [--open-orders 100000] [--days 365] [--seed 42]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def main_async(args):
+    from app.database import engine, init_db, AsyncSessionLocal
+    from app.data.seed_data import seed_database
+    from app.data.synthetic_data import generate_synthetic_data
+    from app.core.log import configure_logging, shutdown_logging
+    from app.core.cache import ALL_TAG, LISTINGS_TAG, TRADES_TAG, bump_versions, publish_invalidation
+
+    configure_logging()  # init_db / seed_database report through the app loggers
+    if args.reset:
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            await seed_database(db)
+
+    end = None
+    if args.end:
+        end = datetime.fromisoformat(args.end)
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    print(
+        f"🌱 Generating {args.buyers:,} buyers, {args.sellers:,} sellers, {args.listings:,} listings, "
+        f"{args.transactions:,} transactions (seed {args.seed})..."
+    )
+    start = time.perf_counter()
+    dataset = await generate_synthetic_data(
+        engine,
+        buyers=args.buyers,
+        sellers=args.sellers,
+        listings=args.listings,
+        transactions=args.transactions,
+        open_orders=args.open_orders,
+        days=args.days,
+        seed=args.seed,
+        end=end
+    )
+    elapsed = time.perf_counter() - start
+    # Bulk inserts bypass the ORM hooks; invalidate cached responses and running workers' caches by hand
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(bump_versions, [LISTINGS_TAG, TRADES_TAG])
+        await db.run_sync(publish_invalidation, [ALL_TAG])
+        await db.commit()
+    print(f"✅ {dataset.total_rows:,} rows in {elapsed:.1f}s ({dataset.total_rows / elapsed:,.0f} rows/s)")
+    await engine.dispose()
+    shutdown_logging()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL from the environment / .env")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--buyers", type=int, default=100_000)
+    parser.add_argument("--sellers", type=int, default=5_000)
+    parser.add_argument("--listings", type=int, default=200_000)
+    parser.add_argument("--transactions", type=int, default=2_000_000)
+    parser.add_argument("--open-orders", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365, help="Days of trade history")
+    parser.add_argument("--end", help="ISO timestamp the history ends at (default: start of the current hour)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure the app before importing it
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DEBUG"] = "false"  # SQL echo of millions of rows would dominate the run
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 """
 Script to ingest formalities documents into Qdrant
 Run this script to populate the formalities knowledge base
+
+Usage:
+    python scripts/ingest_formalities_docs.py [--documents-dir DIR] [--full]
+
+By default the run resumes from the last checkpoint, skipping documents
+that are unchanged and already stored; --full re-ingests everything.
 """
+import argparse
 import asyncio
 import sys
 import os
@@ -10,10 +17,18 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.agents.formalities_qdrant import init_formalities_collection, ingest_formalities_documents
+from app.agents.formalities_agent import precompute_step_guidance
+from app.core.log import configure_logging, shutdown_logging
 
 
 async def main():
     """Main function to initialize collection and ingest documents"""
+    parser = argparse.ArgumentParser(description="Ingest formalities documents into Qdrant")
+    parser.add_argument("--documents-dir", default=None, help="Directory of documents (default: documents/formalities)")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-ingest every document")
+    args = parser.parse_args()
+    configure_logging()  # Ingestion progress is reported through the app loggers
+    
     print("🚀 Starting formalities documents ingestion...")
     
     try:
@@ -23,12 +38,19 @@ async def main():
         
         # Ingest documents
         print("\n📄 Ingesting documents...")
-        await ingest_formalities_documents()
+        await ingest_formalities_documents(args.documents_dir, resume=not args.full)
+        
+        # Precompute per-step document guidance for this corpus version
+        print("\n🧭 Precomputing step guidance...")
+        generated = await precompute_step_guidance()
+        print(f"  Generated guidance for {generated} steps")
         
         print("\n✅ Formalities documents ingestion completed!")
     except Exception as e:
         print(f"\n❌ Error: {str(e)}")
         sys.exit(1)
+    finally:
+        shutdown_logging()
 
 
 if __name__ == "__main__":
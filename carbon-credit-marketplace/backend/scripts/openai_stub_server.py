@@ -0,0 +1,294 @@
+"""
+OpenAI-compatible stub server for offline load testing
+
+Serves /v1/chat/completions (streaming and non-streaming, text and vision
+messages), /v1/embeddings and /v1/models with deterministic content and
+configurable latency, so the full agent stack can be benchmarked without
+network access or API spend. Replies are derived from a hash of the request,
+so identical requests get identical answers; embeddings are normalized
+feature-hashing vectors, so similar texts get similar vectors.
+
+Point the backend at it with OPENAI_BASE_URL=http://localhost:8001/v1 (any
+non-empty OPENAI_API_KEY works). Benchmarks can also mount the app
+in-process via create_stub_app().
+
+Usage:
+    python scripts/openai_stub_server.py [--port 8001] [--profile realistic]
+        [--first-token-ms 300] [--tokens-per-second 60] [--error-rate 0.02]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 1536
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Vocabulary for generated replies
+REPLY_WORDS = (
+    "carbon credits are issued under the Indian Carbon Market after verification of emission "
+    "reductions by an accredited agency and registered with the Grid Controller of India "
+    "obligated entities must meet intensity targets set by the Bureau of Energy Efficiency "
+    "and may surrender credits to cover any shortfall within the compliance cycle"
+).split()
+
+# Returned for requests that ask for a JSON object (response_format json_object or a
+# prompt mentioning JSON). Covers the fields every JSON-reading caller in the app uses.
+STUB_JSON_REPLY = {
+    "raw_text": "STUB DOCUMENT\nRegistration No: STUB0000000\nDate: 01/04/2024",
+    "extracted_data": {"document_number": "STUB0000000", "name": "Stub Industries Pvt Ltd"},
+    "is_consistent": True,
+    "issues": [],
+    "confidence": 0.9,
+    "has_fraud_indicators": False,
+    "indicators": [],
+    "risk_level": "low",
+    "details": "Stub analysis",
+}
+
+
+class StubProfile:
+    """Latency and failure behaviour of the stub"""
+
+    def __init__(
+        self,
+        first_token_ms: float = 300,
+        tokens_per_second: float = 60,
+        reply_tokens: int = 120,
+        embedding_ms: float = 40,
+        vision_ms: float = 1500,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second  # 0 streams as fast as possible
+        self.reply_tokens = reply_tokens
+        self.embedding_ms = embedding_ms
+        self.vision_ms = vision_ms  # Extra time to first token for requests with images
+        self.jitter = jitter  # Latencies vary uniformly by +/- this fraction
+        self.error_rate = error_rate  # Fraction of requests answered with 429 or 500
+        self.seed = seed
+
+
+PROFILES = {
+    "instant": StubProfile(first_token_ms=0, tokens_per_second=0, embedding_ms=0, vision_ms=0, jitter=0),
+    "fast": StubProfile(first_token_ms=50, tokens_per_second=500, embedding_ms=5, vision_ms=200),
+    "realistic": StubProfile(),
+    "slow": StubProfile(first_token_ms=1500, tokens_per_second=25, embedding_ms=250, vision_ms=6000, jitter=0.4),
+}
+
+
+def hashed_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """Normalized unigram + bigram feature-hashing vector"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    tokens = _WORD_PATTERN.findall(text.lower())
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % dimensions] += 1.0 if digest & 1 << 31 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return str(content)
+
+
+def has_image(messages: List[Dict[str, Any]]) -> bool:
+    return any(
+        isinstance(message.get("content"), list)
+        and any(part.get("type") == "image_url" for part in message["content"])
+        for message in messages
+    )
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def create_stub_app(profile: Optional[StubProfile] = None) -> FastAPI:
+    """Build the stub ASGI app for a latency profile"""
+    profile = profile or PROFILES["realistic"]
+    rng = random.Random(profile.seed)
+    app = FastAPI(title="OpenAI stub")
+
+    def vary(milliseconds: float) -> float:
+        """Seconds to wait, with jitter"""
+        if milliseconds <= 0:
+            return 0.0
+        return milliseconds / 1000 * (1 + rng.uniform(-profile.jitter, profile.jitter))
+
+    def injected_error() -> Optional[JSONResponse]:
+        if profile.error_rate <= 0 or rng.random() >= profile.error_rate:
+            return None
+        if rng.random() < 0.5:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "0.1"}
+            )
+        return JSONResponse(
+            {"error": {"message": "Internal server error (stub)", "type": "server_error", "code": None}},
+            status_code=500
+        )
+
+    def reply_for(body: Dict[str, Any]) -> str:
+        messages = body.get("messages", [])
+        prompt = "\n".join(message_text(message) for message in messages)
+        wants_json = (body.get("response_format") or {}).get("type") == "json_object" or "json" in prompt.lower()
+        if wants_json:
+            return json.dumps(STUB_JSON_REPLY)
+        words = profile.reply_tokens
+        if body.get("max_tokens"):
+            words = min(words, int(body["max_tokens"]))
+        seed = int.from_bytes(hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()[:8], "big")
+        reply_rng = random.Random(seed)
+        return " ".join(reply_rng.choice(REPLY_WORDS) for _ in range(max(words, 1))) + "."
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+            for model in ("gpt-4o", "gpt-4o-mini", "text-embedding-3-small")
+        ]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = injected_error()
+        if error is not None:
+            return error
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(vary(profile.embedding_ms))
+
+        dimensions = int(body.get("dimensions") or EMBEDDING_DIMENSIONS)
+        data = []
+        for index, text in enumerate(inputs):
+            vector = hashed_embedding(str(text), dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(count_words(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = injected_error()
+        if error is not None:
+            return error
+
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4o-mini")
+        reply = reply_for(body)
+        pieces = re.findall(r"\S+\s*", reply) or [reply]
+        first_token_ms = profile.first_token_ms + (profile.vision_ms if has_image(messages) else 0)
+        token_delay = 1 / profile.tokens_per_second if profile.tokens_per_second > 0 else 0.0
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(count_words(message_text(message)) for message in messages)
+
+        if not body.get("stream"):
+            await asyncio.sleep(vary(first_token_ms) + token_delay * len(pieces))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(pieces),
+                    "total_tokens": prompt_tokens + len(pieces),
+                },
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            await asyncio.sleep(vary(first_token_ms))
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in pieces:
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": piece})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--first-token-ms", type=float, help="Override the profile's time to first token")
+    parser.add_argument("--tokens-per-second", type=float, help="Override the profile's streaming rate (0 = unthrottled)")
+    parser.add_argument("--reply-tokens", type=int, help="Override the reply length")
+    parser.add_argument("--embedding-ms", type=float, help="Override the embedding latency")
+    parser.add_argument("--vision-ms", type=float, help="Override the extra latency for image requests")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests failing with 429/500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    for option in ("first_token_ms", "tokens_per_second", "reply_tokens", "embedding_ms", "vision_ms", "error_rate"):
+        value = getattr(args, option)
+        if value is not None:
+            setattr(profile, option, value)
+    profile.seed = args.seed
+
+    import uvicorn
+    print(f"🚀 OpenAI stub ({args.profile}) on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_stub_app(profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,50 @@ apiClient.interceptors.response.use(
 
 export default apiClient;
 
+// Read a Server-Sent Events response, yielding the data of each event.
+// Multi-line events arrive as several "data:" lines and are joined with newlines.
+async function* readSSEEvents(response: Response) {
+  const reader = response.body?.getReader();
+  const decoder = new TextDecoder();
+  
+  if (!reader) {
+    throw new Error('Response body is not readable');
+  }
+  
+  let buffer = '';
+  let dataLines: string[] = [];
+  
+  while (true) {
+    const { done, value } = await reader.read();
+    
+    if (done) {
+      break;
+    }
+    
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() || '';
+    
+    for (const line of lines) {
+      if (line.startsWith('data:')) {
+        dataLines.push(line.startsWith('data: ') ? line.slice(6) : line.slice(5));
+      } else if (line === '' && dataLines.length > 0) {
+        // Empty line ends the event
+        yield dataLines.join('\n');
+        dataLines = [];
+      }
+    }
+  }
+  
+  // Process remaining buffer and any unterminated event
+  if (buffer.startsWith('data:')) {
+    dataLines.push(buffer.startsWith('data: ') ? buffer.slice(6) : buffer.slice(5));
+  }
+  if (dataLines.length > 0) {
+    yield dataLines.join('\n');
+  }
+}
+
 // Auth API
 export const authAPI = {
   register: (data: any) => apiClient.post('/api/auth/register', data),
@@ -92,38 +136,7 @@ export const educationAPI = {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const reader = response.body?.getReader();
-    const decoder = new TextDecoder();
-    
-    if (!reader) {
-      throw new Error('Response body is not readable');
-    }
-    
-    let buffer = '';
-    
-    while (true) {
-      const { done, value } = await reader.read();
-      
-      if (done) {
-        break;
-      }
-      
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop() || '';
-      
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6);
-          yield data;
-        }
-      }
-    }
-    
-    // Process remaining buffer
-    if (buffer.startsWith('data: ')) {
-      yield buffer.slice(6);
-    }
+    yield* readSSEEvents(response);
   },
 };
 
@@ -133,7 +146,7 @@ export const calculatorAPI = {
     apiClient.get(`/api/calculator/questions/${sector}`),
   calculate: (sector: string, answers: any) => 
     apiClient.post('/api/calculator/calculate', { sector, answers }),
-  chatStream: async function* (question: string, conversationState?: any) {
+  chatStream: async function* (question: string, sessionId?: string | null) {
     const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
     const token = localStorage.getItem('token');
     
@@ -148,45 +161,14 @@ export const calculatorAPI = {
     const response = await fetch(`${API_URL}/api/calculator/chat/stream`, {
       method: 'POST',
       headers,
-      body: JSON.stringify({ question, conversation_state: conversationState }),
+      body: JSON.stringify({ question, session_id: sessionId }),
     });
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const reader = response.body?.getReader();
-    const decoder = new TextDecoder();
-    
-    if (!reader) {
-      throw new Error('Response body is not readable');
-    }
-    
-    let buffer = '';
-    
-    while (true) {
-      const { done, value } = await reader.read();
-      
-      if (done) {
-        break;
-      }
-      
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop() || '';
-      
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6);
-          yield data;
-        }
-      }
-    }
-    
-    // Process remaining buffer
-    if (buffer.startsWith('data: ')) {
-      yield buffer.slice(6);
-    }
+    yield* readSSEEvents(response);
   },
 };
 
@@ -209,9 +191,9 @@ export const marketplaceAPI = {
 export const formalitiesAPI = {
   getSteps: (workflowType: string) => 
     apiClient.get(`/api/formalities/steps/${workflowType}`),
-  chat: (question: string, conversationState?: any) =>
-    apiClient.post('/api/formalities/chat', { question, conversation_state: conversationState }),
-  chatStream: async function* (question: string, conversationState?: any) {
+  chat: (question: string, sessionId?: string | null) =>
+    apiClient.post('/api/formalities/chat', { question, session_id: sessionId }),
+  chatStream: async function* (question: string, sessionId?: string | null) {
     const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
     const token = localStorage.getItem('token');
     
@@ -226,57 +208,14 @@ export const formalitiesAPI = {
     const response = await fetch(`${API_URL}/api/formalities/chat/stream`, {
       method: 'POST',
       headers,
-      body: JSON.stringify({ question, conversation_state: conversationState }),
+      body: JSON.stringify({ question, session_id: sessionId }),
     });
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const reader = response.body?.getReader();
-    const decoder = new TextDecoder();
-    
-    if (!reader) {
-      throw new Error('Response body is not readable');
-    }
-    
-    let buffer = '';
-    let multilineBuffer: string[] = [];
-    
-    while (true) {
-      const { done, value } = await reader.read();
-      
-      if (done) {
-        break;
-      }
-      
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop() || '';
-      
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          // Accumulate multiline data
-          multilineBuffer.push(line.slice(6));
-        } else if (line === '' && multilineBuffer.length > 0) {
-          // Empty line ends multiline event - join with newlines and yield
-          yield multilineBuffer.join('\n');
-          multilineBuffer = [];
-        } else if (multilineBuffer.length > 0) {
-          // Non-data line while we have buffered data - yield accumulated content
-          yield multilineBuffer.join('\n');
-          multilineBuffer = [];
-        }
-      }
-    }
-    
-    // Process remaining buffer and any buffered multiline content
-    if (buffer.startsWith('data: ')) {
-      multilineBuffer.push(buffer.slice(6));
-    }
-    if (multilineBuffer.length > 0) {
-      yield multilineBuffer.join('\n');
-    }
+    yield* readSSEEvents(response);
   },
 };
 
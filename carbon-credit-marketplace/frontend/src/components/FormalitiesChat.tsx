@@ -38,6 +38,7 @@ export default function FormalitiesChat({ className }: FormalitiesChatProps) {
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [conversationState, setConversationState] = useState<ConversationState | null>(null);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   const handleSendMessage = async (message?: string) => {
     const question = message || input.trim();
@@ -56,12 +57,15 @@ export default function FormalitiesChat({ className }: FormalitiesChatProps) {
       fetch('http://127.0.0.1:7250/ingest/c46cc32a-cd75-4d30-b24d-e8560eec88f6',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({location:'FormalitiesChat.tsx:53',message:'handleSendMessage: starting stream',data:{question,hasState:!!conversationState},timestamp:Date.now(),sessionId:'debug-session',runId:'1',hypothesisId:'B'})}).catch(()=>{});
       // #endregion
       
-      for await (const chunk of formalitiesAPI.chatStream(question, conversationState)) {
+      for await (const chunk of formalitiesAPI.chatStream(question, sessionId)) {
         // Try to parse as JSON (for state updates or errors)
         try {
           const parsed = JSON.parse(chunk);
           
-          if (parsed.type === 'state') {
+          if (parsed.type === 'session') {
+            // State lives on the server; send this ID with the next message
+            setSessionId(parsed.session_id);
+          } else if (parsed.type === 'state') {
             // #region agent log
             fetch('http://127.0.0.1:7250/ingest/c46cc32a-cd75-4d30-b24d-e8560eec88f6',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({location:'FormalitiesChat.tsx:61',message:'Received state update, finalizing content',data:{contentLength:accumulatedContent.length,contentPreview:accumulatedContent.substring(0,100),hasMarkdown:accumulatedContent.includes('##')||accumulatedContent.includes('**')},timestamp:Date.now(),sessionId:'debug-session',runId:'1',hypothesisId:'A,B'})}).catch(()=>{});
             // #endregion